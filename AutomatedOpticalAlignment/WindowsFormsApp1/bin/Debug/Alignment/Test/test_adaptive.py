@@ -0,0 +1,34 @@
+from unittest import TestCase
+
+import numpy as np
+
+from Alignment.adaptive import adaptive_scan
+
+
+def gaussian(peak, width=4.0, amplitude=5000.0, offset=10.0):
+    def measure(points):
+        distance = ((np.asarray(points) - np.asarray(peak)) ** 2).sum(axis=1)
+        return offset + amplitude * np.exp(-distance / (2 * width ** 2))
+    return measure
+
+
+class TestAdaptiveScan(TestCase):
+
+    def test_finds_peak_with_fewer_points(self):
+        length = 41
+        grid = np.indices((length, length)).reshape(2, -1).T
+        for peak in ((23, 18), (3, 37), (40, 0)):
+            measure = gaussian(peak)
+            scan = adaptive_scan(measure, length)
+            self.assertEqual(peak, np.unravel_index(np.argmax(scan.results), scan.results.shape))
+            self.assertEqual(scan.measurements, scan.sampled.sum())
+            self.assertLess(scan.measurements, length ** 2 // 4)
+
+            truth = measure(grid).reshape(length, length)
+            np.testing.assert_allclose(truth[scan.sampled], scan.results[scan.sampled])
+            self.assertLess(np.abs(scan.results - truth).max(), 0.1 * 5000)
+
+    def test_flat_signal_stays_coarse(self):
+        scan = adaptive_scan(lambda points: np.ones(len(points)), 21, initial_step=4)
+        self.assertEqual(6 * 6 + 5 * 5, scan.measurements)
+        np.testing.assert_array_equal(np.ones((21, 21)), scan.results)
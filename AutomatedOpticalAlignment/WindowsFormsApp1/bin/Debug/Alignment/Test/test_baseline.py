@@ -0,0 +1,45 @@
+from unittest import TestCase
+
+import numpy as np
+
+from Alignment.baseline import Baseline
+
+
+class TestBaseline(TestCase):
+
+    def test_references_are_taken_first_and_every_interval(self):
+        levels = iter([10.0, 12.0, 14.0])
+        baseline = Baseline(lambda: next(levels), interval=20)
+        baseline.count(5)
+        self.assertEqual([5], baseline.indices)
+        baseline.count(10)
+        self.assertEqual([5], baseline.indices)
+        baseline.count(10)
+        baseline.count(20)
+        self.assertEqual([5, 25, 45], baseline.indices)
+        self.assertEqual(14.0, baseline.level)
+
+    def test_drift_is_interpolated_between_references(self):
+        baseline = Baseline(indices=[0, 100], levels=[10.0, 20.0])
+        sequence = np.array([[-5, 0, 50], [100, 150, np.nan]])
+        np.testing.assert_allclose([[10, 10, 15], [20, 20, 15]], baseline.at(sequence))
+        results = np.full(sequence.shape, 100.0)
+        np.testing.assert_allclose([[90, 90, 85], [80, 80, 85]], baseline.correct(results, sequence))
+
+    def test_without_reference_nothing_is_subtracted(self):
+        baseline = Baseline()
+        baseline.count(100)
+        self.assertEqual(100, baseline.points)
+        self.assertEqual(0.0, baseline.level)
+        results = np.arange(6.0).reshape(2, 3)
+        np.testing.assert_array_equal(results, baseline.correct(results, results))
+
+    def test_resumes_from_state(self):
+        state = Baseline(lambda: 3.0, interval=10)
+        state.count(12)
+        baseline = Baseline(lambda: 4.0, interval=10, **state.state())
+        baseline.count(5)
+        self.assertEqual([12], baseline.indices)
+        baseline.count(5)
+        self.assertEqual([12, 22], baseline.indices)
+        self.assertEqual([3.0, 4.0], baseline.levels)
@@ -0,0 +1,58 @@
+import os
+import tempfile
+import threading
+from unittest import TestCase
+
+from Alignment.catalog import ScanCatalog
+
+
+class TestScanCatalog(TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.directory = self._tmp.name
+        self.catalog = ScanCatalog(os.path.join(self.directory, "scan_catalog.sqlite"))
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_allocation_skips_results_saved_before_the_catalog(self):
+        base = os.path.join(self.directory, "1_1_0.1")
+        for path in (base + ".csv", base + "_1.csv"):
+            open(path, "w").close()
+
+        first = self.catalog.allocate(base, ".csv")
+        self.assertEqual((2, base + "_2.csv"), first[1:])
+        self.assertEqual(3, self.catalog.allocate(base, ".csv").suffix)
+        self.assertEqual(0, self.catalog.allocate(os.path.join(self.directory, "Multi-Layer-Scan"),
+                                                  kind='multi_layer').suffix)
+        with self.assertRaises(ValueError):
+            self.catalog.allocate(base, kind='unknown')
+
+    def test_concurrent_allocations_are_unique(self):
+        base = os.path.join(self.directory, "Tracking_20240312_101502")
+        suffixes = []
+
+        def allocate():
+            for _ in range(10):
+                suffixes.append(ScanCatalog(self.catalog.path).allocate(base, ".csv", 'tracking').suffix)
+
+        threads = [threading.Thread(target=allocate) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(list(range(40)), sorted(suffixes))
+
+    def test_scans_are_listed_once_saved(self):
+        ids = [self.catalog.allocate(os.path.join(self.directory, name), ".csv").id for name in ("1_1_0.1", "2_2_0.1")]
+        self.catalog.complete(ids[0], name="1_1_0.1", centre=(1, 1), step=0.1, shape=(41, 41))
+        self.assertEqual([ids[0]], [scan['id'] for scan in self.catalog.scans()])
+        self.assertEqual(2, len(self.catalog.scans(saved=False)))
+
+        self.catalog.complete(ids[1], name="2_2_0.1")
+        self.assertEqual([ids[1], ids[0]], [scan['id'] for scan in self.catalog.scans(kind='single')])
+        self.assertEqual([], self.catalog.scans(kind='multi_layer'))
+        self.assertEqual([ids[0]], [scan['id'] for scan in self.catalog.scans(name="1_1_0.1")])
+        self.assertEqual((1.0, 0.1, 41), tuple(self.catalog.get(ids[0])[key] for key in ('centre_x', 'step', 'rows')))
+        self.assertEqual(1, len(self.catalog.scans(limit=1)))
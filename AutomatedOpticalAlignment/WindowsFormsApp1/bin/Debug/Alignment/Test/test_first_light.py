@@ -0,0 +1,71 @@
+from types import SimpleNamespace
+from unittest import TestCase
+
+import numpy as np
+
+from Alignment.first_light import FIRST_LIGHT_PATTERN_IDS, find_first_light, lissajous_points, spiral_points
+from Alignment.pipe_protocol import FIRST_LIGHT_CONFIG_DTYPE, ProtocolError
+from Alignment.scan_modes import first_light
+from Alignment.search import SEARCH_STRATEGIES
+
+BOUNDS = ((0, 0), (40, 40))
+
+
+class Spot:
+
+    def __init__(self, centre, width=2.0):
+        self.centre = np.asarray(centre)
+        self.width = width
+        self.measured = []
+
+    def __call__(self, points):
+        self.measured.extend(map(tuple, points))
+        distance = ((points - self.centre) ** 2).sum(axis=1)
+        return 10 + 5000 * np.exp(-2 * distance / self.width ** 2)
+
+
+class TestFirstLight(TestCase):
+
+    def test_spiral_covers_window_outwards(self):
+        points = spiral_points((20, 20), BOUNDS)
+        self.assertEqual((20, 20), tuple(points[0]))
+        self.assertGreater(len(points), 0.99 * 41 * 41)
+        radius = np.hypot(*(points - 20).T)
+        self.assertLess(radius[:len(points) // 4].max(), radius[-len(points) // 4:].min() + 2)
+
+    def test_lissajous_starts_at_centre(self):
+        points = lissajous_points(None, BOUNDS)
+        self.assertEqual((20, 20), tuple(points[0]))
+        self.assertTrue(np.all((points >= 0) & (points <= 40)))
+
+    def test_time_to_light_grows_with_distance(self):
+        near = find_first_light(Spot((25, 16)), (20, 20), BOUNDS, relative_threshold=3)
+        far = find_first_light(Spot((32, 8)), (20, 20), BOUNDS, relative_threshold=3)
+        self.assertTrue(near.found and far.found)
+        self.assertLess(near.measurements, 150)
+        self.assertLess(near.measurements, far.measurements)
+        self.assertAlmostEqual(10, near.baseline, delta=0.01)
+        self.assertEqual(near.measurements, len(near.readings))
+
+    def test_no_light_returns_brightest_point(self):
+        light = find_first_light(Spot((30, 30), width=40.0), (5, 5), ((0, 0), (10, 10)), threshold=1e6)
+        self.assertFalse(light.found)
+        self.assertEqual(11 * 11, light.measurements)
+        self.assertEqual((10, 10), light.position)
+        self.assertRaises(ValueError, find_first_light, Spot((5, 5)), (5, 5), BOUNDS)
+
+    def test_fine_search_reuses_readings(self):
+        spot = Spot((31, 9), width=4.0)
+        light = find_first_light(spot, (20, 20), BOUNDS, threshold=100)
+        result = SEARCH_STRATEGIES['pattern']().search(spot, light.position, BOUNDS, known=light.readings)
+        self.assertEqual((31, 9), tuple(result.position))
+        self.assertEqual(len(spot.measured), len(set(spot.measured)))
+        self.assertEqual(len(spot.measured), result.measurements)
+
+    def test_unknown_pattern_id(self):
+        config = np.zeros(1, dtype=FIRST_LIGHT_CONFIG_DTYPE)[0]
+        config['pattern'] = len(FIRST_LIGHT_PATTERN_IDS)
+        spot = Spot((20, 20))
+        with self.assertRaises(ProtocolError):
+            first_light(SimpleNamespace(first_light_config=config), spot, (20, 20), BOUNDS)
+        self.assertEqual([], spot.measured)
@@ -0,0 +1,33 @@
+from unittest import TestCase
+
+import numpy as np
+
+from Alignment.fly_scan import reconstruct_row
+
+
+class TestReconstructRow(TestCase):
+
+    def test_readings_are_binned_onto_the_row(self):
+        # sweep from 10.5 down to -0.5 in 1.1 s, reading a linear signal 2*y + 100 every 10 ms
+        times = np.arange(0, 1.1, 0.01)
+        positions = 10.5 - 10 * times
+        row = reconstruct_row(2 * positions + 100, times, [0, 1.1], [10.5, -0.5], 11)
+        np.testing.assert_allclose(2 * np.arange(1, 10) + 100, row.values[1:-1])
+        np.testing.assert_allclose(2 * np.arange(11) + 100, row.values, atol=0.2)
+        self.assertEqual(len(times), row.counts.sum())
+        self.assertGreater(row.stderr[5], 0)
+
+    def test_readings_off_centre_are_corrected(self):
+        # readings only on the upper half of every point
+        positions = np.arange(5)[:, None] + np.array([0.1, 0.2, 0.3])
+        row = reconstruct_row(3 * positions.ravel(), positions.ravel(), [0, 5], [0, 5], 5)
+        np.testing.assert_allclose(3 * np.arange(1, 5), row.values[1:])
+        np.testing.assert_array_equal(3, row.counts)
+
+    def test_points_without_readings_are_interpolated(self):
+        row = reconstruct_row([1.0, 3.0], [0.0, 1.0], [0, 1], [0, 4], 5)
+        np.testing.assert_allclose([1, 1.5, 2, 2.5, 3], row.values)
+        np.testing.assert_array_equal([1, 0, 0, 0, 1], row.counts)
+
+    def test_sweep_outside_the_row_raises(self):
+        self.assertRaises(ValueError, reconstruct_row, [1.0, 2.0], [0.0, 1.0], [0, 1], [20, 30], 5)
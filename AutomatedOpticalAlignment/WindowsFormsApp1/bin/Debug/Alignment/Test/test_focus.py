@@ -0,0 +1,45 @@
+from unittest import TestCase
+
+from Alignment.focus import find_focus, focus_layers
+from Alignment.search import SearchResult
+
+
+class TiltedBeam:
+
+    def __init__(self, focus=3.3, walk=2.0):
+        self.focus = focus
+        self.walk = walk
+        self.starts = []
+
+    def __call__(self, z, start):
+        self.starts.append(start)
+        position = (int(round(20 + self.walk * z)), 20)
+        return SearchResult('test', position, 5000 / (1 + ((z - self.focus) / 4) ** 2), 10)
+
+
+class TestFocus(TestCase):
+
+    def test_focus_is_bracketed_to_tolerance(self):
+        beam = TiltedBeam()
+        focus = find_focus(beam, -5.0, 10.0, 0.1, start=(20, 20))
+        self.assertAlmostEqual(3.3, focus.z, delta=0.1)
+        self.assertLessEqual(focus.bracket[1] - focus.bracket[0], 0.1)
+        self.assertEqual(focus_layers(-5.0, 10.0, 0.1), len(focus.layers))
+        self.assertLess(len(focus.layers), 15)
+
+    def test_layers_start_from_the_nearest_peak(self):
+        beam = TiltedBeam()
+        focus = find_focus(beam, 0.0, 10.0, 1.0, start=(1, 1))
+        self.assertEqual((1, 1), beam.starts[0])
+        for n, z in enumerate(focus.layers[1:], 1):
+            nearest = min(focus.layers[:n], key=lambda measured: abs(measured - z))
+            self.assertEqual((int(round(20 + 2 * nearest)), 20), beam.starts[n])
+
+    def test_narrow_bracket_measures_one_layer(self):
+        focus = find_focus(TiltedBeam(), 2.0, 2.1, 0.5)
+        self.assertEqual([2.05], focus.layers)
+        self.assertEqual(1, focus_layers(2.0, 2.1, 0.5))
+
+    def test_tolerance_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            find_focus(TiltedBeam(), 0.0, 1.0, 0.0)
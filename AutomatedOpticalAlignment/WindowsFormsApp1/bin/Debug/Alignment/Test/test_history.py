@@ -0,0 +1,46 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from Alignment.history import AlignmentHistory
+
+
+class TestAlignmentHistory(TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.history = AlignmentHistory(os.path.join(self._tmp.name, "Results", "history.sqlite"))
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_runs_are_listed_newest_first(self):
+        for n in range(3):
+            self.history.record((10 + n, 5), dut="D{}".format(n), recipe="A", mode=4, length=21, start=(10, 10),
+                                value=100.0 * n, duration=1.5, points=20 + n)
+        self.history.record((1, 1), recipe="B", length=21)
+        runs = self.history.recent("A")
+        self.assertEqual(["D2", "D1", "D0"], [run['dut'] for run in runs])
+        self.assertEqual((12.0, 5.0, 200.0, 22), (runs[0]['peak_x'], runs[0]['peak_y'], runs[0]['peak_value'],
+                                                  runs[0]['points']))
+        self.assertEqual(2, len(self.history.recent("A", limit=2)))
+
+    def test_prior_needs_enough_runs(self):
+        for _ in range(2):
+            self.history.record((10, 10), recipe="A", length=41)
+        self.assertIsNone(self.history.prior("A", 41))
+        self.history.record((10, 10), recipe="A", length=41)
+        self.assertEqual(3, self.history.prior("A", 41).runs)
+        self.assertIsNone(self.history.prior("A", 21))
+
+    def test_prior_covers_spread_and_ignores_outlier(self):
+        for x, y in ((20, 10), (21, 11), (22, 10), (21, 9), (20, 12), (3, 38)):
+            self.history.record((x, y), recipe="A", length=41)
+        prior = self.history.prior("A", 41, coverage=3.0, margin=2)
+        self.assertEqual((20.5, 10.5), prior.centre)
+        self.assertEqual(7, prior.half_width)
+
+    def test_prior_is_at_most_the_window(self):
+        for x in (0, 20, 40):
+            self.history.record((x, x), recipe="A", length=41)
+        self.assertEqual(20, self.history.prior("A", 41).half_width)
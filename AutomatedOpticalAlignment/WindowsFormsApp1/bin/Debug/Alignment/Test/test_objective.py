@@ -0,0 +1,67 @@
+import threading
+import time
+from unittest import TestCase
+
+import numpy as np
+
+from Alignment.objective import Objective, Signal
+from Alignment.sampling import SequentialSampler
+
+
+class _Instrument:
+
+    def __init__(self, latency, readings):
+        self.latency = latency
+        self.readings = iter(readings)
+        self.threads = set()
+
+    def read(self):
+        self.threads.add(threading.get_ident())
+        time.sleep(self.latency)
+        return next(self.readings)
+
+
+class TestObjective(TestCase):
+
+    def test_score_is_vectorised(self):
+        objective = Objective([Signal('current', None, 'smu', weight=2.0, reference=10.0),
+                               Signal('power1', None, 'opm', transform='db', weight=0.5, reference=1e-3)])
+        channels = np.array([[100.0, 1e-3], [50.0, 1e-2], [0.0, -1.0]])
+        np.testing.assert_allclose([20.0, 15.0, -60.0], objective.score(channels))
+        self.assertAlmostEqual(20.0, objective.score(channels[0]))
+        objective.close()
+
+    def test_instruments_are_read_in_parallel(self):
+        smu, opm = _Instrument(0.05, [1.0, 2.0]), _Instrument(0.05, [10.0, 20.0, 30.0, 40.0])
+        objective = Objective([Signal('current', smu.read, smu), Signal('power1', opm.read, opm),
+                               Signal('power2', opm.read, opm)])
+        start = time.perf_counter()
+        reading = objective.read()
+        # the two power meter channels one after the other, alongside the source meter
+        self.assertLess(time.perf_counter() - start, 0.14)
+        np.testing.assert_array_equal([1.0, 10.0, 20.0], reading.channels)
+        self.assertEqual(31.0, reading.score)
+        np.testing.assert_array_equal([2.0, 30.0, 40.0], objective.read().channels)
+        self.assertNotEqual(smu.threads, opm.threads)
+        objective.close()
+
+    def test_sampler_averages_score_and_channels(self):
+        objective = Objective([Signal('current', iter([1.0, 3.0]).__next__),
+                               Signal('power1', iter([4.0, 8.0]).__next__, weight=0.5)])
+        sampler = SequentialSampler(max_samples=2, min_samples=2, relative_tolerance=0, absolute_tolerance=0)
+        sampler.attach(None, objective)
+        self.assertEqual(('current', 'power1'), sampler.channels)
+        sample = sampler.measure()
+        self.assertEqual(2, sample.count)
+        self.assertEqual(5.0, sample.mean)
+        self.assertEqual({'current': 2.0, 'power1': 6.0}, sample.channels)
+        sampler.detach()
+        self.assertEqual((), sampler.channels)
+
+    def test_invalid_signals(self):
+        with self.assertRaises(ValueError):
+            Objective([])
+        with self.assertRaises(ValueError):
+            Objective([Signal('current', None), Signal('current', None)])
+        with self.assertRaises(ValueError):
+            Objective([Signal('current', None, transform='log')])
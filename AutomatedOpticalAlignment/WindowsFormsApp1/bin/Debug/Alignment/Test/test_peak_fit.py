@@ -0,0 +1,49 @@
+from unittest import TestCase
+
+import numpy as np
+
+from Alignment.peak_fit import PeakFitError, brightest_point, fit_peak
+
+
+def gaussian_grid(peak, widths=(3.0, 4.0), shape=(21, 21), amplitude=5000.0, offset=10.0):
+    x, y = np.indices(shape)
+    return offset + amplitude * np.exp(-(x - peak[0]) ** 2 / (2 * widths[0] ** 2)
+                                       - (y - peak[1]) ** 2 / (2 * widths[1] ** 2))
+
+
+class TestPeakFit(TestCase):
+
+    def test_sub_step_position(self):
+        rng = np.random.default_rng(0)
+        for peak in ((12.3, 7.8), (2.4, 18.6)):
+            results = gaussian_grid(peak) + rng.normal(0, 20, (21, 21))
+            for model, tolerance in (('gaussian', 0.05), ('paraboloid', 0.1)):
+                fit = fit_peak(results, model)
+                self.assertEqual(model, fit.model)
+                self.assertAlmostEqual(peak[0], fit.x, delta=tolerance)
+                self.assertAlmostEqual(peak[1], fit.y, delta=tolerance)
+                self.assertGreater(fit.r_squared, 0.99)
+                self.assertLess(max(fit.sigma_x, fit.sigma_y), tolerance)
+
+    def test_masked_points(self):
+        results = gaussian_grid((10.4, 9.7))
+        mask = np.zeros(results.shape, dtype=bool)
+        mask[::2, ::2] = True
+        results[~mask] = 0
+        fit = fit_peak(results, 'gaussian', mask=mask)
+        self.assertAlmostEqual(10.4, fit.x, places=3)
+        self.assertAlmostEqual(9.7, fit.y, places=3)
+
+    def test_flat_readings(self):
+        for model in ('gaussian', 'paraboloid'):
+            with self.assertRaises(PeakFitError):
+                fit_peak(np.ones((11, 11)), model)
+
+    def test_brightest_point(self):
+        results = gaussian_grid((10.4, 9.7))
+        mask = np.ones(results.shape, dtype=bool)
+        mask[10, 10] = False
+        point = brightest_point(results, mask)
+        self.assertEqual(('grid', 0.0), (point.model, point.r_squared))
+        self.assertEqual((11, 10), (point.x, point.y))
+        self.assertTrue(np.isnan(brightest_point(np.full((3, 3), np.nan)).x))
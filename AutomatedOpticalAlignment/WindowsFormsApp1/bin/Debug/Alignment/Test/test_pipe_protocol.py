@@ -0,0 +1,83 @@
+from unittest import TestCase
+from io import BytesIO
+
+import numpy as np
+
+from Alignment.pipe_protocol import (COORD_DTYPE, HEADER, MAGIC, PROTOCOL_VERSION, FramedPipe, LegacyPipe,
+                                     MessageType, ProtocolError, open_pipe)
+
+
+class FakePipe:
+    """
+    Duplex stand-in for the named pipe: reads come from ``incoming`` in chunks, writes are collected
+    """
+    def __init__(self, incoming, chunk=None):
+        self._incoming = BytesIO(incoming)
+        self._chunk = chunk
+        self.written = bytearray()
+
+    def read(self, size):
+        if self._chunk is not None:
+            size = min(size, self._chunk)
+        return self._incoming.read(size)
+
+    def write(self, data):
+        self.written += data
+        return len(data)
+
+
+def frame(msg_type, payload=b'', count=0):
+    return HEADER.pack(MAGIC, PROTOCOL_VERSION, msg_type, count) + payload
+
+
+class TestPipeProtocol(TestCase):
+
+    def test_open_legacy(self):
+        pipe = open_pipe(FakePipe(bytes([1, 10])))
+        self.assertIsInstance(pipe, LegacyPipe)
+        self.assertEqual((1, 21), (pipe.mode, pipe.length))
+
+    def test_open_framed(self):
+        config = np.array([(3, 10)], dtype=[('mode', 'u1'), ('half_length', '>i2')]).tobytes()
+        pipe = open_pipe(FakePipe(frame(MessageType.CONFIG, config, 1), chunk=3))
+        self.assertIsInstance(pipe, FramedPipe)
+        self.assertNotIsInstance(pipe, LegacyPipe)
+        self.assertEqual((3, 21), (pipe.mode, pipe.length))
+
+    def test_legacy_messages(self):
+        fake = FakePipe(b'\x04\x07')
+        pipe = LegacyPipe(fake)
+        msg_type, coords = pipe.read_message()
+        self.assertEqual(MessageType.COORDS, msg_type)
+        self.assertEqual((4, 7), tuple(coords[0]))
+
+        for command, expected in ((b'kill', MessageType.KILL), (b'done', MessageType.DONE)):
+            self.assertEqual(expected, LegacyPipe(FakePipe(command)).read_message()[0])
+
+        pipe.write_readings(np.array([-2.7]))
+        pipe.write_move_on()
+        pipe.write_position(258)
+        pipe.write_folder_number(3)
+        self.assertEqual(b'\xff\xff\xff\xfekill\x01\x02\x00\x00\x00\x03', bytes(fake.written))
+
+    def test_framed_round_trip(self):
+        coords = np.array([(1, 2), (3, 4), (300, 5)], dtype=COORD_DTYPE)
+        fake = FakePipe(frame(MessageType.COORDS, coords.tobytes(), 3) + frame(MessageType.KILL), chunk=5)
+        pipe = FramedPipe(fake)
+
+        msg_type, received = pipe.read_message()
+        self.assertEqual(MessageType.COORDS, msg_type)
+        np.testing.assert_array_equal(coords, received)
+        self.assertEqual((MessageType.KILL, None), pipe.read_message())
+
+        pipe.write_readings([1.5, 2.5, 3.5])
+        expected = frame(MessageType.READINGS, np.array([1.5, 2.5, 3.5], dtype='>f8').tobytes(), 3)
+        self.assertEqual(expected, bytes(fake.written))
+
+    def test_framed_errors(self):
+        with self.assertRaises(ProtocolError):
+            FramedPipe(FakePipe(b'XX' + bytes(6))).read_message()
+        with self.assertRaises(ProtocolError):
+            FramedPipe(FakePipe(frame(MessageType.KILL))).expect(MessageType.COORDS)
+        with self.assertRaises(EOFError):
+            FramedPipe(FakePipe(frame(MessageType.COORDS, bytes(4), 2))).read_message()
@@ -0,0 +1,38 @@
+import os
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+
+from Alignment.render import MAX_SURFACE_POINTS, RenderPool, ScanRenderer
+
+
+class TestScanRenderer(TestCase):
+
+    def test_template_reused_across_scans(self):
+        renderer = ScanRenderer()
+        with tempfile.TemporaryDirectory() as directory:
+            for n, length in enumerate((5, 2 * MAX_SURFACE_POINTS + 1)):
+                base_path = os.path.join(directory, "scan{}".format(n))
+                results = np.random.default_rng(n).random((length, length))
+                paths = renderer.render(results, base_path, (0.9, 1.1, 0.9, 1.1))
+
+                self.assertEqual([base_path + "_ViewB.jpg", base_path + ".jpg"], paths)
+                self.assertTrue(all(os.path.getsize(path) > 0 for path in paths))
+                self.assertEqual((length, length), renderer.image.get_array().shape)
+                self.assertEqual(1, len(renderer.surface_axes.collections))
+            self.assertEqual(4, len(os.listdir(directory)))
+
+    def test_notification_on_a_closed_pipe_is_logged(self):
+        pool = RenderPool(name='TestRenderPool')
+        with tempfile.TemporaryDirectory() as directory:
+            with tempfile.TemporaryFile() as pipe_file:
+                pass
+
+            def notify(paths):
+                pipe_file.write(b"images ready")
+
+            with self.assertLogs('TestRenderPool', 'WARNING'):
+                pool.submit(np.ones((5, 5)), os.path.join(directory, "scan"), (0.9, 1.1, 0.9, 1.1),
+                            callback=notify).result()
+                pool.shutdown()
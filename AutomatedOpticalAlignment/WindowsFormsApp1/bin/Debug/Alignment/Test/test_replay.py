@@ -0,0 +1,62 @@
+import glob
+import os
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+
+from Alignment.replay import ReplayProfile, recorded_sequence, replay_strategies
+from Alignment.scan_store import ScanStore
+from Alignment.simulator import CouplingProfile, run_simulated_job
+
+
+class TestReplay(TestCase):
+
+    def setUp(self):
+        self._cwd = os.getcwd()
+        self._tmp = tempfile.TemporaryDirectory()
+        os.chdir(self._tmp.name)
+        for directory in ("Results/CSV_Data", "Results/JPG_Data"):
+            os.makedirs(directory)
+
+    def tearDown(self):
+        os.chdir(self._cwd)
+        self._tmp.cleanup()
+
+    def test_bilinear_function_is_reproduced(self):
+        x, y = np.meshgrid(np.arange(5.0), np.arange(4.0), indexing='ij')
+        profile = ReplayProfile(3 + 2 * x - y + 0.5 * x * y)
+        points = np.array([(0.5, 0.5), (3.25, 2.75), (4.0, 3.0)])
+        expected = 3 + 2 * points[:, 0] - points[:, 1] + 0.5 * points[:, 0] * points[:, 1]
+        np.testing.assert_allclose(expected, profile.measure(points))
+        np.testing.assert_allclose(profile.measure([(4, 0)]), profile.measure([(9, -2)]))
+
+    def test_volume_stops_at_last_layer_reached(self):
+        volume = np.full((3, 3, 4), np.nan)
+        volume[:, :, 0] = 10.0
+        volume[:, :, 1] = 20.0
+        volume[1, 1, 2] = 40.0
+        profile = ReplayProfile(volume)
+        self.assertEqual((3, 3, 3), profile.shape)
+        self.assertAlmostEqual(15.0, profile.reading([(0, 0, 0.5)])[0])
+        self.assertAlmostEqual(10.0, profile.reading([(0, 0, 2)])[0])
+        self.assertAlmostEqual(40.0, profile.reading([(1, 1, 7)])[0])
+
+    def test_sequence_follows_acquisition_order(self):
+        store = ScanStore.create((3, 3), fields=('sequence',))
+        for n, (x, y) in enumerate([(2, 2), (0, 1), (1, 0)]):
+            store.record(x, y, 10.0 * n, sequence=n)
+        points, readings = recorded_sequence(store)
+        self.assertEqual([[2, 2], [0, 1], [1, 0]], points.tolist())
+        self.assertEqual([0.0, 10.0, 20.0], readings.tolist())
+
+    def test_recorded_raster_replays_peak_search(self):
+        profile = CouplingProfile(peak=(12.3, 7.6), z_peak=0.0, width=4.0)
+        run_simulated_job(1, half_length=10, profile=profile, seed=0)
+        path, = glob.glob("Results/Scan_Store/*.json")
+        replay = ReplayProfile.from_store(path)
+        result = run_simulated_job(4, half_length=10, profile=replay, seed=0, options={'strategy': 'pattern'})
+        self.assertEqual((12, 8), (result.peak['x'], result.peak['y']))
+        (best, found), = replay_strategies([path], ['pattern', 'golden_section']).values()
+        self.assertEqual((12, 8), tuple(best))
+        self.assertEqual((12, 8), tuple(found['pattern'].position))
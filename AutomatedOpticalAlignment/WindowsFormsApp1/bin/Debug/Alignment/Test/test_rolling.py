@@ -0,0 +1,62 @@
+from unittest import TestCase
+
+import numpy as np
+
+from Alignment.rolling import RollingWindow
+from Alignment.scan_modes import POSITION_WINDOW, returned_to_start, rolling_average
+
+
+class TestRollingWindow(TestCase):
+
+    def test_statistics_of_last_rows(self):
+        values = np.random.RandomState(0).uniform(-5, 5, size=(50, 2))
+        window = RollingWindow(11, width=2)
+        for n, (x, y) in enumerate(values, 1):
+            window.append(x, y)
+            last = values[max(n - 11, 0):n]
+            np.testing.assert_allclose(last.mean(axis=0), window.mean)
+            np.testing.assert_allclose(last.var(axis=0), window.variance, atol=1e-9)
+            np.testing.assert_allclose(last.max(axis=0) - last.min(axis=0), window.spread)
+            np.testing.assert_array_equal(last[0], window.oldest)
+            np.testing.assert_array_equal(last[-1], window.newest)
+        self.assertTrue(window.full)
+        self.assertEqual(11, len(window))
+
+        window.clear()
+        self.assertEqual(0, len(window))
+        self.assertRaises(IndexError, lambda: window.newest)
+
+    def test_variance_with_large_offset(self):
+        values = 1e9 + np.random.RandomState(1).normal(0, 1, size=500)
+        window = RollingWindow(25)
+        for value in values:
+            window.append(value)
+        np.testing.assert_allclose(values[-25:].var(), window.variance, rtol=1e-6)
+        np.testing.assert_allclose(values[-25:].mean(), window.mean, rtol=1e-12)
+
+    def test_rolling_average_matches_halving_loop(self):
+        readings = [812, 40, 977, 5, 260, 613, 12, 398, 701, 150, 88]
+        window = RollingWindow(8)
+        for i, reading in enumerate(readings, 1):
+            window.append(reading)
+            expected = reading
+            if i > 9:
+                for j in range(1, 8):
+                    expected = (expected + readings[i - 1 - j]) / 2
+            self.assertAlmostEqual(expected, rolling_average(window, i))
+
+    def test_returned_to_start(self):
+        # round a 3x3 square: back at the first point after 10 moves
+        loop = [(1, 0), (2, 0), (2, 1), (2, 2), (1, 2), (0, 2), (0, 1), (0, 0), (1, 1), (0, 0), (1, 0)]
+        positions = RollingWindow(POSITION_WINDOW, width=2)
+        for x, y in loop[:-1]:
+            positions.append(x, y)
+            self.assertFalse(returned_to_start(positions))
+        positions.append(*loop[-1])
+        self.assertTrue(returned_to_start(positions))
+
+        # back at a point on the upper x edge of the loop
+        positions.clear()
+        for x, y in [(2, 1)] + loop[1:-1] + [(2, 1)]:
+            positions.append(x, y)
+        self.assertFalse(returned_to_start(positions))
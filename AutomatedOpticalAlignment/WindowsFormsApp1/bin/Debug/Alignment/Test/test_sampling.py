@@ -0,0 +1,43 @@
+from unittest import TestCase
+
+import numpy as np
+
+from Alignment.sampling import SequentialSampler
+
+
+class TestSequentialSampler(TestCase):
+
+    def setUp(self):
+        self.rng = np.random.default_rng(0)
+
+    def bursts(self, mean, sigma, burst=4):
+        return lambda: mean + sigma * self.rng.standard_normal(burst)
+
+    def test_single_reading_by_default(self):
+        sample = SequentialSampler().sample(lambda: [812.5])
+        self.assertEqual(812.5, sample.mean)
+        self.assertEqual(1, sample.count)
+        self.assertTrue(np.isnan(sample.stderr))
+
+    def test_quiet_point_stops_after_one_burst(self):
+        sampler = SequentialSampler(relative_tolerance=0.01, absolute_tolerance=5, max_samples=64, burst=4)
+        sample = sampler.sample(self.bursts(10.0, 1.0))
+        self.assertEqual(4, sample.count)
+        self.assertAlmostEqual(10.0, sample.mean, delta=2)
+
+    def test_noisy_point_is_averaged_to_tolerance(self):
+        sampler = SequentialSampler(relative_tolerance=0.01, absolute_tolerance=5, max_samples=256, burst=4)
+        sample = sampler.sample(self.bursts(5000.0, 100.0))
+        self.assertGreater(sample.count, 4)
+        self.assertLess(sample.count, 256)
+        self.assertLessEqual(sampler.z * sample.stderr, 0.01 * sample.mean)
+        self.assertAlmostEqual(5000.0, sample.mean, delta=50)
+
+    def test_max_samples_caps_the_readings(self):
+        sampler = SequentialSampler(relative_tolerance=0, absolute_tolerance=0, max_samples=12, burst=4)
+        readings = self.rng.standard_normal(12)
+        bursts = iter(readings.reshape(3, 4))
+        sample = sampler.sample(lambda: next(bursts))
+        self.assertEqual(12, sample.count)
+        self.assertAlmostEqual(readings.mean(), sample.mean)
+        self.assertAlmostEqual(readings.std(ddof=1) / np.sqrt(12), sample.stderr)
@@ -0,0 +1,75 @@
+import functools
+import os
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+
+from Alignment.pipe_protocol import MessageType, ProtocolError
+from Alignment.scan_modes import CounterSource, MultiLayer, ScanConfig, ScanEngine, SingleLayer
+
+
+class _ScriptedPipe:
+
+    def __init__(self, messages, length=5, mode=2):
+        self.messages = list(messages)
+        self.length = length
+        self.mode = mode
+        self.resume = False
+        self.dut_config = None
+        self.written = []
+
+    def read_message(self):
+        return self.messages.pop(0)
+
+    def write_readings(self, readings):
+        self.written.append(('readings', np.array(readings)))
+
+    def write_move_on(self):
+        self.written.append(('move_on', None))
+
+    def write_position(self, position):
+        self.written.append(('position', position))
+
+
+class TestScanEngine(TestCase):
+
+    def setUp(self):
+        self._cwd = os.getcwd()
+        self._tmp = tempfile.TemporaryDirectory()
+        os.chdir(self._tmp.name)
+
+    def tearDown(self):
+        os.chdir(self._cwd)
+        self._tmp.cleanup()
+
+    def test_single_layer_records_every_batch(self):
+        rows = [np.array([(x, y) for y in range(5)]) for x in range(5)]
+        pipe = _ScriptedPipe([(MessageType.COORDS, row) for row in rows] + [(MessageType.KILL, None)], mode=0)
+        job = ScanEngine(ScanConfig(CounterSource, SingleLayer, ()))(pipe, None)
+
+        self.assertEqual([list(range(2 + 5 * x, 7 + 5 * x)) for x in range(5)],
+                         [readings.tolist() for _, readings in pipe.written])
+        np.testing.assert_array_equal(np.arange(2, 27).reshape(5, 5), job.store.layer())
+        job.store.close()
+
+        pipe = _ScriptedPipe([(MessageType.DONE, None)])
+        with self.assertRaises(ProtocolError):
+            ScanEngine(ScanConfig(CounterSource, SingleLayer, ()))(pipe, None)
+
+    def test_multi_layer_moves_on_when_back_at_the_start(self):
+        loop = [(1, 1), (2, 1), (3, 1), (4, 1), (4, 2), (4, 3), (3, 3), (2, 3), (1, 3), (1, 2), (1, 1), (2, 1), (3, 1)]
+        pipe = _ScriptedPipe([(MessageType.COORDS, np.array(loop)), (MessageType.COORDS, np.array([(0, 0), (0, 1)])),
+                              (MessageType.DONE, None), (MessageType.KILL, None)])
+        policy = functools.partial(MultiLayer, threshold=lambda z: 0)
+        job = ScanEngine(ScanConfig(CounterSource, policy, ()))(pipe, None)
+
+        # the eleventh point closes the loop, the rest of the batch is dropped
+        self.assertEqual(('readings', list(range(2, 12))), (pipe.written[0][0], pipe.written[0][1].tolist()))
+        self.assertEqual(('move_on', None), pipe.written[1])
+        self.assertEqual(('readings', [1, 2]), (pipe.written[2][0], pipe.written[2][1].tolist()))
+        self.assertEqual(('position', 2), pipe.written[3])
+        self.assertEqual([0, 1], job.policy.layers)
+        self.assertEqual(10, np.count_nonzero(job.store.measured[:, :, 0]))  # (1, 1) twice
+        self.assertEqual({'z': 2, 'i': 0}, {key: job.store.header['checkpoint'][key] for key in ('z', 'i')})
+        job.store.close()
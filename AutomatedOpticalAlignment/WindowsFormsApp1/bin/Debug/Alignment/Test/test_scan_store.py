@@ -0,0 +1,75 @@
+import os
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+
+from Alignment.scan_store import ScanStore
+
+
+class TestScanStore(TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.directory = self._tmp.name
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_partial_scan_is_recoverable(self):
+        store = ScanStore.create((5, 5, 5), directory=self.directory, name='scan', mode=3)
+        store.record(1, 2, 7.5, layer=0)
+        store.record_many([(0, 0), (4, 4)], [1.0, 2.0], layer=1)
+        store.data.flush()
+
+        recovered = ScanStore.open(os.path.join(self.directory, 'scan.npy'))
+        self.assertEqual('running', recovered.header['status'])
+        self.assertEqual(3, recovered.header['mode'])
+        self.assertEqual(3, recovered.measured.sum())
+        self.assertEqual(7.5, recovered.data[1, 2, 0])
+        self.assertEqual(2.0, recovered.layer(1)[4, 4])
+        self.assertEqual(0.0, recovered.layer(1)[1, 1])
+
+        store.close(file_name='1_1_0.1', layers=2)
+        recovered = ScanStore.open(store.path)
+        self.assertEqual('complete', recovered.header['status'])
+        self.assertEqual(2, recovered.header['layers'])
+
+    def test_export_csv_and_unique_names(self):
+        first = ScanStore.create((3, 3), directory=self.directory, name='scan')
+        second = ScanStore.create((3, 3), directory=self.directory, name='scan')
+        self.assertNotEqual(first.path, second.path)
+
+        first.record(2, 1, 4.0)
+        file_path = os.path.join(self.directory, 'scan.csv')
+        first.export_csv(file_path)
+        expected = np.zeros((3, 3))
+        expected[2, 1] = 4.0
+        np.testing.assert_array_equal(expected, np.loadtxt(file_path, delimiter=','))
+
+    def test_latest_unfinished_checkpoint(self):
+        finished = ScanStore.create((3, 3, 3), directory=self.directory, mode=3)
+        finished.close()
+        self.assertIsNone(ScanStore.latest(self.directory, mode=3))
+
+        running = ScanStore.create((3, 3, 3), directory=self.directory, mode=3)
+        running.record(0, 0, 5.0, layer=1)
+        running.checkpoint(z=1, matrix_x=[0.0] * 11)
+
+        resumed = ScanStore.latest(self.directory, mode=3, shape=[3, 3, 3])
+        self.assertEqual(running.path, resumed.path)
+        self.assertEqual(1, resumed.header['checkpoint']['z'])
+        self.assertEqual(5.0, resumed.data[0, 0, 1])
+        self.assertIsNone(ScanStore.latest(self.directory, mode=2))
+
+    def test_fields_are_stored_with_the_readings(self):
+        store = ScanStore.create((3, 3), directory=self.directory, name='scan', fields=('count', 'stderr'))
+        store.record(0, 1, 812.5, count=12, stderr=3.5)
+        store.record_many([(2, 2)], [4.0], count=[4], stderr=[0.25])
+        store.close()
+
+        reopened = ScanStore.open(store.path)
+        self.assertEqual(['count', 'stderr'], reopened.header['fields'])
+        self.assertEqual(12, reopened.fields['count'][0, 1])
+        self.assertEqual(0.25, reopened.layer(field='stderr')[2, 2])
+        self.assertEqual(0.0, reopened.layer(field='count')[1, 1])
@@ -0,0 +1,54 @@
+from types import SimpleNamespace
+from unittest import TestCase
+
+import numpy as np
+
+from Alignment.pipe_protocol import SEARCH_CONFIG_DTYPE, ProtocolError
+from Alignment.scan_modes import search_strategy
+from Alignment.search import SEARCH_STRATEGIES, GoldenSection, SearchObjective, compare_strategies
+
+
+def gaussian(peak, width=8.0, amplitude=5000.0):
+    def measure(points):
+        distance = ((np.asarray(points) - np.asarray(peak)) ** 2).sum(axis=1)
+        return amplitude * np.exp(-distance / (2 * width ** 2))
+    return measure
+
+
+class TestSearch(TestCase):
+
+    def test_strategies_find_peak(self):
+        bounds = ((0, 0), (40, 40))
+        for peak in ((23, 18), (3, 37), (40, 0)):
+            results = compare_strategies(gaussian(peak), (20, 20), bounds)
+            self.assertEqual(set(SEARCH_STRATEGIES), set(results))
+            for name, result in results.items():
+                self.assertEqual(peak, result.position, name)
+                self.assertLess(result.measurements, 41 * 41 // 10, name)
+
+    def test_objective_cache_and_budget(self):
+        calls = []
+
+        def measure(points):
+            calls.append(len(points))
+            return np.ones(len(points))
+
+        objective = SearchObjective(measure, ((0, 0), (10, 10)), max_measurements=3)
+        objective([(1, 1), (1, 1), (2, 2)])
+        objective([(2, 2), (-5, 20)])
+        self.assertEqual([2, 1], calls)
+        self.assertTrue(objective.exhausted)
+        self.assertEqual([1, -np.inf], list(objective([(0, 10), (5, 5)])))
+
+    def test_golden_section_measures_one_point_per_step(self):
+        for peak in (0, 7, 61, 100):
+            objective = SearchObjective(gaussian((peak, 50), width=30.0), ((0, 0), (100, 100)))
+            position = GoldenSection._line_search(objective, np.array([50, 50]), 0)
+            self.assertEqual([peak, 50], position.tolist())
+            # about log(100 / 2) / log(phi) = 8 steps, one reading each, and the final bracket
+            self.assertLessEqual(objective.measurements, 11)
+
+    def test_unknown_strategy_id(self):
+        config = np.array([(len(SEARCH_STRATEGIES), 5, 5)], dtype=SEARCH_CONFIG_DTYPE)[0]
+        with self.assertRaises(ProtocolError):
+            search_strategy(SimpleNamespace(search_config=config, length=11))
@@ -0,0 +1,161 @@
+import os
+import socket
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+
+from Alignment.pipe_protocol import FramedPipe, MessageType
+from Alignment.catalog import ScanCatalog
+from Alignment.simulator import CouplingProfile, SimulatedBench, SimulatedGui, run_simulated_job
+
+
+class TestSimulator(TestCase):
+
+    def setUp(self):
+        self._cwd = os.getcwd()
+        self._tmp = tempfile.TemporaryDirectory()
+        os.chdir(self._tmp.name)
+        for directory in ("Results/CSV_Data", "Results/JPG_Data"):
+            os.makedirs(directory)
+
+    def tearDown(self):
+        os.chdir(self._cwd)
+        self._tmp.cleanup()
+
+    def test_repeated_scans_get_numbered_names(self):
+        for _ in range(2):
+            run_simulated_job(0, half_length=2)
+            run_simulated_job(3, half_length=2)
+        self.assertTrue(all(os.path.exists(path) for path in ("Results/CSV_Data/1_1_0.1.csv",
+                                                              "Results/CSV_Data/1_1_0.1_1.csv")))
+        for folder in ("Multi-Layer-Scan", "Multi-Layer-Scan_1"):
+            self.assertEqual(["1_1_0.1_Layer{}.csv".format(l) for l in range(3)],
+                             sorted(name for name in os.listdir("Results/CSV_Data/" + folder) if "_Layer" in name))
+        scans = ScanCatalog().scans()
+        self.assertEqual(["multi_layer", "single"] * 2, [scan['kind'] for scan in scans])
+        self.assertEqual([3, None] * 2, [scan['layers'] for scan in scans])
+
+    def test_failed_peak_fit_reports_brightest_point(self):
+        # no light: neither model fits, the client still gets a PEAK_FIT instead of waiting forever
+        for mode in (1, 5):
+            peak = run_simulated_job(mode, half_length=5, profile=CouplingProfile(amplitude=0.0)).peak
+            self.assertEqual(0.0, peak['r_squared'])
+            self.assertTrue(np.isnan(peak['sigma_x']) and np.isnan(peak['sigma_y']))
+            self.assertTrue(0 <= peak['x'] <= 10 and 0 <= peak['y'] <= 10)
+
+    def test_small_window_keeps_the_default_peak_inside(self):
+        peak = run_simulated_job(1, half_length=5).peak
+        self.assertGreater(peak['r_squared'], 0.9)
+        self.assertAlmostEqual(5.6, peak['x'], delta=0.2)
+        self.assertAlmostEqual(4.6, peak['y'], delta=0.2)
+
+    def test_gui_stops_waiting_for_a_missing_peak_fit(self):
+        script_end, gui_end = socket.socketpair()
+        with script_end, gui_end, gui_end.makefile('rwb', buffering=0) as gui_file:
+            gui = SimulatedGui(FramedPipe(gui_file), SimulatedBench())
+            gui.fit_timeout = 0.05
+            self.assertIsNone(gui.receive_peak_fit())
+
+    def test_search_is_reproducible(self):
+        first = run_simulated_job(4, half_length=10, seed=3, options={'strategy': 'hill_climb'})
+        second = run_simulated_job(4, half_length=10, seed=3, options={'strategy': 'hill_climb'})
+        self.assertEqual(first.peak.tolist(), second.peak.tolist())
+        self.assertEqual(first.reads, first.moves)
+        self.assertAlmostEqual(first.reads * 0.03, first.simulated_time)
+
+    def test_adaptive_scan_fits_profile_peak(self):
+        profile = CouplingProfile(peak=(12.3, 7.6), z_peak=0.0, width=4.0)
+        result = run_simulated_job(5, half_length=10, profile=profile, seed=0)
+        self.assertLess(result.reads, 21 * 21)
+        self.assertAlmostEqual(12.3, result.peak['x'], delta=0.05)
+        self.assertAlmostEqual(7.6, result.peak['y'], delta=0.05)
+
+    def test_fly_scan_is_faster_than_raster(self):
+        profile = CouplingProfile(peak=(12.3, 7.6), z_peak=0.0, width=4.0)
+        raster = run_simulated_job(1, half_length=10, profile=profile, seed=0)
+        fly = run_simulated_job(6, half_length=10, profile=profile, seed=0)
+        self.assertEqual(2 * 21, fly.moves)
+        self.assertLess(fly.simulated_time, raster.simulated_time / 2)
+        self.assertAlmostEqual(12.3, fly.peak['x'], delta=0.05)
+        self.assertAlmostEqual(7.6, fly.peak['y'], delta=0.05)
+
+    def test_first_light_hands_off_to_search(self):
+        profile = CouplingProfile(peak=(3.2, 17.1), z_peak=0.0, width=2.0)
+        result = run_simulated_job(4, half_length=10, profile=profile, seed=0,
+                                   options={'strategy': 'pattern', 'first_light': 'spiral'})
+        light = result.messages[MessageType.FIRST_LIGHT][0]
+        self.assertEqual(1, light['found'])
+        self.assertEqual((3, 17), (result.peak['x'], result.peak['y']))
+        self.assertEqual(result.reads, result.peak['measurements'])
+
+    def test_baseline_removes_drifting_dark_current(self):
+        profile = CouplingProfile(peak=(12.3, 7.6), z_peak=0.0, width=4.0, background=2e-9, background_drift=2e-10)
+        result = run_simulated_job(1, half_length=10, profile=profile, seed=0,
+                                   options={'baseline': (0, 20), 'baseline_interval': 50})
+        self.assertGreater(result.reads, 21 * 21)
+        self.assertAlmostEqual(12.3, result.peak['x'], delta=0.01)
+        self.assertAlmostEqual(7.6, result.peak['y'], delta=0.01)
+        self.assertAlmostEqual(5000, result.peak['value'], delta=100)
+
+    def test_focus_search_follows_tilted_peak(self):
+        profile = CouplingProfile(peak=(10.0, 10.0), z_peak=2.0, width=3.0, tilt=0.3, mode_field=1.0,
+                                  relative_noise=0.0)
+        result = run_simulated_job(7, half_length=10, profile=profile, seed=0, options={'focus': (-4.0, 8.0, 0.25)})
+        self.assertAlmostEqual(2.0, result.peak['z'], delta=0.25)
+        self.assertEqual(profile.peak.round().tolist(), [result.peak['x'], result.peak['y']])
+        self.assertLessEqual(result.peak['layers'], 10)
+
+    def test_tracking_follows_drifting_peak(self):
+        profile = CouplingProfile(peak=(10.0, 10.0), z_peak=0.0, width=3.0, drift=(0.1, -0.06))
+        result = run_simulated_job(8, half_length=10, profile=profile, seed=0,
+                                   options={'track': (10.3, 9.8), 'gain': 2.25, 'cycles': 100})
+        self.assertEqual(100, len(result.messages['track']))
+        last = result.messages['track'][-1]
+        peak = profile.peak_position(t=result.simulated_time)
+        self.assertGreater(np.hypot(*(peak - (10.3, 9.8))), 0.5)
+        self.assertLess(np.hypot(last['x'] - peak[0], last['y'] - peak[1]), 0.2)
+
+    def test_warm_start_from_history_needs_fewer_points(self):
+        profile = CouplingProfile(peak=(26.2, 15.3), z_peak=0.0, width=5.0)
+        runs, reads = [], []
+        for seed in range(4):
+            result = run_simulated_job(4, half_length=20, profile=profile, seed=seed,
+                                       options={'recipe': 'A', 'warm_start': True})
+            runs.append(result.messages[MessageType.PRIOR][0]['runs'])
+            reads.append(result.reads)
+            self.assertEqual((26, 15), (result.peak['x'], result.peak['y']))
+        self.assertEqual([0, 0, 0, 3], runs)
+        self.assertLess(reads[3], reads[0] / 2)
+
+    def test_warm_start_narrows_the_raster_window(self):
+        profile = CouplingProfile(peak=(26.2, 15.3), z_peak=0.0, width=3.0)
+        runs, reads = [], []
+        for seed in range(4):
+            result = run_simulated_job(1, half_length=20, profile=profile, seed=seed,
+                                       options={'recipe': 'A', 'warm_start': True})
+            runs.append(result.messages[MessageType.PRIOR][0]['runs'])
+            reads.append(result.reads)
+            self.assertAlmostEqual(26.2, result.peak['x'], delta=0.3)
+            self.assertAlmostEqual(15.3, result.peak['y'], delta=0.3)
+        self.assertEqual([0, 0, 0, 3], runs)
+        self.assertEqual(41 * 41, reads[0])
+        self.assertLess(reads[3], reads[0] / 4)
+
+    def test_worker_keeps_the_last_run(self):
+        result = run_simulated_job(1, half_length=5)
+        self.assertEqual(1, result.run.mode)
+        self.assertEqual((result.peak['x'], result.peak['y']), result.run.peak)
+        self.assertEqual(121, result.run.points)
+        self.assertTrue(os.path.exists(result.run.store + ".npy"))
+        self.assertIsNone(run_simulated_job(2, half_length=5).run)
+
+    def test_objective_aligns_to_power_meter(self):
+        photocurrent = CouplingProfile(peak=(22.3, 18.6), z_peak=0.0, width=5.0)
+        power = CouplingProfile(peak=(12.2, 25.3), z_peak=0.0, width=5.0)
+        result = run_simulated_job(4, half_length=20, profile=photocurrent,
+                                   options={'objective': [(1, 'db', 1.0, 1e-9)], 'power_profile': power})
+        self.assertEqual((12, 25), (result.peak['x'], result.peak['y']))
+        result = run_simulated_job(4, half_length=20, profile=photocurrent, options={
+            'objective': [(0, 'linear', 1.0, 0), (1, 'linear', 0.01, 1e-12)], 'power_profile': power})
+        self.assertEqual((22, 19), (result.peak['x'], result.peak['y']))
@@ -0,0 +1,163 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from unittest import TestCase
+from unittest.mock import patch
+
+import numpy as np
+
+from COMMON.Equipment.SourceMeter.Keithley24XX.keithley_2400 import Keithley2400
+
+from Alignment.history import Run
+from Alignment.stations import (SharedBusVISA, Station, StationLine, bus_lock, controller, read_stations,
+                                station_worker)
+
+
+class _SlowHandle:
+
+    def __init__(self):
+        self.active = 0
+        self.overlap = 0
+        self._count_lock = threading.Lock()
+
+    def query(self, message):
+        with self._count_lock:
+            self.active += 1
+            self.overlap = max(self.overlap, self.active)
+        time.sleep(0.01)
+        with self._count_lock:
+            self.active -= 1
+        return message
+
+
+class _BurstHandle:
+
+    def __init__(self, lock):
+        self.lock = lock
+        self.read_termination = "\n"
+        self.locked_reads = []
+        self.locked_polls = []
+        self.ready_at = 0.0
+
+    def write(self, message):
+        pass
+
+    def query(self, message):
+        return '0,"No error"' if message == 'SYST:ERR?' else '0'
+
+    def read_stb(self):
+        self.locked_polls.append(self.lock.locked())
+        return 0x20 if time.perf_counter() >= self.ready_at else 0
+
+    def query_binary_values(self, message, **kwargs):
+        self.locked_reads.append((message, self.lock.locked(), self.read_termination))
+        return np.arange(4.0)
+
+
+class TestStations(TestCase):
+
+    def test_read_stations(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "Stations.json")
+            with open(path, "w") as f:
+                json.dump([{'name': "A", 'address': "10.0.0.1", 'gpib': 9, 'pipe': "NPtest_A", 'recipe': "SOA"},
+                           {'name': "B", 'address': "GPIB0::10::INSTR", 'pipe': "NPtest_B", 'warm_start': True}], f)
+            stations = read_stations(path)
+            self.assertEqual(Station("A", "TCPIP0::10.0.0.1::gpib0,9::INSTR", r"\\.\pipe\NPtest_A", "SOA", False),
+                             stations[0])
+            self.assertEqual(Station("B", "GPIB0::10::INSTR", r"\\.\pipe\NPtest_B", "", True), stations[1])
+
+            with open(path, "w") as f:
+                json.dump([{'name': "A", 'address': "10.0.0.1", 'pipe': "NPtest"},
+                           {'name': "B", 'address': "10.0.0.1", 'gpib': 10, 'pipe': "NPtest"}], f)
+            with self.assertRaises(ValueError):
+                read_stations(path)
+
+    def test_instruments_on_one_controller_share_a_lock(self):
+        self.assertEqual("TCPIP0::10.0.0.1::GPIB0", controller("TCPIP0::10.0.0.1::gpib0,9::INSTR"))
+        self.assertIs(bus_lock("TCPIP0::10.0.0.1::gpib0,9::INSTR"), bus_lock("TCPIP0::10.0.0.1::gpib0,10::INSTR"))
+        self.assertIs(bus_lock("GPIB0::9::INSTR"), bus_lock("GPIB0::10::INSTR"))
+        self.assertIsNot(bus_lock("TCPIP0::10.0.0.1::gpib0,9::INSTR"), bus_lock("TCPIP0::10.0.0.2::gpib0,9::INSTR"))
+
+    def test_shared_bus_serialises_transactions(self):
+        handle = _SlowHandle()
+        lock = threading.RLock()
+        sessions = [SharedBusVISA(lock), SharedBusVISA(lock)]
+        for session in sessions:
+            session.visa_handle = handle
+        threads = [threading.Thread(target=lambda s=session: [s.query("READ?") for _ in range(5)])
+                   for session in sessions]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(1, handle.overlap)
+
+    def test_burst_fetch_holds_the_bus_lock(self):
+        lock = threading.Lock()
+        interface = SharedBusVISA(lock)
+        handle = interface.visa_handle = _BurstHandle(lock)
+        current = Keithley2400("GPIB0::9::INSTR", interface=interface).channel[1].measure.current
+        current.arm(2, timestamps=True)
+        np.testing.assert_array_equal([[0, 1], [2, 3]], current.fetch(timeout=1))
+        self.assertEqual([(":TRAC:DATA?", True, None)], handle.locked_reads)
+        self.assertEqual("\n", handle.read_termination)
+
+    @patch('Alignment.stations.open_power_meter')
+    def test_power_meter_shares_the_bus_lock(self, mock_power_meter):
+        station = Station("A", "GPIB0::9::INSTR", r"\\.\pipe\NPtest_A", "SOA", False, ("GPIB0::20::INSTR", 1))
+        station_worker(station)
+        (address, slot), kwargs = mock_power_meter.call_args
+        self.assertEqual(("GPIB0::20::INSTR", 1), (address, slot))
+        self.assertIsInstance(kwargs['interface'], SharedBusVISA)
+        self.assertIs(bus_lock("GPIB0::9::INSTR"), kwargs['interface'].lock)
+
+    def test_burst_wait_releases_the_bus(self):
+        lock = threading.Lock()
+        interface = SharedBusVISA(lock)
+        handle = interface.visa_handle = _BurstHandle(lock)
+        current = Keithley2400("GPIB0::9::INSTR", interface=interface).channel[1].measure.current
+        other = SharedBusVISA(lock)
+        other.visa_handle = _SlowHandle()
+        current.arm(4)
+
+        answered = []
+
+        def station_b():
+            time.sleep(0.05)    # once the burst was started
+            answered.extend(other.query("READ?") for _ in range(5))
+            answered.append(time.perf_counter())
+
+        handle.ready_at = time.perf_counter() + 0.5
+        thread = threading.Thread(target=station_b)
+        thread.start()
+        current.fetch(timeout=5)
+        thread.join()
+
+        # the other station was served while the burst was running, and every poll took the bus
+        self.assertEqual(["READ?"] * 5, answered[:5])
+        self.assertLess(answered[5], handle.ready_at)
+        self.assertGreater(len(handle.locked_polls), 1)
+        self.assertTrue(all(handle.locked_polls))
+        self.assertEqual([(":TRAC:DATA?", True, None)], handle.locked_reads)
+
+    def test_line_stops_while_waiting_for_the_gui(self):
+        with tempfile.TemporaryDirectory() as directory:
+            stations = [Station(name, "TCPIP0::10.0.0.1::gpib0,{}::INSTR".format(9 + i),
+                                os.path.join(directory, "missing_" + name), "SOA")
+                        for i, name in enumerate("AB")]
+            line = StationLine(stations, retry_interval=0.01)
+            line.start()
+            time.sleep(0.05)
+            line.stop()
+            self.assertTrue(line.join(timeout=5))
+            self.assertEqual([("A", 0, 0), ("B", 0, 0)],
+                             [(row['name'], row['jobs'], row['failures']) for row in line.summary()])
+            self.assertEqual([(0, None, None), (0, None, None)],
+                             [(row['peaks'], row['peak'], row['store']) for row in line.summary()])
+
+            line.workers["B"].peaks, line.workers["B"].last_run = 2, Run(1, (10.2, 9.8), 4800.0, 441, 1.5, "B_1")
+            self.assertEqual({'peaks': 2, 'mode': 1, 'peak': (10.2, 9.8), 'value': 4800.0, 'store': "B_1"},
+                             {key: line.summary()[1][key] for key in ('peaks', 'mode', 'peak', 'value', 'store')})
@@ -0,0 +1,60 @@
+import os
+import tempfile
+from types import SimpleNamespace
+from unittest import TestCase
+
+import numpy as np
+
+from Alignment.timing import ERROR_CHECK, MEASURE, LatencyRecorder
+
+
+class FakeInterface:
+
+    def __init__(self):
+        self.calls = 0
+
+    def error_checking(self):
+        self.calls += 1
+
+
+class TestLatencyRecorder(TestCase):
+
+    def test_ring_buffer_and_summary(self):
+        timer = LatencyRecorder(capacity=4)
+        for duration in range(1, 7):
+            timer.record(MEASURE, timer.now() - duration * 1000)
+        self.assertEqual(6, timer.counts[MEASURE])
+        # recorded durations include the time between the two clock reads, at most a scheduler slice
+        overhead = timer.durations(MEASURE) / 1000 - [3, 4, 5, 6]
+        self.assertTrue(np.all((overhead >= 0) & (overhead < 10000)), overhead)
+
+        summary = timer.summary()
+        self.assertEqual(['measure'], list(summary))
+        self.assertEqual(6, summary['measure']['count'])
+        self.assertGreaterEqual(summary['measure']['p50'], 4.5)
+
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, 'timing.csv')
+            timer.write_summary(file_path)
+            with open(file_path) as f:
+                lines = f.read().splitlines()
+        self.assertEqual('phase,count,mean_us,p50_us,p95_us,p99_us,max_us', lines[0])
+        self.assertTrue(lines[1].startswith('measure,6,'))
+
+    def test_live_reports(self):
+        reports = []
+        timer = LatencyRecorder(report_interval=5, report=reports.append)
+        for points in (3, 3, 3, 1):
+            timer.tick(points)
+        self.assertEqual([timer, timer], reports)
+
+    def test_error_checking_timed_while_attached(self):
+        interface = FakeInterface()
+        timer = LatencyRecorder()
+        timer.attach(SimpleNamespace(_interface=interface))
+        interface.error_checking()
+        timer.detach()
+        interface.error_checking()
+        self.assertEqual(2, interface.calls)
+        self.assertEqual(1, timer.counts[ERROR_CHECK])
+        self.assertNotIn('error_checking', vars(interface))
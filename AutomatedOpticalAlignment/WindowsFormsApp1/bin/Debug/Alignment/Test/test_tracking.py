@@ -0,0 +1,37 @@
+from unittest import TestCase
+
+import numpy as np
+
+from Alignment.tracking import DitherLockIn
+
+
+def gaussian(positions, peak=(1.0, -0.5), width=3.0):
+    return 100 + 5000 * np.exp(-2 * ((positions - np.asarray(peak)) ** 2).sum(axis=1) / width ** 2)
+
+
+class TestDitherLockIn(TestCase):
+
+    def test_gradient_of_a_plane_is_exact(self):
+        lock_in = DitherLockIn(amplitude=0.1, points=6)
+        positions = lock_in.positions((2.0, 3.0))
+        gradient, mean = lock_in.demodulate(50 + positions @ np.array([3.0, -2.0]))
+        np.testing.assert_allclose([3.0, -2.0], gradient)
+        self.assertAlmostEqual(50 + 2 * 3.0 - 3 * 2.0, mean)
+
+    def test_converges_on_the_peak(self):
+        lock_in = DitherLockIn(amplitude=0.2, gain=2.25)
+        centre = np.array([-1.0, 1.0])
+        for _ in range(20):
+            step = lock_in.update(centre, gaussian(lock_in.positions(centre)))
+            centre = step.centre
+        np.testing.assert_allclose([1.0, -0.5], centre, atol=0.02)
+        self.assertLess(step.error, 0.01)
+
+    def test_step_is_limited(self):
+        lock_in = DitherLockIn(amplitude=0.2, gain=100.0)
+        step = lock_in.update((3.0, -0.5), gaussian(lock_in.positions((3.0, -0.5))))
+        np.testing.assert_allclose([2.8, -0.5], step.centre)
+
+    def test_needs_three_points(self):
+        with self.assertRaises(ValueError):
+            DitherLockIn(amplitude=0.2, points=2)
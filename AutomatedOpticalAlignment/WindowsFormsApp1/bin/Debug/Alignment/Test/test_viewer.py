@@ -0,0 +1,61 @@
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+from unittest import TestCase
+
+import numpy as np
+
+from Alignment.viewer import CSV_DIR, cache_path, decimate, load_results, scan_extent, show_map
+
+
+class TestViewer(TestCase):
+
+    def test_load_results_writes_and_maps_the_cache(self):
+        results = np.random.default_rng(0).random((7, 5))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "1_2_0.1.csv")
+            np.savetxt(path, results, delimiter=",")
+
+            np.testing.assert_allclose(results, load_results(path))
+            self.assertTrue(os.path.exists(cache_path(path)))
+            cached = load_results(path)
+            self.assertIsInstance(cached, np.memmap)
+            np.testing.assert_allclose(results, cached)
+            del cached
+
+            # a CSV rewritten after the cache is parsed again
+            time.sleep(0.01)
+            np.savetxt(path, 2 * results, delimiter=",")
+            os.utime(cache_path(path), (0, 0))
+            np.testing.assert_allclose(2 * results, load_results(path))
+
+    def test_decimate_keeps_the_peak(self):
+        results = np.zeros((1000, 999))
+        results[613, 402] = 5.0
+        results[0, 0] = np.nan
+        shown = decimate(results, 100)
+        self.assertEqual((100, 100), shown.shape)
+        self.assertEqual(5.0, shown[61, 40])
+        self.assertEqual(0.0, shown[0, 0])
+        self.assertIs(results, decimate(results, 1000))
+
+    def test_cursor_reads_the_full_grid(self):
+        results = np.arange(1000 * 1000, dtype=float).reshape(1000, 1000)
+        with tempfile.TemporaryDirectory() as directory:
+            os.makedirs(os.path.join(directory, CSV_DIR))
+            np.save(os.path.join(directory, CSV_DIR, "1_1_0.001.npy"), results)
+            open(os.path.join(directory, CSV_DIR, "1_1_0.001.csv"), "w").close()
+            os.utime(os.path.join(directory, CSV_DIR, "1_1_0.001.csv"), (0, 0))
+
+            fig, readout = show_map("1_1_0.001", directory, show=False)
+            XStart, XEnd, YStart, YEnd = scan_extent("1_1_0.001", results.shape)
+            self.assertEqual(results.shape[0], fig.axes[1].images[0].get_array().shape[0] * 2)
+            fig.canvas.draw()
+
+            event = SimpleNamespace(inaxes=readout.image_axes, xdata=XStart + 0.0105, ydata=YStart + 0.0204)
+            readout.update(event)
+            self.assertEqual((20, 10), readout.cell(event.xdata, event.ydata))
+            self.assertTrue(readout.text.get_text().endswith("I={:.4f}e-11 A".format(results[20, 10])))
+            readout.update(SimpleNamespace(inaxes=None, xdata=None, ydata=None))
+            self.assertEqual(readout.default_text, readout.text.get_text())
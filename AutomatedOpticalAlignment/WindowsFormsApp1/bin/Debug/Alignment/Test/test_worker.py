@@ -0,0 +1,25 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from Alignment.worker import DEFAULT_SMU_SETTINGS, AlignmentWorker
+
+
+class TestAlignmentWorker(TestCase):
+
+    @patch('Alignment.worker.Keithley2400')
+    def test_configure_smu_only_on_change(self, mock_keithley):
+        worker = AlignmentWorker('TCPIP0::0.0.0.0::gpib0,9::INSTR')
+
+        worker.configure_smu(DEFAULT_SMU_SETTINGS)
+        worker.configure_smu(DEFAULT_SMU_SETTINGS)
+        mock_keithley.assert_called_once_with('TCPIP0::0.0.0.0::gpib0,9::INSTR')
+        self.assertEqual(1, mock_keithley.return_value.connect.call_count)
+
+        worker.configure_smu(DEFAULT_SMU_SETTINGS._replace(voltage_setpoint=2))
+        self.assertEqual(2, mock_keithley.return_value.connect.call_count)
+        self.assertEqual(2, mock_keithley.return_value.channel[1].source.voltage.setpoint)
+
+        worker.close()
+        mock_keithley.return_value.disconnect.assert_called_once_with()
+        worker.configure_smu(DEFAULT_SMU_SETTINGS)
+        self.assertEqual(3, mock_keithley.return_value.connect.call_count)
@@ -0,0 +1,128 @@
+"""
+Coarse-to-fine adaptive scan of the square scan window.
+
+The window is first sampled on a coarse lattice. The centre of every cell is measured and the
+cell is split into up to four children only where the signal has structure, i.e. the centre
+reading departs from the bilinear prediction of the corners (curvature or a hidden feature),
+or where the cell holds the best readings seen so far. This repeats level by level until the
+refined cells are one grid step wide. Flat background away from the peak is left at the coarse pitch and the dense
+``results`` matrix written to the CSV/JPG outputs is rebuilt by bilinear interpolation over the
+leaf cells.
+
+The coarse step has to be smaller than the width of the coupling peak, otherwise a peak falling
+entirely between coarse samples is not seen.
+
+::
+
+    >>> scan = adaptive_scan(measure, length=41, initial_step=8)
+    >>> scan.results.shape, scan.measurements
+    ((41, 41), 161)
+"""
+import logging
+from collections import namedtuple
+
+import numpy as np
+
+
+AdaptiveScan = namedtuple('AdaptiveScan', ['results', 'sampled', 'measurements'])
+
+logger = logging.getLogger(__name__)
+
+
+def _axis_edges(length, step):
+    """
+    :return: coarse lattice coordinates along one axis, always including both ends
+    :rtype: list of int
+    """
+    edges = list(range(0, length - 1, step))
+    return edges + [length - 1]
+
+
+def _split(low, high):
+    """
+    :return: sub-intervals of a closed integer interval, halved if it is wider than one step
+    :rtype: list of (int, int)
+    """
+    if high - low <= 1:
+        return [(low, high)]
+    middle = (low + high) // 2
+    return [(low, middle), (middle, high)]
+
+
+def _serpentine(points):
+    """
+    Order points row by row with alternating direction to keep motor travel short
+
+    :param points: grid points
+    :type points: numpy.ndarray
+    :return: reordered points
+    :rtype: numpy.ndarray
+    """
+    direction = np.where(points[:, 0] % 2 == 0, 1, -1)
+    return points[np.lexsort((direction * points[:, 1], points[:, 0]))]
+
+
+def adaptive_scan(measure, length, initial_step=8, threshold=0.05):
+    """
+    Scan a ``length`` x ``length`` window, refining only where the signal has structure
+
+    :param measure: callable returning readings for an (n, 2) array of grid points
+    :type measure: callable
+    :param length: edge length of the scan window in grid points
+    :type length: int
+    :param initial_step: pitch of the coarse lattice in grid points
+    :type initial_step: int
+    :param threshold: a cell is refined when its centre differs from the mean of its corners by
+        more than this fraction of the overall spread, or its best corner is within this fraction
+        of the maximum
+    :type threshold: float
+    :return: dense interpolated readings, mask of measured points and their number
+    :rtype: AdaptiveScan
+    """
+    values = np.full((length, length), np.nan)
+
+    def sample(points):
+        points = np.array(sorted(set(points)), dtype=int).reshape(-1, 2)
+        points = points[np.isnan(values[points[:, 0], points[:, 1]])]
+        if len(points):
+            points = _serpentine(points)
+            values[points[:, 0], points[:, 1]] = measure(points)
+
+    xs = _axis_edges(length, max(int(initial_step), 1))
+    cells = [(x0, x1, y0, y1) for x0, x1 in zip(xs, xs[1:]) for y0, y1 in zip(xs, xs[1:])]
+    sample([(x, y) for x in xs for y in xs])
+
+    leaves = []
+    while cells:
+        sample([((x0 + x1) // 2, (y0 + y1) // 2) for x0, x1, y0, y1 in cells])
+        low, high = np.nanmin(values), np.nanmax(values)
+        span = high - low
+        refine = []
+        for cell in cells:
+            x0, x1, y0, y1 = cell
+            corners = values[[x0, x0, x1, x1], [y0, y1, y0, y1]]
+            error = abs(values[(x0 + x1) // 2, (y0 + y1) // 2] - corners.mean())
+            if x1 - x0 <= 1 and y1 - y0 <= 1:
+                leaves.append(cell)
+            elif span > 0 and (error > threshold * span or corners.max() >= high - threshold * span):
+                refine.append(cell)
+            else:
+                leaves.append(cell)
+
+        cells = [(cx0, cx1, cy0, cy1) for x0, x1, y0, y1 in refine
+                 for cx0, cx1 in _split(x0, x1) for cy0, cy1 in _split(y0, y1)]
+        sample([(x, y) for x0, x1, y0, y1 in cells for x in (x0, x1) for y in (y0, y1)])
+
+    sampled = ~np.isnan(values)
+    results = values.copy()
+    for x0, x1, y0, y1 in leaves:
+        u = np.linspace(0, 1, x1 - x0 + 1)[:, None]
+        v = np.linspace(0, 1, y1 - y0 + 1)[None, :]
+        patch = ((1 - u) * (1 - v) * values[x0, y0] + (1 - u) * v * values[x0, y1] +
+                 u * (1 - v) * values[x1, y0] + u * v * values[x1, y1])
+        block = results[x0:x1 + 1, y0:y1 + 1]
+        block[np.isnan(block)] = patch[np.isnan(block)]
+
+    measurements = int(sampled.sum())
+    logger.info("Adaptive scan measured {} of {} points".format(measurements, length ** 2))
+    return AdaptiveScan(results, sampled, measurements)
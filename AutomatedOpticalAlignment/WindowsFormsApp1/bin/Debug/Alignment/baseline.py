@@ -0,0 +1,114 @@
+"""
+Dark-current baseline and drift correction of scan readings.
+
+The Keithley reading includes the dark current of the detector, which differs from DUT to DUT
+and drifts during a long scan. A :py:class:`Baseline` holds readings taken at a dark reference
+point: one after the first batch of points and, optionally, one every ``interval`` points
+after it, taken between batches while the stage is free to move. Every
+reading of the scan is tagged with its point index (the ``sequence`` field of the
+:py:class:`.ScanStore`), so the background under each cell is the reference level interpolated
+at that index, and the whole ``results`` array is corrected in one vectorised step:
+
+::
+
+    >>> baseline = Baseline(measure_reference, interval=200)
+    >>> for batch in batches:
+    ...     store.record_many(batch, measure(batch), sequence=baseline.points + np.arange(len(batch)))
+    ...     baseline.count(len(batch))
+    >>> corrected = baseline.correct(store.layer(), store.layer(field='sequence', fill_value=np.nan))
+
+Without a reference point the baseline is zero and the correction leaves the readings as they are.
+"""
+import numpy as np
+
+
+class Baseline:
+    """
+    Dark reference readings by point index
+    """
+    def __init__(self, measure_reference=None, interval=0, indices=(), levels=(), points=0):
+        """
+        Initialize instance
+
+        :param measure_reference: moves to the dark reference point and returns its reading
+        :type measure_reference: callable
+        :param interval: number of points between drift references, 0 for the initial dark level only
+        :type interval: int
+        :param indices: point index of every reference reading, when resuming a scan
+        :type indices: list
+        :param levels: reference readings, when resuming a scan
+        :type levels: list
+        :param points: number of points measured so far, when resuming a scan
+        :type points: int
+        """
+        self._measure_reference = measure_reference
+        self.interval = interval
+        self.indices = list(indices)
+        self.levels = list(levels)
+        self.points = points
+
+    @property
+    def level(self):
+        """
+        **READONLY**
+
+        :value: latest reference reading, 0 without any
+        :type: float
+        """
+        return self.levels[-1] if self.levels else 0.0
+
+    def reference(self):
+        """
+        Take a reference reading now
+
+        :return: reference reading
+        :rtype: float
+        """
+        level = float(self._measure_reference())
+        self.indices.append(self.points)
+        self.levels.append(level)
+        return level
+
+    def count(self, points=1):
+        """
+        Count measured points and take a reference reading when one is due: the first one and
+        then every ``interval`` points
+
+        :param points: number of points measured
+        :type points: int
+        """
+        self.points += points
+        if self._measure_reference is None:
+            return
+        if not self.levels or (self.interval and self.points - self.indices[-1] >= self.interval):
+            self.reference()
+
+    def at(self, sequence):
+        """
+        :param sequence: point indices, NaN for points that were not measured
+        :type sequence: numpy.ndarray
+        :return: background at every index, the mean reference level where the index is NaN
+        :rtype: numpy.ndarray
+        """
+        sequence = np.asarray(sequence, dtype=float)
+        if not self.levels:
+            return np.zeros(sequence.shape)
+        return np.where(np.isnan(sequence), np.mean(self.levels), np.interp(sequence, self.indices, self.levels))
+
+    def correct(self, results, sequence):
+        """
+        :param results: readings
+        :type results: numpy.ndarray
+        :param sequence: point index of every reading, same shape as ``results``
+        :type sequence: numpy.ndarray
+        :return: readings minus the background under them
+        :rtype: numpy.ndarray
+        """
+        return results - self.at(sequence)
+
+    def state(self):
+        """
+        :return: JSON serialisable state, for :py:meth:`.ScanStore.checkpoint` and the store header
+        :rtype: dict
+        """
+        return {'indices': self.indices, 'levels': self.levels, 'points': self.points}
@@ -0,0 +1,197 @@
+"""
+SQLite catalog of the saved scan results, allocating their numbered names.
+
+A scan saved under a name that is already taken gets the first free suffix (``<name>_1.csv``,
+``<name>_2.csv``, ...), the number the GUI is sent in ``FOLDER_NUMBER``. Rather than probing the
+results folder with one ``os.path.exists`` per existing copy, :py:meth:`ScanCatalog.allocate`
+takes the next suffix of the name from an index in one immediate transaction, so stations saving
+under the same timestamp at the same time never get the same file. Results saved before the
+catalog existed are still skipped, at the cost of probing their files once.
+
+Every allocation is a row with the metadata of the scan once it is saved (:py:meth:`ScanCatalog.complete`),
+so the GUI and the viewers list and open results without walking the directories:
+
+::
+
+    >>> catalog = ScanCatalog()
+    >>> allocation = catalog.allocate("Results/CSV_Data/1.5_2.5_0.1", ".csv")
+    >>> allocation.path
+    'Results/CSV_Data/1.5_2.5_0.1_1.csv'
+    >>> catalog.complete(allocation.id, name="1.5_2.5_0.1", centre=(1.5, 2.5), step=0.1, shape=(41, 41))
+    >>> catalog.scans(kind='single', since="2024-03-12")[0]['path']
+    'Results/CSV_Data/1.5_2.5_0.1_1.csv'
+"""
+import os
+import time
+from collections import namedtuple
+
+from Alignment.database import SQLiteFile
+
+
+CATALOG_PATH = "Results/scan_catalog.sqlite"
+
+KINDS = ('single', 'multi_layer', 'tracking')
+"""Kinds of saved results: a single scan CSV, a folder of layer CSVs or a tracking history CSV"""
+
+Allocation = namedtuple('Allocation', ['id', 'suffix', 'path'])
+Allocation.__doc__ = """Catalog id of the scan, suffix allocated to its name (0 for none) and the path to save it to"""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    base TEXT NOT NULL,
+    suffix INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    created TEXT NOT NULL,
+    saved TEXT,
+    name TEXT,
+    centre_x REAL,
+    centre_y REAL,
+    step REAL,
+    rows INTEGER,
+    cols INTEGER,
+    layers INTEGER,
+    store TEXT,
+    UNIQUE (base, suffix)
+);
+CREATE INDEX IF NOT EXISTS scans_name ON scans (name, id);
+"""
+
+_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+def suffixed(base, suffix, extension=""):
+    """
+    :param base: path without suffix and extension
+    :type base: str
+    :param suffix: allocated suffix, 0 for none
+    :type suffix: int
+    :param extension: file extension, empty for a folder
+    :type extension: str
+    :return: path of the allocated name
+    :rtype: str
+    """
+    return base + ("_" + str(suffix) if suffix else "") + extension
+
+
+class ScanCatalog(SQLiteFile):
+    """
+    Catalog of saved scan results in a SQLite file
+    """
+    def __init__(self, path=CATALOG_PATH):
+        """
+        Initialize instance, creating the file and its table if needed
+
+        :param path: database file path
+        :type path: str
+        """
+        super().__init__(path, _SCHEMA)
+
+    def allocate(self, base, extension="", kind='single'):
+        """
+        Reserve the first free name of a scan
+
+        :param base: path the scan is saved under, without suffix and extension
+        :type base: str
+        :param extension: file extension, empty for a folder
+        :type extension: str
+        :param kind: one of :py:data:`KINDS`
+        :type kind: str
+        :return: catalog id, suffix and path of the reserved name
+        :rtype: Allocation
+        :raise ValueError: for an unknown kind
+        """
+        if kind not in KINDS:
+            raise ValueError("Unknown kind of scan {!r}".format(kind))
+        key = base + extension
+        with self._connect() as connection:
+            # the write lock is taken before reading the last suffix, so concurrent savers queue
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute("SELECT MAX(suffix) FROM scans WHERE base = ?", (key,)).fetchone()
+            if row[0] is not None:
+                suffix = row[0] + 1
+            else:
+                suffix = 0
+                # only names that were never catalogued can be taken by older results
+                while os.path.exists(suffixed(base, suffix, extension)):
+                    suffix += 1
+            path = suffixed(base, suffix, extension)
+            cursor = connection.execute("INSERT INTO scans (kind, base, suffix, path, created) VALUES (?, ?, ?, ?, ?)",
+                                        (kind, key, suffix, path, time.strftime(_TIME_FORMAT)))
+            return Allocation(cursor.lastrowid, suffix, path)
+
+    def complete(self, scan_id, name=None, centre=None, step=None, shape=None, layers=None, store=None):
+        """
+        Record the metadata of a saved scan
+
+        :param scan_id: catalog id returned by :py:meth:`allocate`
+        :type scan_id: int
+        :param name: file name sent by the GUI
+        :type name: str
+        :param centre: x, y of the scan centre
+        :type centre: tuple
+        :param step: step size
+        :type step: float
+        :param shape: rows and columns of the grid
+        :type shape: tuple
+        :param layers: number of layers saved
+        :type layers: int
+        :param store: path of the :py:class:`.ScanStore` of the scan
+        :type store: str
+        """
+        centre_x, centre_y = (None, None) if centre is None else (float(centre[0]), float(centre[1]))
+        rows, cols = (None, None) if shape is None else (int(shape[0]), int(shape[1]))
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE scans SET saved = ?, name = ?, centre_x = ?, centre_y = ?, step = ?, rows = ?, cols = ?, "
+                "layers = ?, store = ? WHERE id = ?",
+                (time.strftime(_TIME_FORMAT), name, centre_x, centre_y, None if step is None else float(step),
+                 rows, cols, None if layers is None else int(layers), store, int(scan_id)))
+
+    def get(self, scan_id):
+        """
+        :param scan_id: catalog id
+        :type scan_id: int
+        :return: the scan, None if unknown
+        :rtype: dict
+        """
+        with self._connect() as connection:
+            row = connection.execute("SELECT * FROM scans WHERE id = ?", (int(scan_id),)).fetchone()
+        return None if row is None else dict(row)
+
+    def scans(self, kind=None, name=None, since=None, until=None, saved=True, limit=None):
+        """
+        :param kind: only scans of this kind
+        :type kind: str
+        :param name: only scans saved under this file name
+        :type name: str
+        :param since: only scans allocated at or after this ISO time (or date)
+        :type since: str
+        :param until: only scans allocated before this ISO time (or date)
+        :type until: str
+        :param saved: only scans whose results were saved
+        :type saved: bool
+        :param limit: maximum number of scans
+        :type limit: int
+        :return: scans, newest first
+        :rtype: list of dict
+        """
+        conditions, parameters = [], []
+        for condition, value in (("kind = ?", kind), ("name = ?", name), ("created >= ?", since),
+                                 ("created < ?", until)):
+            if value is not None:
+                conditions.append(condition)
+                parameters.append(value)
+        if saved:
+            conditions.append("saved IS NOT NULL")
+        query = "SELECT * FROM scans"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            parameters.append(int(limit))
+        with self._connect() as connection:
+            rows = connection.execute(query, parameters).fetchall()
+        return [dict(row) for row in rows]
@@ -0,0 +1,45 @@
+"""
+SQLite file shared by the run history (:py:class:`.AlignmentHistory`) and the scan catalog
+(:py:class:`.ScanCatalog`).
+
+Every transaction opens its own connection, so the stations of a line and the viewers can use
+one file from several threads and processes; writers queue on the file lock for up to 10 s.
+"""
+import os
+import sqlite3
+from contextlib import contextmanager
+
+
+class SQLiteFile:
+    """
+    SQLite file created with its schema on first use
+    """
+    def __init__(self, path, schema):
+        """
+        Initialize instance, creating the file and its tables if needed
+
+        :param path: database file path
+        :type path: str
+        :param schema: SQL script creating the tables if they do not exist
+        :type schema: str
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as connection:
+            connection.executescript(schema)
+
+    @contextmanager
+    def _connect(self):
+        """
+        Connection whose rows are :py:class:`sqlite3.Row`, committed on success and rolled back
+        on an exception, then closed
+        """
+        connection = sqlite3.connect(self.path, timeout=10)
+        connection.row_factory = sqlite3.Row
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
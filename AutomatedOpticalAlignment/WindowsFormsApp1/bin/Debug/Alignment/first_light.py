@@ -0,0 +1,149 @@
+"""
+First-light search for starting positions where no light is coupled yet.
+
+A raster only reaches the coupled region after covering the rows in front of it, so the time to
+first light grows with the window area. The patterns here start at the expected position and
+move outwards instead, so the time grows with the distance to the light:
+
+- ``spiral``: outward Archimedean spiral, one turn per ``pitch`` grid steps of radius
+- ``lissajous``: Lissajous figure over the whole window, crossing the centre first, for when
+  the light may be anywhere
+
+Points are measured one by one through the usual measurement callable (``MOVE``/``COORDS``
+exchange) until a reading exceeds an absolute threshold or a multiple of the dark baseline,
+the median of the first readings. The readings taken so far are returned so a fine search can
+start from the first light without measuring them again.
+
+::
+
+    >>> light = find_first_light(measure, start=(20, 20), bounds=((0, 0), (40, 40)), relative_threshold=3)
+    >>> light.found, light.position, light.measurements
+    (True, (27, 14), 88)
+    >>> SEARCH_STRATEGIES['pattern']().search(measure, light.position, bounds, known=light.readings)
+"""
+import logging
+from collections import namedtuple
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+FirstLight = namedtuple('FirstLight', ['found', 'position', 'value', 'measurements', 'baseline', 'readings'])
+FirstLight.__doc__ = """Whether light was found, the first point above the threshold (the brightest point measured
+otherwise), its reading, the number of points measured, the dark baseline and the readings by grid point"""
+
+
+def _unique_in_bounds(points, bounds):
+    points = np.rint(points).astype(int)
+    lower, upper = np.asarray(bounds[0]), np.asarray(bounds[1])
+    points = points[np.all((points >= lower) & (points <= upper), axis=1)]
+    _, first = np.unique(points, axis=0, return_index=True)
+    return points[np.sort(first)]
+
+
+def spiral_points(start, bounds, pitch=1.0, step=0.5):
+    """
+    :param start: centre of the spiral
+    :type start: tuple
+    :param bounds: inclusive lower and upper grid corner, ((x0, y0), (x1, y1))
+    :type bounds: tuple
+    :param pitch: radial distance between turns in grid steps
+    :type pitch: float
+    :param step: arc length between samples of the spiral in grid steps
+    :type step: float
+    :return: distinct in-bounds grid points along the spiral, from the centre out until the
+        spiral has passed the farthest corner of the window
+    :rtype: numpy.ndarray
+    """
+    start = np.asarray(start, dtype=float)
+    corners = np.array([(x, y) for x in (bounds[0][0], bounds[1][0]) for y in (bounds[0][1], bounds[1][1])])
+    max_theta = 2 * np.pi * (np.hypot(*(corners - start).T).max() + pitch) / pitch
+    # the arc length of r = pitch * theta / 2pi up to theta is about pitch * theta^2 / 4pi
+    arc = np.arange(0, pitch * max_theta ** 2 / (4 * np.pi), step)
+    theta = np.sqrt(4 * np.pi * arc / pitch)
+    radius = pitch * theta / (2 * np.pi)
+    return _unique_in_bounds(start + radius[:, None] * np.column_stack((np.cos(theta), np.sin(theta))), bounds)
+
+
+def lissajous_points(start, bounds, a=5, b=4, step=0.5):
+    """
+    :param start: unused, the figure always covers the whole window
+    :type start: tuple
+    :param bounds: inclusive lower and upper grid corner, ((x0, y0), (x1, y1))
+    :type bounds: tuple
+    :param a: x frequency
+    :type a: int
+    :param b: y frequency, coprime with ``a`` for a closed figure
+    :type b: int
+    :param step: approximate distance between samples of the figure in grid steps
+    :type step: float
+    :return: distinct grid points along one period of the figure, starting at the window centre
+    :rtype: numpy.ndarray
+    """
+    lower, upper = np.asarray(bounds[0], dtype=float), np.asarray(bounds[1], dtype=float)
+    centre, amplitude = (lower + upper) / 2, (upper - lower) / 2
+    length = 2 * np.pi * np.hypot(a * amplitude[0], b * amplitude[1])
+    t = np.linspace(0, 2 * np.pi, int(length / step) + 1)
+    return _unique_in_bounds(centre + amplitude * np.column_stack((np.sin(a * t), np.sin(b * t))), bounds)
+
+
+FIRST_LIGHT_PATTERNS = {'spiral': spiral_points, 'lissajous': lissajous_points}
+"""Point generators by name"""
+
+FIRST_LIGHT_PATTERN_IDS = list(FIRST_LIGHT_PATTERNS)
+"""Pattern names in the order of the ``pattern`` field of the ``FIRST_LIGHT_CONFIG`` message"""
+
+
+def find_first_light(measure, start, bounds, pattern='spiral', threshold=None, relative_threshold=None,
+                     baseline=None, baseline_points=5, max_measurements=None, **kwargs):
+    """
+    Measure the points of a pattern until the first one with light
+
+    :param measure: callable returning readings for an (n, 2) array of grid points
+    :type measure: callable
+    :param start: expected position of the light
+    :type start: tuple
+    :param bounds: inclusive lower and upper grid corner, ((x0, y0), (x1, y1))
+    :type bounds: tuple
+    :param pattern: name in :py:data:`FIRST_LIGHT_PATTERNS`
+    :type pattern: str
+    :param threshold: reading above which there is light
+    :type threshold: float
+    :param relative_threshold: light when the reading is above this multiple of the baseline
+    :type relative_threshold: float
+    :param baseline: dark reading, defaults to the median of the first ``baseline_points`` readings
+    :type baseline: float
+    :param baseline_points: readings the baseline is estimated from
+    :type baseline_points: int
+    :param max_measurements: stop after this many points
+    :type max_measurements: int
+    :param kwargs: keyword arguments of the pattern, e.g. pitch
+    :type kwargs: dict
+    :return: first light, or the brightest point if the pattern ends without any
+    :rtype: FirstLight
+    :raise ValueError: if neither threshold is given
+    """
+    if threshold is None and relative_threshold is None:
+        raise ValueError("Give an absolute or a relative threshold")
+    points = FIRST_LIGHT_PATTERNS[pattern](start, bounds, **kwargs)[:max_measurements]
+    readings = {}
+    values = np.full(len(points), -np.inf)
+
+    for n, point in enumerate(points):
+        values[n] = np.asarray(measure(point[None, :]), dtype=float)[0]
+        readings[(int(point[0]), int(point[1]))] = values[n]
+        if baseline is None:
+            if n + 1 < baseline_points:
+                continue
+            baseline = np.median(values[:n + 1])
+        if (threshold is not None and values[n] > threshold) or \
+                (relative_threshold is not None and values[n] > relative_threshold * baseline):
+            logger.info("First light {:.4g} at {} after {} measurements, baseline {:.4g}".format(
+                values[n], tuple(point), n + 1, baseline))
+            return FirstLight(True, (int(point[0]), int(point[1])), values[n], n + 1, baseline, readings)
+
+    brightest = int(np.argmax(values))
+    logger.warning("No light above the threshold after {} measurements".format(len(points)))
+    return FirstLight(False, (int(points[brightest][0]), int(points[brightest][1])), values[brightest], len(points),
+                      np.median(values) if baseline is None else baseline, readings)
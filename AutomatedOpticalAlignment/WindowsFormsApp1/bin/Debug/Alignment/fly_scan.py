@@ -0,0 +1,69 @@
+"""
+Reconstruction of the rows of a fly scan.
+
+In a fly scan the stage sweeps a whole row without stopping while the Keithley streams a
+buffered burst of time-stamped readings. The GUI samples the motor position during the sweep
+and reports the trajectory once the row is done. Every reading is placed on the row by
+interpolating the trajectory at its timestamp and binned to the nearest grid point. The value
+at a grid point is interpolated between the bin means at their mean positions, which removes
+the smear of a bin whose readings are not centred on its point:
+
+::
+
+    >>> row = reconstruct_row(readings, times, trajectory['t'], trajectory['y'], 41)
+    >>> row.values[18], row.counts[18]
+    (4701.3, 9)
+
+Timestamps of the readings and of the trajectory are in s from the start of the row. Readings
+taken before the stage starts or after it stops are placed at the start or end position.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+
+FlyRow = namedtuple('FlyRow', ['values', 'counts', 'stderr'])
+FlyRow.__doc__ = """Reading at every grid point of a row, the number of readings binned to it and their standard
+error. Points no reading fell on are interpolated from their neighbours and have a count of 0."""
+
+
+def reconstruct_row(readings, times, trajectory_times, trajectory_positions, length):
+    """
+    Map the readings of one sweep onto the grid points of the row
+
+    :param readings: readings of the burst
+    :type readings: numpy.ndarray
+    :param times: time of every reading in s from the start of the row
+    :type times: numpy.ndarray
+    :param trajectory_times: increasing times in s from the start of the row at which the
+        motor position was sampled
+    :type trajectory_times: numpy.ndarray
+    :param trajectory_positions: motor position at every trajectory time, in grid steps
+    :type trajectory_positions: numpy.ndarray
+    :param length: number of grid points of the row
+    :type length: int
+    :return: values, counts and standard errors of the row
+    :rtype: FlyRow
+    :raise ValueError: if no reading falls inside the row
+    """
+    readings = np.asarray(readings, dtype=float)
+    positions = np.interp(times, trajectory_times, trajectory_positions)
+    points = np.rint(positions).astype(int)
+    inside = (points >= 0) & (points < length)
+    points, positions, readings = points[inside], positions[inside], readings[inside]
+    if not len(points):
+        raise ValueError("No reading of the sweep fell inside the row")
+
+    counts = np.bincount(points, minlength=length)
+    sums = np.bincount(points, readings, minlength=length)
+    measured = counts > 0
+    means = np.divide(sums, counts, out=np.full(length, np.nan), where=measured)
+    # squared deviations from the mean of each point, stable for readings with a large offset
+    squares = np.bincount(points, (readings - means[points]) ** 2, minlength=length)
+    stderr = np.full(length, np.nan)
+    several = counts > 1
+    stderr[several] = np.sqrt(squares[several] / (counts[several] - 1) / counts[several])
+
+    centres = np.bincount(points, positions, minlength=length)[measured] / counts[measured]
+    values = np.interp(np.arange(length), centres, means[measured])
+    return FlyRow(values, counts, stderr)
@@ -0,0 +1,104 @@
+"""
+Focus search along z by golden-section search over in-plane peak searches.
+
+The peak coupling of a layer is unimodal in z around the focus, so instead of walking down
+through the layers a golden-section search brackets the focus: every step measures one new
+layer and shrinks the z bracket by the golden ratio, until it is narrower than the tolerance.
+Each layer is an in-plane peak search (see :py:mod:`.search`) started from the peak of the
+measured layer nearest in z, which is close to the new peak even when a tilt walks the peak
+across the window with z:
+
+::
+
+    >>> focus = find_focus(search_layer, lower=0.0, upper=10.0, tolerance=0.25)
+    >>> focus.z, focus.position, focus.layers
+    (3.47, (22, 19), 10)
+
+The number of layers is about 2 + log((upper - lower) / tolerance) / log(1.618).
+"""
+import logging
+from collections import namedtuple
+
+import numpy as np
+
+from Alignment.search import INV_PHI
+
+
+logger = logging.getLogger(__name__)
+
+Focus = namedtuple('Focus', ['z', 'position', 'value', 'layers', 'bracket'])
+Focus.__doc__ = """Best layer height, its in-plane peak and reading, the z of every layer measured in order and
+the final z bracket"""
+
+
+def focus_layers(lower, upper, tolerance):
+    """
+    :param lower: lower end of the z bracket
+    :type lower: float
+    :param upper: upper end of the z bracket
+    :type upper: float
+    :param tolerance: bracket width at which the search stops
+    :type tolerance: float
+    :return: number of layers :py:func:`find_focus` measures
+    :rtype: int
+    """
+    if upper - lower <= tolerance:
+        return 1
+    return 2 + max(int(np.ceil(np.log(tolerance / (upper - lower)) / np.log(INV_PHI))) - 1, 0)
+
+
+def find_focus(search_layer, lower, upper, tolerance, start=None):
+    """
+    Golden-section search for the layer with the highest in-plane peak
+
+    :param search_layer: callable taking a z and an in-plane start point and returning the
+        :py:class:`.SearchResult` of the peak search in that layer
+    :type search_layer: callable
+    :param lower: lower end of the z bracket
+    :type lower: float
+    :param upper: upper end of the z bracket
+    :type upper: float
+    :param tolerance: bracket width at which the search stops
+    :type tolerance: float
+    :param start: in-plane start point of the first layer
+    :type start: tuple
+    :return: best layer
+    :rtype: Focus
+    :raise ValueError: if the tolerance is not positive
+    """
+    if tolerance <= 0:
+        raise ValueError("The focus tolerance must be positive")
+    peaks = {}
+
+    def peak(z):
+        if peaks:
+            nearest = min(peaks, key=lambda measured: abs(measured - z))
+            layer_start = peaks[nearest].position
+        else:
+            layer_start = start
+        peaks[z] = search_layer(z, layer_start)
+        logger.info("Layer z={:.4g}: {:.4g} at {}".format(z, peaks[z].value, peaks[z].position))
+        return peaks[z].value
+
+    if upper - lower <= tolerance:
+        peak((lower + upper) / 2)
+    else:
+        inner_low, inner_high = upper - INV_PHI * (upper - lower), lower + INV_PHI * (upper - lower)
+        value_low, value_high = peak(inner_low), peak(inner_high)
+        while upper - lower > tolerance:
+            if value_low >= value_high:
+                upper, inner_high, value_high = inner_high, inner_low, value_low
+                inner_low = upper - INV_PHI * (upper - lower)
+                if upper - lower > tolerance:
+                    value_low = peak(inner_low)
+            else:
+                lower, inner_low, value_low = inner_low, inner_high, value_high
+                inner_high = lower + INV_PHI * (upper - lower)
+                if upper - lower > tolerance:
+                    value_high = peak(inner_high)
+
+    z = max(peaks, key=lambda measured: peaks[measured].value)
+    layers = list(peaks)
+    logger.info("Focus z={:.4g} after {} layers: {:.4g} at {}".format(z, len(layers), peaks[z].value,
+                                                                      peaks[z].position))
+    return Focus(z, peaks[z].position, peaks[z].value, layers, (lower, upper))
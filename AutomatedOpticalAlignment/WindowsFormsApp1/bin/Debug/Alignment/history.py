@@ -0,0 +1,155 @@
+"""
+SQLite catalog of alignment runs and warm-start priors for the next part.
+
+Every finished scan that found a peak is recorded with the DUT id and recipe sent by the
+client, the start point, the peak and its reading, the duration and the number of points
+measured. Positions are grid indices of the scan window, which the GUI centres on the nominal
+position of the part, so on a line of identical parts the peaks of recent runs of a recipe
+cluster. :py:meth:`AlignmentHistory.prior` summarises them robustly (median and median absolute
+deviation) into a window centre and half width for the next search or raster scan:
+
+::
+
+    >>> history = AlignmentHistory()
+    >>> history.record(dut="A17", recipe="SOA-1550", mode=4, length=41, peak=(22, 19), value=4801.0,
+    ...                duration=3.2, points=31)
+    >>> history.prior("SOA-1550", length=41)
+    Prior(centre=(22.0, 19.0), half_width=4, runs=12)
+"""
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from Alignment.database import SQLiteFile
+
+
+HISTORY_PATH = "Results/alignment_history.sqlite"
+
+Prior = namedtuple('Prior', ['centre', 'half_width', 'runs'])
+Prior.__doc__ = """Expected peak position of a recipe, the half width of the window that covers the spread
+of recent peaks and the number of runs it is based on"""
+
+Run = namedtuple('Run', ['mode', 'peak', 'value', 'points', 'duration', 'store'])
+Run.__doc__ = """Scan mode, grid x, y and reading of the peak found, number of points measured, run time in s
+and path of the :py:class:`.ScanStore` of a finished run"""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created TEXT NOT NULL,
+    dut TEXT NOT NULL,
+    recipe TEXT NOT NULL,
+    mode INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    start_x REAL,
+    start_y REAL,
+    peak_x REAL NOT NULL,
+    peak_y REAL NOT NULL,
+    peak_value REAL,
+    duration REAL,
+    points INTEGER,
+    store TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_recipe ON runs (recipe, id);
+"""
+
+
+class AlignmentHistory(SQLiteFile):
+    """
+    Catalog of alignment runs in a SQLite file
+    """
+    def __init__(self, path=HISTORY_PATH):
+        """
+        Initialize instance, creating the file and its table if needed
+
+        :param path: database file path
+        :type path: str
+        """
+        super().__init__(path, _SCHEMA)
+
+    def record(self, peak, dut="", recipe="", mode=0, length=0, start=None, value=None, duration=None, points=None,
+               store=None):
+        """
+        Add a finished run
+
+        :param peak: grid x, y of the peak found
+        :type peak: tuple
+        :param dut: DUT id
+        :type dut: str
+        :param recipe: recipe (part type) the prior is grouped by
+        :type recipe: str
+        :param mode: scan mode
+        :type mode: int
+        :param length: edge length of the scan window in grid points
+        :type length: int
+        :param start: grid x, y the search started from
+        :type start: tuple
+        :param value: reading at the peak
+        :type value: float
+        :param duration: run time in s
+        :type duration: float
+        :param points: number of points measured
+        :type points: int
+        :param store: path of the :py:class:`.ScanStore` of the run
+        :type store: str
+        :return: id of the run
+        :rtype: int
+        """
+        start_x, start_y = (None, None) if start is None else (float(start[0]), float(start[1]))
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "INSERT INTO runs (created, dut, recipe, mode, length, start_x, start_y, peak_x, peak_y, peak_value, "
+                "duration, points, store) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.strftime("%Y-%m-%dT%H:%M:%S"), dut, recipe, int(mode), int(length), start_x, start_y,
+                 float(peak[0]), float(peak[1]), None if value is None else float(value),
+                 None if duration is None else float(duration), None if points is None else int(points), store))
+            return cursor.lastrowid
+
+    def recent(self, recipe, limit=20, length=None):
+        """
+        :param recipe: recipe
+        :type recipe: str
+        :param limit: maximum number of runs
+        :type limit: int
+        :param length: only runs with this window length
+        :type length: int
+        :return: runs of the recipe, newest first
+        :rtype: list of dict
+        """
+        query, parameters = "SELECT * FROM runs WHERE recipe = ?", [recipe]
+        if length is not None:
+            query += " AND length = ?"
+            parameters.append(int(length))
+        with self._connect() as connection:
+            rows = connection.execute(query + " ORDER BY id DESC LIMIT ?", parameters + [int(limit)]).fetchall()
+        return [dict(row) for row in rows]
+
+    def prior(self, recipe, length, limit=20, min_runs=3, coverage=3.0, margin=2):
+        """
+        :param recipe: recipe
+        :type recipe: str
+        :param length: edge length of the scan window in grid points, only runs in windows of the
+            same length are used
+        :type length: int
+        :param limit: number of recent runs used
+        :type limit: int
+        :param min_runs: runs needed for a prior
+        :type min_runs: int
+        :param coverage: half width in robust standard deviations of the peak positions
+        :type coverage: float
+        :param margin: grid points added to the half width
+        :type margin: int
+        :return: window centre and half width covering the recent peaks, at most the whole scan
+            window; None with fewer than ``min_runs`` runs
+        :rtype: Prior
+        """
+        runs = self.recent(recipe, limit, length)
+        if len(runs) < min_runs:
+            return None
+        peaks = np.array([(run['peak_x'], run['peak_y']) for run in runs])
+        centre = np.median(peaks, axis=0)
+        # the median absolute deviation scaled to a standard deviation ignores the odd failed run
+        spread = 1.4826 * np.median(np.abs(peaks - centre), axis=0)
+        half_width = min(int(np.ceil(coverage * spread.max())) + margin, length // 2)
+        return Prior((float(centre[0]), float(centre[1])), half_width, len(runs))
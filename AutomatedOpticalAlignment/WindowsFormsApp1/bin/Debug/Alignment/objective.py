@@ -0,0 +1,128 @@
+"""
+Scan objective combining several signals read at every point.
+
+Without an objective the scans maximise the Keithley photocurrent. On transmit-side alignments
+the power meter reading matters more, or a weighted combination of the two. An
+:py:class:`Objective` reads every :py:class:`Signal` once per reading and combines them into a
+single score:
+
+::
+
+    score = sum(weight * transform(reading / reference))
+
+with a linear or a dB (``10 log10``) transform. Dividing by a reference (e.g. the power
+launched into the part) and the dB transform make signals of different units comparable. The
+combination is vectorised over the last axis, so :py:meth:`Objective.score` also re-scores the
+channels stored with a whole scan.
+
+Signals of different instruments are read in parallel, one thread per instrument: the GPIB,
+USB or LAN transfers release the GIL, so adding a power meter only costs its latency where it
+exceeds the source meter's. Signals of the same instrument are read one after the other.
+
+::
+
+    >>> objective = Objective([Signal('current', lambda: SCALE * current.value, keithley),
+    ...                        Signal('power1', lambda: opm.channel[1].value, opm, 'db', 2.0, 1e-3)])
+    >>> objective.read()
+    ObjectiveReading(score=4.12, channels=array([4.8e+03, 3.1e-04]))
+    >>> objective.close()
+"""
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+TRANSFORMS = ('linear', 'db')
+"""Signal transforms by the id the client sends in ``OBJECTIVE_CONFIG``"""
+
+DB_FLOOR = 1e-12
+"""Smallest ratio to the reference taken in dB, so dark or negative readings stay finite"""
+
+Signal = namedtuple('Signal', ['name', 'read', 'instrument', 'transform', 'weight', 'reference'],
+                    defaults=(None, 'linear', 1.0, 1.0))
+Signal.__doc__ = """Channel name, callable returning one reading, the instrument it is read from, its transform,
+weight in the score and the reference it is divided by"""
+
+ObjectiveReading = namedtuple('ObjectiveReading', ['score', 'channels'])
+ObjectiveReading.__doc__ = """Combined score and the raw reading of every signal"""
+
+
+class Objective:
+    """
+    Weighted combination of signals read concurrently from several instruments
+    """
+    def __init__(self, signals, name=None):
+        """
+        Initialize instance
+
+        :param signals: signals of the score
+        :type signals: list of Signal
+        :param name: objective name, prefixes the reader thread names
+        :type name: str
+        :raise ValueError: without signals, for duplicate names or an unknown transform
+        """
+        signals = list(signals)
+        if not signals:
+            raise ValueError("An objective needs at least one signal")
+        names = tuple(signal.name for signal in signals)
+        if len(set(names)) < len(names):
+            raise ValueError("Objective signals need unique names: {}".format(names))
+        for signal in signals:
+            if signal.transform not in TRANSFORMS:
+                raise ValueError("Unknown transform {!r} of signal {}".format(signal.transform, signal.name))
+        self.signals = signals
+        self.names = names
+        self.weights = np.array([signal.weight for signal in signals], dtype=float)
+        self.references = np.array([signal.reference for signal in signals], dtype=float)
+        self._db = np.array([signal.transform == 'db' for signal in signals])
+
+        groups = {}
+        for index, signal in enumerate(signals):
+            groups.setdefault(id(signal.instrument), []).append(index)
+        self._groups = list(groups.values())
+        # the first instrument is read on the calling thread, the others on the pool
+        self._executor = ThreadPoolExecutor(len(self._groups) - 1, thread_name_prefix=name or type(self).__name__) \
+            if len(self._groups) > 1 else None
+
+    def _read_group(self, indices):
+        return [float(self.signals[index].read()) for index in indices]
+
+    def read_channels(self):
+        """
+        :return: one reading of every signal, in the order of :py:attr:`names`
+        :rtype: numpy.ndarray
+        """
+        channels = np.empty(len(self.signals))
+        futures = [(group, self._executor.submit(self._read_group, group)) for group in self._groups[1:]]
+        channels[self._groups[0]] = self._read_group(self._groups[0])
+        for group, future in futures:
+            channels[group] = future.result()
+        return channels
+
+    def score(self, channels):
+        """
+        :param channels: readings of every signal along the last axis, for one point or many
+        :type channels: numpy.ndarray
+        :return: combined score of every point
+        :rtype: numpy.ndarray or float
+        """
+        ratios = np.asarray(channels, dtype=float) / self.references
+        transformed = np.where(self._db, 10 * np.log10(np.maximum(ratios, DB_FLOOR)), ratios)
+        return transformed @ self.weights
+
+    def read(self):
+        """
+        :return: score and raw channels of one reading of every signal
+        :rtype: ObjectiveReading
+        """
+        channels = self.read_channels()
+        return ObjectiveReading(float(self.score(channels)), channels)
+
+    def close(self):
+        """
+        Stop the reader threads
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
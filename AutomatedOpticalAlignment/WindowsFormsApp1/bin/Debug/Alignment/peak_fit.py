@@ -0,0 +1,240 @@
+"""
+Sub-step localisation of the coupling peak from a scan ``results`` grid.
+
+The argmax of a scan is only as precise as the scan step. Fitting a model to the readings around
+it recovers the optimum between grid points, so a coarser grid can land on the same position:
+
+- ``'paraboloid'``: least-squares quadratic surface over a small window around the maximum
+- ``'gaussian'``: elliptical 2D Gaussian plus offset over the whole grid, refined by
+  Levenberg-Marquardt from moment estimates
+
+Both report the position in (fractional) grid coordinates, the modelled peak value, the
+coefficient of determination of the fit and the 1 sigma standard error of the position.
+
+::
+
+    >>> fit = fit_peak(results, 'gaussian')
+    >>> fit.x, fit.y, fit.r_squared, fit.sigma_x
+    (23.31, 17.84, 0.998, 0.02)
+"""
+from collections import namedtuple
+
+import numpy as np
+
+
+PeakFit = namedtuple('PeakFit', ['model', 'x', 'y', 'value', 'r_squared', 'sigma_x', 'sigma_y'])
+
+FWHM_PER_SIGMA = 2 * np.sqrt(2 * np.log(2))
+
+
+class PeakFitError(Exception):
+    """
+    An exception indicating the readings do not describe a peak the model can fit
+    """
+
+
+def _valid_points(results, mask=None):
+    """
+    :param results: readings indexed as ``results[x][y]``
+    :type results: numpy.ndarray
+    :param mask: points to use, defaults to every finite reading
+    :type mask: numpy.ndarray
+    :return: x, y and reading of every valid point
+    :rtype: (numpy.ndarray, numpy.ndarray, numpy.ndarray)
+    """
+    results = np.asarray(results, dtype=float)
+    valid = np.isfinite(results)
+    if mask is not None:
+        valid &= np.asarray(mask, dtype=bool)
+    x, y = np.nonzero(valid)
+    return x.astype(float), y.astype(float), results[valid]
+
+
+def _r_squared(z, residuals):
+    total = ((z - z.mean()) ** 2).sum()
+    return 1 - (residuals ** 2).sum() / total if total > 0 else 1.0
+
+
+def _covariance(jacobian, residuals):
+    """
+    :return: parameter covariance estimated from the residual variance
+    :rtype: numpy.ndarray
+    """
+    dof = len(residuals) - jacobian.shape[1]
+    if dof <= 0:
+        return np.full((jacobian.shape[1],) * 2, np.nan)
+    variance = (residuals ** 2).sum() / dof
+    return variance * np.linalg.pinv(jacobian.T @ jacobian)
+
+
+def brightest_point(results, mask=None):
+    """
+    :param results: readings indexed as ``results[x][y]``
+    :type results: numpy.ndarray
+    :param mask: points to use, defaults to every finite reading
+    :type mask: numpy.ndarray
+    :return: the highest reading at its grid point, model ``'grid'``, with ``r_squared`` 0 and NaN
+        standard errors to tell it from a fit; all NaN without any valid point
+    :rtype: PeakFit
+    """
+    x, y, z = _valid_points(results, mask)
+    if not len(z):
+        return PeakFit('grid', np.nan, np.nan, np.nan, 0.0, np.nan, np.nan)
+    best = np.argmax(z)
+    return PeakFit('grid', x[best], y[best], z[best], 0.0, np.nan, np.nan)
+
+
+def fit_paraboloid(results, mask=None, radius=2):
+    """
+    Fit ``z = a + b*dx + c*dy + d*dx^2 + e*dx*dy + f*dy^2`` around the maximum reading
+
+    :param results: readings indexed as ``results[x][y]``
+    :type results: numpy.ndarray
+    :param mask: points to use, e.g. the measured points of an adaptive scan
+    :type mask: numpy.ndarray
+    :param radius: half width in grid points of the window around the maximum
+    :type radius: int
+    :return: fitted peak
+    :rtype: PeakFit
+    :raise PeakFitError: with fewer than 6 points in the window or a surface that is not a maximum
+    """
+    x, y, z = _valid_points(results, mask)
+    if not len(z):
+        raise PeakFitError("No valid readings")
+    best = np.argmax(z)
+    x0, y0 = x[best], y[best]
+    window = (np.abs(x - x0) <= radius) & (np.abs(y - y0) <= radius)
+    dx, dy, z = x[window] - x0, y[window] - y0, z[window]
+    if len(z) < 6:
+        raise PeakFitError("{} points around the maximum, a paraboloid needs 6".format(len(z)))
+
+    design = np.column_stack([np.ones_like(dx), dx, dy, dx ** 2, dx * dy, dy ** 2])
+    coefficients = np.linalg.lstsq(design, z, rcond=None)[0]
+
+    def vertex(c):
+        hessian = np.array([[2 * c[3], c[4]], [c[4], 2 * c[5]]])
+        return -np.linalg.solve(hessian, c[1:3])
+
+    a, b, c, d, e, f = coefficients
+    if d >= 0 or 4 * d * f - e ** 2 <= 0:
+        raise PeakFitError("Quadratic surface has no maximum near the highest reading")
+    offset = vertex(coefficients)
+    value = a + b * offset[0] + c * offset[1] + d * offset[0] ** 2 + e * offset[0] * offset[1] + f * offset[1] ** 2
+
+    residuals = z - design @ coefficients
+    covariance = _covariance(design, residuals)
+    steps = 1e-6 * np.maximum(np.abs(coefficients), 1)
+    jacobian = np.column_stack([(vertex(coefficients + step) - vertex(coefficients - step)) / (2 * step[i])
+                                for i, step in enumerate(np.diag(steps))])
+    sigma = np.sqrt(np.diag(jacobian @ covariance @ jacobian.T))
+    return PeakFit('paraboloid', x0 + offset[0], y0 + offset[1], value,
+                   _r_squared(z, residuals), sigma[0], sigma[1])
+
+
+def _gaussian(params, x, y):
+    """
+    :return: model readings and the Jacobian with respect to
+        (amplitude, x0, y0, width_x, width_y, offset)
+    :rtype: (numpy.ndarray, numpy.ndarray)
+    """
+    amplitude, x0, y0, width_x, width_y, offset = params
+    u, v = (x - x0) / width_x, (y - y0) / width_y
+    g = np.exp(-(u ** 2 + v ** 2) / 2)
+    model = offset + amplitude * g
+    jacobian = np.column_stack([g,
+                                amplitude * g * u / width_x,
+                                amplitude * g * v / width_y,
+                                amplitude * g * u ** 2 / width_x,
+                                amplitude * g * v ** 2 / width_y,
+                                np.ones_like(g)])
+    return model, jacobian
+
+
+def fit_gaussian(results, mask=None, max_iterations=100, tolerance=1e-9):
+    """
+    Fit an axis-aligned 2D Gaussian with constant offset to every valid reading
+
+    :param results: readings indexed as ``results[x][y]``
+    :type results: numpy.ndarray
+    :param mask: points to use, e.g. the measured points of an adaptive scan
+    :type mask: numpy.ndarray
+    :param max_iterations: Levenberg-Marquardt iteration limit
+    :type max_iterations: int
+    :param tolerance: relative decrease of the squared residual sum below which the fit stops
+    :type tolerance: float
+    :return: fitted peak
+    :rtype: PeakFit
+    :raise PeakFitError: if there are too few readings or the fit diverges
+    """
+    x, y, z = _valid_points(results, mask)
+    if len(z) < 7:
+        raise PeakFitError("{} valid readings, a Gaussian needs 7".format(len(z)))
+
+    offset = np.percentile(z, 10)
+    best = np.argmax(z)
+    amplitude = z[best] - offset
+    if amplitude <= 0:
+        raise PeakFitError("Readings are flat")
+    above = z > offset + amplitude / 2
+    width = max(np.sqrt(above.sum() / np.pi) * 2 / FWHM_PER_SIGMA, 0.5)
+    params = np.array([amplitude, x[best], y[best], width, width, offset])
+
+    model, jacobian = _gaussian(params, x, y)
+    residuals = z - model
+    cost = (residuals ** 2).sum()
+    damping = 1e-3
+    for _ in range(max_iterations):
+        normal = jacobian.T @ jacobian
+        gradient = jacobian.T @ residuals
+        try:
+            step = np.linalg.solve(normal + damping * np.diag(np.diag(normal)), gradient)
+        except np.linalg.LinAlgError:
+            raise PeakFitError("Singular normal equations")
+        trial = params + step
+        trial[3:5] = np.abs(trial[3:5])
+        trial_model, trial_jacobian = _gaussian(trial, x, y)
+        trial_residuals = z - trial_model
+        trial_cost = (trial_residuals ** 2).sum()
+        if trial_cost < cost:
+            converged = cost - trial_cost <= tolerance * cost
+            params, jacobian, residuals, cost = trial, trial_jacobian, trial_residuals, trial_cost
+            damping /= 10
+            if converged:
+                break
+        else:
+            damping *= 10
+            if damping > 1e10:
+                break
+
+    amplitude, x0, y0 = params[:3]
+    lower, upper = np.array([x.min(), y.min()]), np.array([x.max(), y.max()])
+    if amplitude <= 0 or np.any([x0, y0] < lower - 0.5) or np.any([x0, y0] > upper + 0.5):
+        raise PeakFitError("Gaussian fit diverged to {:.3g} at ({:.3g}, {:.3g})".format(amplitude, x0, y0))
+    sigma = np.sqrt(np.diag(_covariance(jacobian, residuals)))
+    return PeakFit('gaussian', x0, y0, amplitude + params[5], _r_squared(z, residuals), sigma[1], sigma[2])
+
+
+PEAK_MODELS = {
+    'gaussian': fit_gaussian,
+    'paraboloid': fit_paraboloid,
+}
+"""Fit function for each model name"""
+
+
+def fit_peak(results, model='gaussian', mask=None, **kwargs):
+    """
+    Locate the peak of a scan between grid points
+
+    :param results: readings indexed as ``results[x][y]``
+    :type results: numpy.ndarray
+    :param model: 'gaussian' or 'paraboloid'
+    :type model: str
+    :param mask: points to use, defaults to every finite reading
+    :type mask: numpy.ndarray
+    :param kwargs: keyword arguments passed to the fit function
+    :type kwargs: dict
+    :return: fitted peak
+    :rtype: PeakFit
+    :raise PeakFitError: if the model cannot be fitted
+    """
+    return PEAK_MODELS[model](results, mask=mask, **kwargs)
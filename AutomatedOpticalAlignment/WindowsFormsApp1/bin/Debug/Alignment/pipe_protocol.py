@@ -0,0 +1,572 @@
+"""
+Framing layer for the ``\\\\.\\pipe\\NPtest`` named pipe shared with the alignment GUI.
+
+Two wire formats are supported on the same pipe:
+
+- **Framed (version 1)**: every message starts with an 8 byte header (magic ``b'AO'``,
+  protocol version, message type and record count) followed by ``count`` packed records
+  whose layout is given by :py:data:`RECORD_DTYPES`. A whole row of coordinates can be
+  sent in one ``COORDS`` message and answered with a single ``READINGS`` block.
+- **Legacy**: the original one-shot byte messages used by the shipped ``.exe``
+  (mode byte, length byte, 2 byte coordinates, 4 byte readings, ``'kill'``/``'done'``).
+
+:py:func:`open_pipe` inspects the first byte sent by the GUI and returns the matching
+channel, so the scan loop is written once against the :py:class:`FramedPipe` API.
+
+::
+
+    >>> f = open(r'\\\\.\\pipe\\NPtest', 'r+b', 0)
+    >>> pipe = open_pipe(f)
+    >>> pipe.mode, pipe.length
+    (1, 21)
+    >>> msg_type, coords = pipe.read_message()
+    >>> pipe.write_readings(measure(coords['x'], coords['y']))
+"""
+import struct
+import threading
+from enum import IntEnum
+
+import numpy as np
+
+from Alignment.timing import PHASES
+
+
+PROTOCOL_VERSION = 1
+MAGIC = b'AO'
+HEADER = struct.Struct('>2sBBI')
+
+LEGACY_KILL = b'kill'
+LEGACY_DONE = b'done'
+
+
+class MessageType(IntEnum):
+    """
+    Message types of the framed protocol. Legacy byte messages are mapped onto the same types.
+    """
+    CONFIG = 1
+    COORDS = 2
+    READINGS = 3
+    DONE = 4
+    KILL = 5
+    MOVE_ON = 6
+    POSITION = 7
+    FILE_NAME = 8
+    FOLDER_NUMBER = 9
+    LAYERS = 10
+    SMU_SETTINGS = 11
+    SEARCH_CONFIG = 12
+    MOVE = 13
+    PEAK = 14
+    ADAPTIVE_CONFIG = 15
+    PEAK_FIT = 16
+    RENDER_CONFIG = 17
+    IMAGES_READY = 18
+    RESUME = 19
+    RESUMED = 20
+    TIMING_CONFIG = 21
+    TIMING = 22
+    SAMPLING_CONFIG = 23
+    FLY_CONFIG = 24
+    ROW_START = 25
+    ROW_STOP = 26
+    FIRST_LIGHT_CONFIG = 27
+    FIRST_LIGHT = 28
+    BASELINE_CONFIG = 29
+    FOCUS_CONFIG = 30
+    LAYER = 31
+    FOCUS = 32
+    TRACK_CONFIG = 33
+    PIEZO = 34
+    TRACK = 35
+    DUT_CONFIG = 36
+    PRIOR = 37
+    OBJECTIVE_CONFIG = 38
+
+
+CONFIG_DTYPE = np.dtype([('mode', 'u1'), ('half_length', '>i2')])
+COORD_DTYPE = np.dtype([('x', '>u2'), ('y', '>u2')])
+READING_DTYPE = np.dtype('>f8')
+SMU_SETTINGS_DTYPE = np.dtype([('compliance_current', '>f8'), ('voltage_setpoint', '>f8')])
+SEARCH_CONFIG_DTYPE = np.dtype([('strategy', 'u1'), ('x', '>u2'), ('y', '>u2')])
+PEAK_DTYPE = np.dtype([('x', '>u2'), ('y', '>u2'), ('value', '>f8'), ('measurements', '>u4')])
+ADAPTIVE_CONFIG_DTYPE = np.dtype([('initial_step', 'u1'), ('threshold', '>f8')])
+PEAK_FIT_DTYPE = np.dtype([('x', '>f8'), ('y', '>f8'), ('value', '>f8'), ('r_squared', '>f8'),
+                           ('sigma_x', '>f8'), ('sigma_y', '>f8')])
+RENDER_CONFIG_DTYPE = np.dtype([('notify', 'u1')])
+TIMING_CONFIG_DTYPE = np.dtype([('interval', '>u4')])
+TIMING_DTYPE = np.dtype([('phase', 'u1'), ('count', '>u4'), ('p50', '>f8'), ('p95', '>f8'), ('p99', '>f8')])
+SAMPLING_CONFIG_DTYPE = np.dtype([('relative_tolerance', '>f8'), ('absolute_tolerance', '>f8'),
+                                  ('max_samples', '>u2'), ('burst', 'u1')])
+FLY_CONFIG_DTYPE = np.dtype([('samples', '>u2'), ('interval', '>f8')])
+ROW_DTYPE = np.dtype([('x', '>u2')])
+TRAJECTORY_DTYPE = np.dtype([('t', '>f8'), ('y', '>f8')])
+FIRST_LIGHT_CONFIG_DTYPE = np.dtype([('pattern', 'u1'), ('threshold', '>f8'), ('relative_threshold', '>f8'),
+                                     ('pitch', '>f8')])
+FIRST_LIGHT_DTYPE = np.dtype([('x', '>u2'), ('y', '>u2'), ('value', '>f8'), ('measurements', '>u4'), ('found', 'u1')])
+BASELINE_CONFIG_DTYPE = np.dtype([('x', '>u2'), ('y', '>u2'), ('samples', '>u2'), ('interval', '>u4')])
+FOCUS_CONFIG_DTYPE = np.dtype([('lower', '>f8'), ('upper', '>f8'), ('tolerance', '>f8')])
+LAYER_DTYPE = np.dtype([('z', '>f8')])
+FOCUS_DTYPE = np.dtype([('x', '>u2'), ('y', '>u2'), ('z', '>f8'), ('value', '>f8'), ('layers', '>u2'),
+                        ('measurements', '>u4')])
+TRACK_CONFIG_DTYPE = np.dtype([('x', '>f8'), ('y', '>f8'), ('amplitude', '>f8'), ('gain', '>f8'), ('rate', '>f8'),
+                               ('points', 'u1')])
+PIEZO_DTYPE = np.dtype([('x', '>f8'), ('y', '>f8')])
+TRACK_DTYPE = np.dtype([('t', '>f8'), ('x', '>f8'), ('y', '>f8'), ('value', '>f8'), ('error', '>f8')])
+DUT_CONFIG_DTYPE = np.dtype([('dut', 'S32'), ('recipe', 'S32'), ('warm_start', 'u1')])
+PRIOR_DTYPE = np.dtype([('x', '>f8'), ('y', '>f8'), ('half_width', '>u2'), ('runs', '>u2')])
+OBJECTIVE_SIGNAL_DTYPE = np.dtype([('signal', 'u1'), ('transform', 'u1'), ('weight', '>f8'), ('reference', '>f8')])
+UINT32_DTYPE = np.dtype('>u4')
+BYTES_DTYPE = np.dtype('u1')
+
+RECORD_DTYPES = {
+    MessageType.CONFIG: CONFIG_DTYPE,
+    MessageType.COORDS: COORD_DTYPE,
+    MessageType.READINGS: READING_DTYPE,
+    MessageType.DONE: None,
+    MessageType.KILL: None,
+    MessageType.MOVE_ON: None,
+    MessageType.POSITION: UINT32_DTYPE,
+    MessageType.FILE_NAME: BYTES_DTYPE,
+    MessageType.FOLDER_NUMBER: UINT32_DTYPE,
+    MessageType.LAYERS: UINT32_DTYPE,
+    MessageType.SMU_SETTINGS: SMU_SETTINGS_DTYPE,
+    MessageType.SEARCH_CONFIG: SEARCH_CONFIG_DTYPE,
+    MessageType.MOVE: COORD_DTYPE,
+    MessageType.PEAK: PEAK_DTYPE,
+    MessageType.ADAPTIVE_CONFIG: ADAPTIVE_CONFIG_DTYPE,
+    MessageType.PEAK_FIT: PEAK_FIT_DTYPE,
+    MessageType.RENDER_CONFIG: RENDER_CONFIG_DTYPE,
+    MessageType.IMAGES_READY: BYTES_DTYPE,
+    MessageType.RESUME: None,
+    MessageType.RESUMED: UINT32_DTYPE,
+    MessageType.TIMING_CONFIG: TIMING_CONFIG_DTYPE,
+    MessageType.TIMING: TIMING_DTYPE,
+    MessageType.SAMPLING_CONFIG: SAMPLING_CONFIG_DTYPE,
+    MessageType.FLY_CONFIG: FLY_CONFIG_DTYPE,
+    MessageType.ROW_START: ROW_DTYPE,
+    MessageType.ROW_STOP: TRAJECTORY_DTYPE,
+    MessageType.FIRST_LIGHT_CONFIG: FIRST_LIGHT_CONFIG_DTYPE,
+    MessageType.FIRST_LIGHT: FIRST_LIGHT_DTYPE,
+    MessageType.BASELINE_CONFIG: BASELINE_CONFIG_DTYPE,
+    MessageType.FOCUS_CONFIG: FOCUS_CONFIG_DTYPE,
+    MessageType.LAYER: LAYER_DTYPE,
+    MessageType.FOCUS: FOCUS_DTYPE,
+    MessageType.TRACK_CONFIG: TRACK_CONFIG_DTYPE,
+    MessageType.PIEZO: PIEZO_DTYPE,
+    MessageType.TRACK: TRACK_DTYPE,
+    MessageType.DUT_CONFIG: DUT_CONFIG_DTYPE,
+    MessageType.PRIOR: PRIOR_DTYPE,
+    MessageType.OBJECTIVE_CONFIG: OBJECTIVE_SIGNAL_DTYPE,
+}
+
+JOB_OPTIONS = {
+    MessageType.SMU_SETTINGS: 'smu_settings',
+    MessageType.SEARCH_CONFIG: 'search_config',
+    MessageType.ADAPTIVE_CONFIG: 'adaptive_config',
+    MessageType.RENDER_CONFIG: 'render_config',
+    MessageType.RESUME: 'resume',
+    MessageType.TIMING_CONFIG: 'timing_config',
+    MessageType.SAMPLING_CONFIG: 'sampling_config',
+    MessageType.FLY_CONFIG: 'fly_config',
+    MessageType.FIRST_LIGHT_CONFIG: 'first_light_config',
+    MessageType.BASELINE_CONFIG: 'baseline_config',
+    MessageType.FOCUS_CONFIG: 'focus_config',
+    MessageType.TRACK_CONFIG: 'track_config',
+    MessageType.DUT_CONFIG: 'dut_config',
+    MessageType.OBJECTIVE_CONFIG: 'objective_config',
+}
+"""Messages that may precede ``CONFIG`` and the pipe attribute each one is stored in. Options
+without payload are stored as True."""
+
+RECORD_LIST_OPTIONS = {MessageType.OBJECTIVE_CONFIG}
+"""Job options stored as all their records rather than the first one"""
+
+
+class ProtocolError(Exception):
+    """
+    An exception indicating a malformed or unexpected message on the pipe
+    """
+
+
+def read_exact(file, size):
+    """
+    Read exactly ``size`` bytes from an unbuffered pipe, which may return short reads
+
+    :param file: raw pipe handle
+    :type file: io.RawIOBase
+    :param size: number of bytes to read
+    :type size: int
+    :return: data read
+    :rtype: bytes
+    :raise EOFError: if the other end closes the pipe before ``size`` bytes arrive
+    """
+    data = bytearray()
+    while len(data) < size:
+        chunk = file.read(size - len(data))
+        if not chunk:
+            raise EOFError("Pipe closed after {} of {} bytes".format(len(data), size))
+        data += chunk
+    return bytes(data)
+
+
+class FramedPipe:
+    """
+    Versioned, length-prefixed message channel over the GUI pipe
+    """
+    legacy = False
+
+    def __init__(self, file, mode=None, length=None):
+        """
+        Initialize instance
+
+        :param file: raw pipe handle opened in 'r+b' mode without buffering
+        :type file: io.RawIOBase
+        :param mode: scan mode, if already negotiated
+        :type mode: int
+        :param length: scan edge length (2*half_length+1), if already negotiated
+        :type length: int
+        """
+        self._file = file
+        self.mode = mode
+        self.length = length
+        self.smu_settings = None
+        """:type: numpy.void"""
+        self.search_config = None
+        """:type: numpy.void"""
+        self.adaptive_config = None
+        """:type: numpy.void"""
+        self.render_config = None
+        """:type: numpy.void"""
+        self.resume = False
+        self.timing_config = None
+        """:type: numpy.void"""
+        self.sampling_config = None
+        """:type: numpy.void"""
+        self.fly_config = None
+        """:type: numpy.void"""
+        self.first_light_config = None
+        """:type: numpy.void"""
+        self.baseline_config = None
+        """:type: numpy.void"""
+        self.focus_config = None
+        """:type: numpy.void"""
+        self.track_config = None
+        """:type: numpy.void"""
+        self.dut_config = None
+        """:type: numpy.void"""
+        self.objective_config = None
+        """:type: numpy.ndarray"""
+        self.run = None
+        """Run of the current job once it found a peak, :type: Run"""
+        self._write_lock = threading.Lock()
+
+    def read_header(self, first=b''):
+        """
+        Read and validate a message header
+
+        :param first: header bytes already consumed from the pipe
+        :type first: bytes
+        :return: message type and record count
+        :rtype: (MessageType, int)
+        :raise ProtocolError: on bad magic, unsupported version or unknown message type
+        """
+        raw = first + read_exact(self._file, HEADER.size - len(first))
+        magic, version, msg_type, count = HEADER.unpack(raw)
+        if magic != MAGIC:
+            raise ProtocolError("Bad frame magic {!r}".format(magic))
+        if version > PROTOCOL_VERSION:
+            raise ProtocolError("Unsupported protocol version {}".format(version))
+        try:
+            msg_type = MessageType(msg_type)
+        except ValueError:
+            raise ProtocolError("Unknown message type {}".format(msg_type))
+        return msg_type, count
+
+    def fileno(self):
+        """
+        :return: file descriptor of the pipe handle, so the channel can be waited on with :py:func:`select.select`
+        :rtype: int
+        """
+        return self._file.fileno()
+
+    def read_message(self, first=b''):
+        """
+        Read one complete message
+
+        :param first: header bytes already consumed from the pipe
+        :type first: bytes
+        :return: message type and payload records (None for messages without payload)
+        :rtype: (MessageType, numpy.ndarray or None)
+        """
+        msg_type, count = self.read_header(first)
+        dtype = RECORD_DTYPES[msg_type]
+        if dtype is None:
+            return msg_type, None
+        payload = read_exact(self._file, dtype.itemsize * count)
+        return msg_type, np.frombuffer(payload, dtype=dtype)
+
+    def expect(self, msg_type, first=b''):
+        """
+        Read one message and check its type
+
+        :param msg_type: expected message type
+        :type msg_type: MessageType
+        :param first: header bytes already consumed from the pipe
+        :type first: bytes
+        :return: payload records
+        :rtype: numpy.ndarray or None
+        :raise ProtocolError: if a different message arrives
+        """
+        received, payload = self.read_message(first)
+        if received != msg_type:
+            raise ProtocolError("Expected {} but received {}".format(msg_type.name, received.name))
+        return payload
+
+    def write_message(self, msg_type, records=None):
+        """
+        Write one complete message in a single pipe write. Safe to call from a background
+        thread, e.g. to send ``IMAGES_READY`` while the scan loop is using the pipe.
+
+        :param msg_type: message type
+        :type msg_type: MessageType
+        :param records: payload, converted to the record dtype of the message type
+        :type records: Any
+        """
+        dtype = RECORD_DTYPES[msg_type]
+        if dtype is None:
+            payload = b''
+            count = 0
+        else:
+            payload = np.ascontiguousarray(records, dtype=dtype).reshape(-1)
+            count = len(payload)
+            payload = payload.tobytes()
+        with self._write_lock:
+            self._file.write(HEADER.pack(MAGIC, PROTOCOL_VERSION, msg_type, count) + payload)
+
+    def read_config(self, first=b''):
+        """
+        Read the configuration of the next scan job. Job options sent ahead of the ``CONFIG``
+        message (see :py:data:`JOB_OPTIONS`) are kept as attributes of the pipe, except
+        ``RESUME`` which only applies to the job it precedes.
+
+        :param first: header bytes already consumed from the pipe
+        :type first: bytes
+        :return: scan mode and edge length
+        :rtype: (int, int)
+        :raise ProtocolError: if anything else arrives before the ``CONFIG`` message
+        """
+        self.resume = False
+        msg_type, payload = self.read_message(first)
+        while msg_type in JOB_OPTIONS:
+            if payload is None:
+                payload = True
+            elif msg_type not in RECORD_LIST_OPTIONS:
+                payload = payload[0]
+            setattr(self, JOB_OPTIONS[msg_type], payload)
+            msg_type, payload = self.read_message()
+        if msg_type != MessageType.CONFIG:
+            raise ProtocolError("Expected CONFIG but received {}".format(msg_type.name))
+        config = payload[0]
+        self.mode = int(config['mode'])
+        self.length = 2 * int(config['half_length']) + 1
+        return self.mode, self.length
+
+    def read_file_name(self):
+        """
+        :return: file name sent by the GUI once the scan is finished
+        :rtype: str
+        """
+        return self.expect(MessageType.FILE_NAME).tobytes().decode("ascii")
+
+    def write_readings(self, readings):
+        """
+        :param readings: readings for the coordinates of the last ``COORDS`` message
+        :type readings: numpy.ndarray
+        """
+        self.write_message(MessageType.READINGS, readings)
+
+    def write_move_on(self):
+        """
+        Tell the GUI the current layer is finished and it should start the next one
+        """
+        self.write_message(MessageType.MOVE_ON)
+
+    def write_position(self, position):
+        """
+        :param position: index of the point with the greatest rolling average
+        :type position: int
+        """
+        self.write_message(MessageType.POSITION, position)
+
+    def write_folder_number(self, number):
+        """
+        :param number: suffix allocated to the saved results (0 for none)
+        :type number: int
+        """
+        self.write_message(MessageType.FOLDER_NUMBER, number)
+
+    def request_move(self, x, y):
+        """
+        Ask the GUI to move to a grid point and wait for the ``COORDS`` message it sends on arrival
+
+        :param x: grid x index
+        :type x: int
+        :param y: grid y index
+        :type y: int
+        :return: grid point reached
+        :rtype: numpy.void
+        """
+        self.write_message(MessageType.MOVE, [(x, y)])
+        return self.expect(MessageType.COORDS)[0]
+
+    def request_layer(self, z):
+        """
+        Ask the GUI to move the stage to a height and wait for the ``LAYER`` message it echoes on arrival
+
+        :param z: stage z
+        :type z: float
+        :return: height reached
+        :rtype: float
+        """
+        self.write_message(MessageType.LAYER, [(z,)])
+        return float(self.expect(MessageType.LAYER)[0]['z'])
+
+    def write_peak_fit(self, fit):
+        """
+        :param fit: sub-step peak estimate of the finished scan
+        :type fit: PeakFit
+        """
+        self.write_message(MessageType.PEAK_FIT, [(fit.x, fit.y, fit.value, fit.r_squared,
+                                                   fit.sigma_x, fit.sigma_y)])
+
+    @property
+    def notify_images(self):
+        """
+        **READONLY**
+
+        :value: True if the client asked for an ``IMAGES_READY`` message once the result
+            images of a scan are rendered
+        :type: bool
+        """
+        return not self.legacy and self.render_config is not None and bool(self.render_config['notify'])
+
+    def write_images_ready(self, file_name):
+        """
+        :param file_name: file name the rendered images were saved under
+        :type file_name: str
+        """
+        self.write_message(MessageType.IMAGES_READY, np.frombuffer(file_name.encode("ascii"), dtype=BYTES_DTYPE))
+
+    def write_resumed(self, layer):
+        """
+        :param layer: layer an automatic scan continues from, 0 if there was nothing to resume
+        :type layer: int
+        """
+        self.write_message(MessageType.RESUMED, layer)
+
+    def write_timing(self, timer):
+        """
+        :param timer: latency recorder of the running scan, sent as one record per phase with
+            the p50/p95/p99 durations in us
+        :type timer: LatencyRecorder
+        """
+        self.write_message(MessageType.TIMING, [(PHASES.index(name), stats['count'], stats['p50'], stats['p95'],
+                                                 stats['p99']) for name, stats in timer.summary().items()])
+
+    def write_layers(self, layers):
+        """
+        :param layers: number of layers captured by an automatic scan
+        :type layers: int
+        """
+        self.write_message(MessageType.LAYERS, layers)
+
+
+class LegacyPipe(FramedPipe):
+    """
+    Compatibility shim speaking the original 4 byte messages of the shipped GUI
+    """
+    legacy = True
+
+    def read_config(self, first=b''):
+        """
+        Read the mode and half length bytes sent by the GUI when the pipe is opened
+
+        :param first: mode byte already consumed from the pipe
+        :type first: bytes
+        :return: scan mode and edge length
+        :rtype: (int, int)
+        """
+        if not first:
+            first = read_exact(self._file, 1)
+        self.mode = int.from_bytes(first, "big")
+        self.length = 2 * int.from_bytes(read_exact(self._file, 1), "big", signed=True) + 1
+        return self.mode, self.length
+
+    def read_message(self, first=b''):
+        """
+        Read one legacy message. The GUI sends 2 byte coordinates or the 4 byte
+        'kill'/'done' commands, so a single pipe read returns exactly one message.
+
+        :return: message type and payload records (None for messages without payload)
+        :rtype: (MessageType, numpy.ndarray or None)
+        :raise EOFError: if the GUI closes the pipe
+        """
+        data = self._file.read(4)
+        if not data:
+            raise EOFError("Pipe closed")
+        if data == LEGACY_KILL:
+            return MessageType.KILL, None
+        if data == LEGACY_DONE:
+            return MessageType.DONE, None
+        if len(data) < 2:
+            data += read_exact(self._file, 1)
+        return MessageType.COORDS, np.array([(data[0], data[1])], dtype=COORD_DTYPE)
+
+    def read_file_name(self):
+        """
+        :return: file name sent by the GUI once the scan is finished
+        :rtype: str
+        """
+        size = int.from_bytes(read_exact(self._file, 1), 'big')
+        return read_exact(self._file, size).decode("ascii")
+
+    def write_message(self, msg_type, records=None):
+        """
+        Write a message in the legacy byte format
+
+        :param msg_type: message type
+        :type msg_type: MessageType
+        :param records: payload
+        :type records: Any
+        :raise ProtocolError: for message types the legacy GUI does not understand
+        """
+        if msg_type == MessageType.READINGS:
+            data = b''.join(struct.pack('>i', int(value)) for value in np.ravel(records))
+        elif msg_type == MessageType.MOVE_ON:
+            data = LEGACY_KILL
+        elif msg_type == MessageType.POSITION:
+            data = int(records).to_bytes(2, 'big')
+        elif msg_type in (MessageType.FOLDER_NUMBER, MessageType.LAYERS):
+            data = int(records).to_bytes(4, 'big')
+        else:
+            raise ProtocolError("{} is not supported by the legacy protocol".format(msg_type.name))
+        with self._write_lock:
+            self._file.write(data)
+
+
+def open_pipe(file):
+    """
+    Detect the wire format from the first byte sent by the GUI and read the scan configuration
+
+    :param file: raw pipe handle opened in 'r+b' mode without buffering
+    :type file: io.RawIOBase
+    :return: channel with ``mode`` and ``length`` populated
+    :rtype: FramedPipe or LegacyPipe
+    """
+    first = read_exact(file, 1)
+    if first == MAGIC[:1]:
+        pipe = FramedPipe(file)
+    else:
+        pipe = LegacyPipe(file)
+    pipe.read_config(first)
+    return pipe
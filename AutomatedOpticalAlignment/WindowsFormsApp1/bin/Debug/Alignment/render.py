@@ -0,0 +1,211 @@
+"""
+Background rendering of the scan result images.
+
+The colour map (``<name>_ViewB.jpg``) and surface plot (``<name>.jpg``) of a single scan are drawn
+in a separate process with the Agg backend, so the scan loop can answer the GUI and start the next
+job as soon as the readings are saved. Each pool process keeps one figure of each kind as a
+template and only swaps the data in for every scan. Large surfaces are decimated to at most
+:py:data:`MAX_SURFACE_POINTS` rows and columns.
+
+Images are written to a temporary file and renamed into place, so the GUI, which polls until the
+JPGs load, never reads a half written file.
+
+::
+
+    >>> pool = RenderPool()
+    >>> future = pool.submit(results, "Results/JPG_Data/1_1_0.1", extent=(0.9, 1.1, 0.9, 1.1))
+    >>> future.result()
+    ['Results/JPG_Data/1_1_0.1_ViewB.jpg', 'Results/JPG_Data/1_1_0.1.jpg']
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+MAX_SURFACE_POINTS = 100
+"""Maximum number of rows and columns drawn in a surface plot"""
+
+
+class ScanRenderer:
+    """
+    Reusable colour map and surface figures
+    """
+    def __init__(self, cmap='plasma'):
+        """
+        Initialize instance
+
+        :param cmap: colormap of both plots
+        :type cmap: str
+        """
+        import matplotlib
+        matplotlib.use('Agg')
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from mpl_toolkits.mplot3d import Axes3D
+
+        self.cmap = cmap
+
+        self.map_figure = Figure()
+        FigureCanvasAgg(self.map_figure)
+        self.map_axes = self.map_figure.add_subplot(111)
+        self.image = self.map_axes.imshow(np.zeros((2, 2)), cmap=cmap)
+        self.map_axes.set_aspect('equal')
+        self.colorbar = self.map_figure.colorbar(self.image, ax=self.map_axes, orientation='vertical')
+
+        self.surface_figure = Figure()
+        FigureCanvasAgg(self.surface_figure)
+        self.surface_axes = self.surface_figure.add_subplot(111, projection='3d')
+        self.surface_axes.set_title('Current Readings')
+        self.surface_figure.suptitle('Stepper Scan', fontsize=20)
+        self.surface_axes.set_xlabel('X-Axis', fontsize=8)
+        self.surface_axes.set_ylabel('Y-Axis', fontsize=8)
+        self.surface_axes.set_zlabel('current readings (e-11)', fontsize=8)
+        self.surface = None
+
+    @staticmethod
+    def _save(figure, file_path):
+        temporary = file_path + '.tmp.jpg'
+        figure.savefig(temporary)
+        os.replace(temporary, file_path)
+        return file_path
+
+    def render(self, results, base_path, extent, title='colorMap', suptitle=None):
+        """
+        Draw and save both images of a single scan
+
+        :param results: readings indexed as ``results[x][y]``
+        :type results: numpy.ndarray
+        :param base_path: image path without extension
+        :type base_path: str
+        :param extent: XStart, XEnd, YStart, YEnd of the scan window
+        :type extent: tuple
+        :param title: colour map title
+        :type title: str
+        :param suptitle: colour map figure title
+        :type suptitle: str
+        :return: paths of the saved images
+        :rtype: list of str
+        """
+        results = np.asarray(results, dtype=float)
+        XStart, XEnd, YStart, YEnd = extent
+
+        self.image.set_data(results)
+        self.image.set_extent(extent)
+        self.image.set_clim(results.min(), results.max())
+        self.colorbar.update_normal(self.image)
+        self.map_axes.set_title(title)
+        self.map_figure.suptitle(suptitle or '', fontsize=20)
+        paths = [self._save(self.map_figure, base_path + '_ViewB.jpg')]
+
+        shape = results.shape
+        X, Y = np.meshgrid(range(shape[0]), range(shape[1]))  # `plot_surface` expects `x` and `y` data to be 2D
+        X = ((XEnd - XStart) / shape[0]) * X + XStart
+        Y = ((YEnd - YStart) / shape[1]) * Y + YStart
+
+        if self.surface is not None:
+            self.surface.remove()
+        self.surface = self.surface_axes.plot_surface(
+            X.T, Y.T, results, cmap=self.cmap, edgecolor='none',
+            rcount=min(shape[0], MAX_SURFACE_POINTS), ccount=min(shape[1], MAX_SURFACE_POINTS))
+        self.surface_axes.auto_scale_xyz(X, Y, results)
+        paths.append(self._save(self.surface_figure, base_path + '.jpg'))
+        return paths
+
+
+_renderer = None
+
+
+def render_scan(results, base_path, extent, **kwargs):
+    """
+    Render a single scan with the renderer of the calling process, creating it on first use
+
+    :param results: readings indexed as ``results[x][y]``
+    :type results: numpy.ndarray
+    :param base_path: image path without extension
+    :type base_path: str
+    :param extent: XStart, XEnd, YStart, YEnd of the scan window
+    :type extent: tuple
+    :param kwargs: title and suptitle of the colour map
+    :type kwargs: dict
+    :return: paths of the saved images
+    :rtype: list of str
+    """
+    global _renderer
+    if _renderer is None:
+        _renderer = ScanRenderer()
+    return _renderer.render(results, base_path, extent, **kwargs)
+
+
+class RenderPool:
+    """
+    Process pool rendering scan images off the scan path
+    """
+    def __init__(self, processes=1, name=None):
+        """
+        Initialize instance
+
+        :param processes: number of render processes
+        :type processes: int
+        :param name: pool name that defaults to class name
+        :type name: str
+        """
+        self._processes = processes
+        self._executor = None
+        self._lock = threading.Lock()     # the scan threads of several stations share the pool
+        self.logger = logging.getLogger(name or type(self).__name__)
+
+    def submit(self, results, base_path, extent, callback=None, **kwargs):
+        """
+        Queue a scan for rendering
+
+        :param results: readings indexed as ``results[x][y]``
+        :type results: numpy.ndarray
+        :param base_path: image path without extension
+        :type base_path: str
+        :param extent: XStart, XEnd, YStart, YEnd of the scan window
+        :type extent: tuple
+        :param callback: called with the image paths once both are saved
+        :type callback: callable
+        :param kwargs: title and suptitle of the colour map
+        :type kwargs: dict
+        :return: future resolving to the image paths
+        :rtype: concurrent.futures.Future
+        """
+        with self._lock:
+            if self._executor is None:
+                # spawned as on Windows: a forked child would inherit the pipe handle and the locks
+                # held by the scan thread
+                self._executor = ProcessPoolExecutor(self._processes,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            future = self._executor.submit(render_scan, np.array(results), base_path, tuple(extent), **kwargs)
+
+        def done(finished):
+            if finished.exception() is not None:
+                self.logger.error("Rendering {} failed: {}".format(base_path, finished.exception()))
+            elif callback is not None:
+                try:
+                    callback(finished.result())
+                except (OSError, ValueError) as error:    # ValueError: the pipe was closed meanwhile
+                    self.logger.warning("Could not report {}: {}".format(base_path, error))
+        future.add_done_callback(done)
+        return future
+
+    def shutdown(self, wait=True):
+        """
+        Stop the render processes
+
+        :param wait: finish the queued images first
+        :type wait: bool
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+render_pool = RenderPool()
+"""Pool shared by the scan modes"""
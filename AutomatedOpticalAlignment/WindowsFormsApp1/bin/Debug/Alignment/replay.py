@@ -0,0 +1,191 @@
+"""
+Replay of recorded scans for developing search strategies without the bench.
+
+Every hardware scan is already recorded in its :py:class:`.ScanStore`: the reading of every
+point and, in the ``sequence`` field, the order the points were measured in
+(:py:func:`recorded_sequence`). A :py:class:`ReplayProfile` serves readings at arbitrary
+positions by multilinear interpolation of the recorded grid (mode 1) or volume (mode 3, layer
+index as z). It has the interface of :py:class:`.CouplingProfile`, so it plugs into the
+:py:class:`.SimulatedBench` behind the simulated ``keithley.channel[1].measure.current.value``
+and the real worker and scan code run against it:
+
+::
+
+    >>> profile = ReplayProfile.from_store("Results/Scan_Store/20240312_101502")
+    >>> run_simulated_job(4, half_length=20, profile=profile, options={'strategy': 'nelder_mead'})
+
+Search strategies can also be run straight on its :py:meth:`ReplayProfile.measure`, which
+replays a whole archive of scans in seconds:
+
+    $ python -m Alignment.replay Results/Scan_Store/*.json --strategy pattern nelder_mead
+"""
+import argparse
+import glob
+import itertools
+
+import numpy as np
+
+from Alignment.sampling import SCALE
+from Alignment.scan_store import ScanStore
+from Alignment.search import SEARCH_STRATEGY_IDS, compare_strategies
+
+
+def recorded_sequence(store):
+    """
+    :param store: store of a scan
+    :type store: ScanStore
+    :return: grid index of every measured point ((n, 2) or (n, 3) with the layer) and its
+        reading, in the order of the ``sequence`` field or in index order for stores without one
+    :rtype: (numpy.ndarray, numpy.ndarray)
+    """
+    points = np.argwhere(store.measured)
+    readings = store.data[tuple(points.T)]
+    if 'sequence' in store.fields:
+        order = np.argsort(store.fields['sequence'][tuple(points.T)], kind='stable')
+        points, readings = points[order], readings[order]
+    return points, np.asarray(readings, dtype=float)
+
+
+class ReplayProfile:
+    """
+    Readings at any position, interpolated from a recorded scan
+    """
+    def __init__(self, readings, relative_noise=0.0, noise=0.0):
+        """
+        Initialize instance
+
+        :param readings: recorded readings, [x, y] or [x, y, layer], NaN where nothing was measured
+        :type readings: numpy.ndarray
+        :param relative_noise: standard deviation of the multiplicative noise the simulated bench adds
+        :type relative_noise: float
+        :param noise: standard deviation of the additive noise in A the simulated bench adds
+        :type noise: float
+        :raise ValueError: if no point was measured
+        """
+        readings = np.array(readings, dtype=float)
+        measured = ~np.isnan(readings)
+        if not measured.any():
+            raise ValueError("The recording holds no readings")
+        if readings.ndim == 3:
+            # layers the automatic scan never reached
+            readings = readings[:, :, :np.flatnonzero(measured.any(axis=(0, 1)))[-1] + 1]
+        # points that were skipped read as the darkest reading of the scan
+        self.readings = np.where(np.isnan(readings), np.nanmin(readings), readings)
+        self.relative_noise = relative_noise
+        self.noise = noise
+
+    @classmethod
+    def from_store(cls, path, **kwargs):
+        """
+        :param path: store path with or without extension
+        :type path: str
+        :param kwargs: noise keyword arguments of :py:class:`ReplayProfile`
+        :type kwargs: dict
+        :return: profile replaying the store
+        :rtype: ReplayProfile
+        """
+        return cls(ScanStore.open(path).data, **kwargs)
+
+    @property
+    def shape(self):
+        """
+        **READONLY**
+
+        :value: shape of the recorded grid
+        :type: tuple
+        """
+        return self.readings.shape
+
+    def reading(self, positions):
+        """
+        :param positions: grid positions, shape (n, 2) or (n, 3) for a volume; missing axes are 0
+            and positions outside the recording are clipped to its edge
+        :type positions: numpy.ndarray
+        :return: interpolated readings
+        :rtype: numpy.ndarray
+        """
+        shape = np.array(self.readings.shape)
+        positions = np.atleast_2d(np.asarray(positions, dtype=float))
+        positions = np.pad(positions, ((0, 0), (0, max(len(shape) - positions.shape[1], 0))))[:, :len(shape)]
+        positions = np.clip(positions, 0, shape - 1)
+        base = np.minimum(np.floor(positions).astype(int), np.maximum(shape - 2, 0))
+        fraction = positions - base
+        values = np.zeros(len(positions))
+        for corner in itertools.product((0, 1), repeat=len(shape)):
+            index = np.minimum(base + corner, shape - 1)
+            weight = np.prod(np.where(corner, fraction, 1 - fraction), axis=1)
+            values += weight * self.readings[tuple(index.T)]
+        return values
+
+    def current(self, position, t=0.0):
+        """
+        :param position: stage x, y, z in grid steps
+        :type position: tuple
+        :param t: unused, a recording does not drift
+        :type t: float
+        :return: photocurrent in A, as :py:meth:`.CouplingProfile.current`
+        :rtype: float
+        """
+        return self.reading([position])[0] / SCALE
+
+    def measure(self, points, z=0.0):
+        """
+        :param points: grid points, shape (n, 2)
+        :type points: numpy.ndarray
+        :param z: layer of a recorded volume
+        :type z: float
+        :return: reading at every point, for the search strategies
+        :rtype: numpy.ndarray
+        """
+        points = np.atleast_2d(np.asarray(points, dtype=float))
+        return self.reading(np.column_stack((points, np.full(len(points), z))))
+
+
+def replay_strategies(paths, strategies=None, start=None, **kwargs):
+    """
+    Run search strategies on every layer-0 recording of a set of stores
+
+    :param paths: store paths
+    :type paths: list of str
+    :param strategies: strategy names, defaults to all of them
+    :type strategies: list of str
+    :param start: starting grid point, defaults to the centre of every recording
+    :type start: tuple
+    :param kwargs: keyword arguments passed to every strategy
+    :type kwargs: dict
+    :return: per store, the recorded best point and the result of every strategy by name
+    :rtype: dict of str to (tuple, dict)
+    """
+    results = {}
+    for path in paths:
+        profile = ReplayProfile.from_store(path)
+        grid = profile.readings if profile.readings.ndim == 2 else profile.readings[:, :, 0]
+        best = np.unravel_index(np.argmax(grid), grid.shape)
+        bounds = ((0, 0), (grid.shape[0] - 1, grid.shape[1] - 1))
+        origin = start or (grid.shape[0] // 2, grid.shape[1] // 2)
+        results[path] = (best, compare_strategies(profile.measure, origin, bounds, strategies, **kwargs))
+    return results
+
+
+def main(argv=None):
+    """
+    Command line entry point: replay search strategies on recorded scans and print, per
+    strategy, how often it ended within a grid step of the recorded best point and the mean
+    number of points it measured
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('stores', nargs='+', help="store files or glob patterns")
+    parser.add_argument('--strategy', nargs='+', choices=SEARCH_STRATEGY_IDS)
+    args = parser.parse_args(argv)
+
+    paths = sorted({path for pattern in args.stores for path in glob.glob(pattern)})
+    results = replay_strategies(paths, args.strategy)
+    for name in args.strategy or SEARCH_STRATEGY_IDS:
+        hits = [np.max(np.abs(np.subtract(found[name].position, best))) <= 1 for best, found in results.values()]
+        measurements = [found[name].measurements for _, found in results.values()]
+        print("{:<16} {:>4}/{:<4} found  {:8.1f} points".format(name, sum(hits), len(hits),
+                                                              np.mean(measurements) if measurements else 0))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+"""
+Fixed-size, array-backed rolling window for per-point statistics in the scan loops.
+
+The window is a preallocated ring buffer of ``size`` rows of ``width`` values. Appending overwrites
+the oldest row in O(1) and updates the running mean and sum of squared deviations with Welford's
+add and remove updates, so the mean and variance are O(1) as well and stay accurate for readings
+with a large offset; max, min and spread scan the fixed-size buffer. Memory no longer depends on
+the scan size.
+
+::
+
+    >>> positions = RollingWindow(11, width=2)
+    >>> positions.append(3, 4)
+    >>> positions.newest, positions.spread
+    (array([3., 4.]), array([0., 0.]))
+"""
+import numpy as np
+
+
+class RollingWindow:
+    """
+    Ring buffer of the last ``size`` rows with running statistics
+    """
+    def __init__(self, size, width=1):
+        """
+        Initialize instance
+
+        :param size: number of rows kept
+        :type size: int
+        :param width: number of values per row, e.g. 2 for x/y positions
+        :type width: int
+        """
+        self.size = size
+        self.width = width
+        self._buffer = np.zeros((size, width))
+        self._mean = np.zeros(width)
+        self._m2 = np.zeros(width)     # sum of squared deviations from the mean
+        self._next = 0
+        self.count = 0
+
+    def clear(self):
+        """
+        Drop every row
+        """
+        self._buffer[:] = 0
+        self._mean[:] = 0
+        self._m2[:] = 0
+        self._next = 0
+        self.count = 0
+
+    def append(self, *values):
+        """
+        Add a row, dropping the oldest one once the window is full
+
+        :param values: ``width`` values
+        :type values: float
+        """
+        row = self._buffer[self._next]
+        value = np.asarray(values, dtype=float)
+        if self.count >= self.size:
+            # Welford's update removing the oldest row and adding the new one, n unchanged
+            delta = value - row
+            mean = self._mean + delta / self.size
+            self._m2 += delta * (value - mean + row - self._mean)
+            np.maximum(self._m2, 0, out=self._m2)
+            self._mean = mean
+        else:
+            delta = value - self._mean
+            self._mean += delta / (self.count + 1)
+            self._m2 += delta * (value - self._mean)
+        row[:] = value
+        self._next = (self._next + 1) % self.size
+        self.count += 1
+
+    def _value(self, row):
+        return row[0] if self.width == 1 else row
+
+    @property
+    def full(self):
+        """
+        **READONLY**
+
+        :value: True once ``size`` rows have been appended
+        :type: bool
+        """
+        return self.count >= self.size
+
+    def __len__(self):
+        return min(self.count, self.size)
+
+    def __getitem__(self, age):
+        """
+        :param age: 0 for the newest row, 1 for the one before, ...
+        :type age: int
+        :return: row appended ``age`` rows ago
+        :rtype: float or numpy.ndarray
+        :raise IndexError: if the window holds fewer rows
+        """
+        if not 0 <= age < len(self):
+            raise IndexError("Window holds {} rows".format(len(self)))
+        return self._value(self._buffer[(self._next - 1 - age) % self.size].copy())
+
+    @property
+    def newest(self):
+        """
+        **READONLY**
+
+        :value: last row appended
+        :type: float or numpy.ndarray
+        """
+        return self[0]
+
+    @property
+    def oldest(self):
+        """
+        **READONLY**
+
+        :value: oldest row in the window
+        :type: float or numpy.ndarray
+        """
+        return self[len(self) - 1]
+
+    def values(self):
+        """
+        :return: rows from the newest to the oldest
+        :rtype: numpy.ndarray
+        """
+        order = (self._next - 1 - np.arange(len(self))) % self.size
+        return self._buffer[order]
+
+    @property
+    def mean(self):
+        """
+        **READONLY**
+
+        :value: running mean of every column
+        :type: float or numpy.ndarray
+        """
+        return self._value(self._mean.copy())
+
+    @property
+    def variance(self):
+        """
+        **READONLY**
+
+        :value: running population variance of every column
+        :type: float or numpy.ndarray
+        """
+        return self._value(self._m2 / max(len(self), 1))
+
+    @property
+    def max(self):
+        """
+        **READONLY**
+
+        :value: maximum of every column
+        :type: float or numpy.ndarray
+        """
+        return self._value(self._buffer[:len(self)].max(axis=0))
+
+    @property
+    def min(self):
+        """
+        **READONLY**
+
+        :value: minimum of every column
+        :type: float or numpy.ndarray
+        """
+        return self._value(self._buffer[:len(self)].min(axis=0))
+
+    @property
+    def spread(self):
+        """
+        **READONLY**
+
+        :value: max - min of every column
+        :type: float or numpy.ndarray
+        """
+        rows = self._buffer[:len(self)]
+        return self._value(rows.max(axis=0) - rows.min(axis=0))
+
+    def weighted(self, weights):
+        """
+        :param weights: weight of every row from the newest back, at most ``size`` of them
+        :type weights: numpy.ndarray
+        :return: weighted sum of the newest ``len(weights)`` rows
+        :rtype: float or numpy.ndarray
+        """
+        weights = np.asarray(weights)
+        return self._value(weights @ self.values()[:len(weights)])
@@ -0,0 +1,180 @@
+"""
+Sequential, noise-adaptive averaging of the reading at a scan point.
+
+A :py:class:`SequentialSampler` keeps taking readings at a point until the confidence interval
+of their mean is narrower than a relative or an absolute tolerance, or a maximum number of
+readings has been taken. Readings near the peak, where the relative noise matters, are
+averaged; a dark point is done once the interval is below the absolute tolerance. On the
+Keithley the readings come in buffered bursts (see :py:meth:`.Keithley24XXMeasureBlock.arm`),
+so every extra burst is one GPIB transfer rather than one query per reading.
+
+::
+
+    >>> sampler = SequentialSampler(relative_tolerance=0.01, absolute_tolerance=5, max_samples=32, burst=4)
+    >>> sampler.attach(keithley)
+    >>> sampler.measure()
+    Sample(mean=4875.2, stderr=21.4, count=8)
+    >>> sampler.detach()
+
+Attached to an :py:class:`.Objective` the sampler averages its scores instead, one reading of
+every signal at a time, and returns the mean raw reading of every signal with the sample.
+"""
+from collections import namedtuple
+from statistics import NormalDist
+
+import numpy as np
+
+
+SCALE = 1e11
+"""Readings are photocurrents in units of 10 pA, as sent to the GUI"""
+
+Sample = namedtuple('Sample', ['mean', 'stderr', 'count', 'channels'], defaults=(None,))
+Sample.__doc__ = """Mean of the readings at a point, its standard error (NaN for a single reading), the number
+of readings and, with an objective, the mean reading of every signal by name"""
+
+
+def t_quantile(z, dof):
+    """
+    Student's t quantile by the Cornish-Fisher expansion, within 1% of the exact value from 3
+    degrees of freedom on
+
+    :param z: standard normal quantile of the same probability
+    :type z: float
+    :param dof: degrees of freedom
+    :type dof: int
+    :rtype: float
+    """
+    return z + (z ** 3 + z) / (4 * dof) + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * dof ** 2) + \
+        (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * dof ** 3)
+
+
+class SequentialSampler:
+    """
+    Averages readings until the mean is known to a tolerance
+    """
+    def __init__(self, relative_tolerance=0.01, absolute_tolerance=5.0, max_samples=1, burst=1, min_samples=3,
+                 confidence=0.95):
+        """
+        Initialize instance. The defaults take a single reading per point, as the scans always have.
+
+        :param relative_tolerance: accepted half width of the confidence interval relative to the mean
+        :type relative_tolerance: float
+        :param absolute_tolerance: accepted half width of the confidence interval in reading units
+        :type absolute_tolerance: float
+        :param max_samples: readings after which a point is accepted whatever the interval
+        :type max_samples: int
+        :param burst: readings taken per request to the source meter
+        :type burst: int
+        :param min_samples: readings needed before the spread is trusted
+        :type min_samples: int
+        :param confidence: confidence level of the interval
+        :type confidence: float
+        """
+        self.relative_tolerance = relative_tolerance
+        self.absolute_tolerance = absolute_tolerance
+        self.max_samples = max(max_samples, 1)
+        self.burst = max(min(burst, self.max_samples), 1)
+        self.min_samples = min(max(min_samples, 2), self.max_samples)
+        self.z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        self._read = None
+        self._block = None
+        self._objective = None
+
+    def converged(self, count, mean, stderr):
+        """
+        :param count: number of readings
+        :type count: int
+        :param mean: mean of the readings
+        :type mean: float
+        :param stderr: standard error of the mean
+        :type stderr: float
+        :return: True if no more readings are needed
+        :rtype: bool
+        """
+        if count >= self.max_samples:
+            return True
+        if count < self.min_samples:
+            return False
+        half_width = t_quantile(self.z, count - 1) * stderr
+        return half_width <= max(self.absolute_tolerance, self.relative_tolerance * abs(mean))
+
+    def sample(self, read):
+        """
+        Take bursts of readings until :py:meth:`converged`
+
+        :param read: returns the readings of one burst
+        :type read: callable
+        :return: mean, standard error and number of readings
+        :rtype: Sample
+        """
+        count, mean, m2 = 0, 0.0, 0.0
+        while True:
+            for reading in read():
+                # Welford's update, stable for readings with a large offset
+                count += 1
+                delta = reading - mean
+                mean += delta / count
+                m2 += delta * (reading - mean)
+            stderr = np.sqrt(m2 / (count - 1) / count) if count > 1 else np.nan
+            if self.converged(count, mean, stderr):
+                return Sample(mean, stderr, count)
+
+    @property
+    def channels(self):
+        """
+        **READONLY**
+
+        :value: names of the signals of the attached objective, empty without one
+        :type: tuple
+        """
+        return () if self._objective is None else self._objective.names
+
+    def attach(self, keithley, objective=None):
+        """
+        Read the current of ``keithley`` in :py:meth:`measure`, armed for bursts if the driver supports them,
+        or the score of ``objective``
+
+        :param keithley: connected and configured source meter
+        :type keithley: Keithley2400
+        :param objective: objective scoring every reading instead of the photocurrent, closed on
+            :py:meth:`detach`
+        :type objective: Objective
+        """
+        if objective is not None:
+            self._objective = objective
+            return
+        block = keithley.channel[1].measure.current
+        if self.burst > 1 and hasattr(block, 'arm'):
+            block.arm(self.burst)
+            self._block = block
+            self._read = lambda: SCALE * block.read_burst()
+        else:
+            self._read = lambda: (SCALE * block.value,)
+
+    def detach(self):
+        """
+        Restore the single reading mode of the source meter
+        """
+        if self._block is not None:
+            self._block.disarm()
+            self._block = None
+        if self._objective is not None:
+            self._objective.close()
+            self._objective = None
+        self._read = None
+
+    def measure(self):
+        """
+        :return: averaged reading at the current position of the attached source meter or objective
+        :rtype: Sample
+        """
+        if self._objective is None:
+            return self.sample(self._read)
+        channels = []
+
+        def read():
+            reading = self._objective.read()
+            channels.append(reading.channels)
+            return reading.score,
+        sample = self.sample(read)
+        return sample._replace(channels=dict(zip(self._objective.names, np.mean(channels, axis=0))))
@@ -0,0 +1,1456 @@
+"""
+Scan loops for the modes requested by the GUI in the first byte (or ``CONFIG`` message)
+of a pipe session:
+
+- 0: single scan, no hardware
+- 1: single scan with the Keithley connected
+- 2: automatic multi-layer scan, no hardware
+- 3: automatic multi-layer scan with the Keithley connected
+- 4: peak search with the Keithley connected, the script picks the points to visit
+- 5: adaptive single scan with the Keithley connected, refined only where the signal has structure
+- 6: fly scan with the Keithley connected, every row swept without stopping (framed clients only)
+- 7: focus search with the Keithley connected, golden-section search over z of in-plane peak
+  searches (framed clients only)
+- 8: dither tracking with the Keithley connected, holding the peak with the piezo stages until
+  the GUI stops it (framed clients only)
+
+The raster modes 0 to 3 are configurations of one :py:class:`ScanEngine` (:py:data:`RASTER_SCANS`):
+a measurement source (the loop counter, or the Keithley or objective through a sampler), a
+termination policy (a single layer, or layers moved on by the rolling-average rule) and output
+sinks (CSV and images, layer CSVs, latency summary, peak fit). The other modes have loops of
+their own.
+
+Each mode runs one complete job on an already opened pipe and leaves the source meter
+session open, so a persistent :py:class:`.AlignmentWorker` can run the next job straight away.
+Readings are streamed into a :py:class:`.ScanStore` under ``Results/Scan_Store`` as they are
+taken, so an interrupted scan can be recovered; the CSV results are written at the end and the
+JPG images are rendered in the background by :py:data:`.render_pool`. Saved results get their
+numbered names from the :py:class:`.ScanCatalog`, which keeps their metadata. Runs that find a peak
+are added to the :py:class:`.AlignmentHistory` under the DUT id and recipe of the client's
+``DUT_CONFIG``. When it asked for a warm start, the raster and search modes first send it the
+``PRIOR`` window of the recipe (:py:func:`warm_start`): the search modes start from its centre
+within its bounds, the GUI rasters only that window in modes 0 to 3. When the client sent
+``BASELINE_CONFIG`` the dark level measured at its reference point (see :py:class:`.Baseline`)
+is subtracted from the results before they are saved and fitted; the store keeps the raw readings.
+When the client sent ``OBJECTIVE_CONFIG`` the point-by-point modes score every point by an
+:py:class:`.Objective` of the photocurrent and the power meter channels instead of the
+photocurrent alone, and the store keeps the raw reading of every signal in a field of its own.
+"""
+import functools
+import logging
+import os.path
+import sqlite3
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from Alignment.adaptive import adaptive_scan
+from Alignment.baseline import Baseline
+from Alignment.catalog import ScanCatalog, suffixed
+from Alignment.first_light import FIRST_LIGHT_PATTERN_IDS, find_first_light
+from Alignment.focus import find_focus, focus_layers
+from Alignment.history import AlignmentHistory, Run
+from Alignment.fly_scan import reconstruct_row
+from Alignment.objective import TRANSFORMS, Objective, Signal
+from Alignment.peak_fit import PeakFitError, brightest_point, fit_peak
+from Alignment.pipe_protocol import MessageType, ProtocolError
+from Alignment.render import render_pool
+from Alignment.rolling import RollingWindow
+from Alignment.sampling import SCALE, SequentialSampler
+from Alignment.scan_store import ScanStore
+from Alignment.search import SEARCH_STRATEGIES, SEARCH_STRATEGY_IDS
+from Alignment.timing import MEASURE, PIPE_WAIT, REPLY, LatencyRecorder
+from Alignment.tracking import DitherLockIn
+from Alignment.viewer import write_cache
+
+
+logger = logging.getLogger(__name__)
+
+
+def scan_geometry(file_name):
+    """
+    :param file_name: file name sent by the GUI, starting with ``<x>_<y>_<step>``
+    :type file_name: str
+    :return: scan centre and step size for the store header, empty if the name has another layout
+    :rtype: dict
+    """
+    try:
+        x, y, step = (float(value) for value in file_name.split('_')[:3])
+    except ValueError:
+        return {}
+    return {'centre': [x, y], 'step': step}
+
+
+def allocate(base, extension="", kind='single'):
+    """
+    Reserve the first free name of a scan in the :py:class:`.ScanCatalog`. When the catalog
+    cannot be written the name is found by probing the files, as before the catalog existed.
+
+    :param base: path the scan is saved under, without suffix and extension
+    :type base: str
+    :param extension: file extension, empty for a folder
+    :type extension: str
+    :param kind: kind of results, see :py:data:`.KINDS`
+    :type kind: str
+    :return: catalog id (None without catalog), suffix and path of the reserved name
+    :rtype: Allocation or tuple
+    """
+    try:
+        return ScanCatalog().allocate(base, extension, kind)
+    except sqlite3.Error as error:
+        logger.warning("Scan not recorded in the catalog: {}".format(error))
+    suffix = 0
+    while os.path.exists(suffixed(base, suffix, extension)):
+        suffix += 1
+    return None, suffix, suffixed(base, suffix, extension)
+
+
+def catalog_scan(scan_id, **metadata):
+    """
+    Record the metadata of saved results in the :py:class:`.ScanCatalog`
+
+    :param scan_id: catalog id returned by :py:func:`allocate`, None without catalog
+    :type scan_id: int
+    :param metadata: keyword arguments of :py:meth:`.ScanCatalog.complete`
+    :type metadata: dict
+    """
+    if scan_id is None:
+        return
+    try:
+        ScanCatalog().complete(scan_id, **metadata)
+    except sqlite3.Error as error:
+        logger.warning("Scan not recorded in the catalog: {}".format(error))
+
+
+def save_single_scan(pipe, results, title='colorMap', suptitle=None, store=None):
+    """
+    Save a single scan as CSV, allocating a numbered file name in the :py:class:`.ScanCatalog`
+    when one with the same name already exists, and queue its colour map and surface plot JPGs on the
+    :py:data:`.render_pool`. Framed clients that asked for it in a ``RENDER_CONFIG`` message
+    get an ``IMAGES_READY`` message once both images are saved.
+
+    :param pipe: GUI channel returned by :py:func:`.open_pipe`
+    :type pipe: FramedPipe
+    :param results: readings of every grid point
+    :type results: numpy.ndarray
+    :param title: colour map title
+    :type title: str
+    :param suptitle: colour map figure title
+    :type suptitle: str
+    :param store: store of the scan, recorded in the catalog
+    :type store: ScanStore
+    :return: file name the scan was saved under
+    :rtype: str
+    """
+    base_path = "Results/CSV_Data/"
+
+    file_name = pipe.read_file_name()
+
+    shape = list(results.shape)
+    file_name_split = file_name.split('_')
+
+    XStart = float(file_name_split[0]) - ((shape[0] - 1) / 2 * float(file_name_split[2]))
+    XEnd = float(file_name_split[0]) + ((shape[0] - 1) / 2 * float(file_name_split[2]))
+    YStart = float(file_name_split[1]) - ((shape[1] - 1) / 2 * float(file_name_split[2]))
+    YEnd = float(file_name_split[1]) + ((shape[1] - 1) / 2 * float(file_name_split[2]))
+
+    scan_id, suffix, file_path = allocate(base_path + file_name, ".csv")
+    pipe.write_folder_number(suffix)
+    name, file_name = file_name, suffixed(file_name, suffix)
+
+    np.savetxt(file_path, results, delimiter=",")
+    # the viewers map the binary copy instead of parsing the CSV
+    write_cache(results, file_path)
+    catalog_scan(scan_id, name=name, shape=shape, store=None if store is None else store.path,
+                 **scan_geometry(name))
+
+    def images_ready(paths):
+        if pipe.notify_images:
+            pipe.write_images_ready(file_name)
+
+    render_pool.submit(results, "Results/JPG_Data/" + file_name, (XStart, XEnd, YStart, YEnd),
+                       callback=images_ready, title=title, suptitle=suptitle)
+
+    return file_name
+
+
+def report_peak_fit(pipe, results, mask=None):
+    """
+    Fit the peak of a finished single scan between grid points, with a Gaussian or, failing
+    that, a local paraboloid, and send it to framed clients in a ``PEAK_FIT`` message. When
+    neither model fits they are sent the brightest grid point with ``r_squared`` 0 and NaN
+    standard errors instead, so they never wait for a fit that does not come.
+
+    :param pipe: GUI channel returned by :py:func:`.open_pipe`
+    :type pipe: FramedPipe
+    :param results: readings of every grid point
+    :type results: numpy.ndarray
+    :param mask: points that were actually measured
+    :type mask: numpy.ndarray
+    :return: fitted peak, None if neither model fits
+    :rtype: PeakFit
+    """
+    for model in ('gaussian', 'paraboloid'):
+        try:
+            fit = fit_peak(results, model, mask=mask)
+            break
+        except PeakFitError as error:
+            logger.warning("{} peak fit failed: {}".format(model, error))
+    else:
+        if not pipe.legacy:
+            pipe.write_peak_fit(brightest_point(results, mask))
+        return None
+
+    logger.info("Peak at ({:.2f} +/- {:.2f}, {:.2f} +/- {:.2f}), R^2 {:.3f}".format(
+        fit.x, fit.sigma_x, fit.y, fit.sigma_y, fit.r_squared))
+    if not pipe.legacy:
+        pipe.write_peak_fit(fit)
+    return fit
+
+
+def start_timing(pipe, keithley):
+    """
+    :param pipe: GUI channel returned by :py:func:`.open_pipe`
+    :type pipe: FramedPipe
+    :param keithley: source meter whose error checking is timed
+    :type keithley: Keithley2400
+    :return: latency recorder of a scan, sending live ``TIMING`` reports if the client asked for them
+    :rtype: LatencyRecorder
+    """
+    timer = LatencyRecorder()
+    if pipe.timing_config is not None and not pipe.legacy:
+        timer.report_interval = int(pipe.timing_config['interval'])
+        timer.report = pipe.write_timing
+    timer.attach(keithley)
+    return timer
+
+
+def finish_timing(timer, file_path):
+    """
+    Stop timing the driver, log the latency summary and save it as CSV
+
+    :param timer: latency recorder of the scan
+    :type timer: LatencyRecorder
+    :param file_path: CSV file path, next to the scan results
+    :type file_path: str
+    """
+    timer.detach()
+    logger.info("Scan latency per point:\n" + timer.format_summary())
+    timer.write_summary(file_path)
+
+
+SAMPLE_FIELDS = ('count', 'stderr', 'sequence')
+"""Per-point fields stored with the readings of the hardware scans: the sample count and standard
+error of a :py:class:`.SequentialSampler` and the point index the :py:class:`.Baseline` is
+interpolated at. Scans with an objective add a field per signal."""
+
+
+def sample_fields(sample, sequence):
+    """
+    :param sample: averaged reading of a point
+    :type sample: Sample
+    :param sequence: point index the baseline is interpolated at
+    :type sequence: int
+    :return: per-point fields of the point for :py:meth:`.ScanStore.record`
+    :rtype: dict
+    """
+    return dict(sample.channels or {}, count=sample.count, stderr=sample.stderr, sequence=sequence)
+
+
+def start_objective(pipe, keithley, power_meter=None):
+    """
+    :param pipe: GUI channel returned by :py:func:`.open_pipe`
+    :type pipe: FramedPipe
+    :param keithley: connected and configured source meter, signal 0 (``current``)
+    :type keithley: Keithley2400
+    :param power_meter: connected optical power meter, channel n is signal n (``power<n>``)
+    :type power_meter: Keysight81635A
+    :return: objective of the signals of the client's ``OBJECTIVE_CONFIG``, None without one. A
+        reference of 0 is unset.
+    :rtype: Objective
+    :raise ProtocolError: for a power meter signal without a power meter or an unknown transform
+    """
+    config = pipe.objective_config
+    if config is None:
+        return None
+    signals = []
+    for record in config:
+        channel, transform = int(record['signal']), int(record['transform'])
+        if transform >= len(TRANSFORMS):
+            raise ProtocolError("Unknown objective transform {}".format(transform))
+        options = {'transform': TRANSFORMS[transform], 'weight': float(record['weight']),
+                   'reference': float(record['reference']) or 1.0}
+        if channel == 0:
+            block = keithley.channel[1].measure.current
+            signals.append(Signal('current', lambda block=block: SCALE * block.value, keithley, **options))
+        elif power_meter is None:
+            raise ProtocolError("Objective signal {} needs a power meter".format(channel))
+        else:
+            block = power_meter.channel[channel]
+            signals.append(Signal('power{}'.format(channel), lambda block=block: block.value, power_meter, **options))
+    logger.info("Objective: {}".format(", ".join("{:g} x {} {}".format(signal.weight, signal.transform, signal.name)
+                                                  for signal in signals)))
+    return Objective(signals)
+
+
+def start_sampling(pipe, keithley, power_meter=None):
+    """
+    :param pipe: GUI channel returned by :py:func:`.open_pipe`
+    :type pipe: FramedPipe
+    :param keithley: connected and configured source meter
+    :type keithley: Keithley2400
+    :param power_meter: connected optical power meter for the objective
+    :type power_meter: Keysight81635A
+    :return: sampler attached to the source meter, or to the :py:func:`start_objective` of the
+        client, averaging each point as set in the client's ``SAMPLING_CONFIG`` or taking a single
+        reading without one
+    :rtype: SequentialSampler
+    """
+    config = pipe.sampling_config
+    if config is None:
+        sampler = SequentialSampler()
+    else:
+        sampler = SequentialSampler(float(config['relative_tolerance']), float(config['absolute_tolerance']),
+                                    int(config['max_samples']), int(config['burst']))
+    sampler.attach(keithley, start_objective(pipe, keithley, power_meter))
+    return sampler
+
+
+def start_baseline(pipe, read, state=None):
+    """
+    :param pipe: GUI channel returned by :py:func:`.open_pipe`
+    :type pipe: FramedPipe
+    :param read: returns one reading at the current position
+    :type read: callable
+    :param state: :py:meth:`.Baseline.state` saved with the last completed layer, when resuming
+    :type state: dict
+    :return: baseline measured at the reference point of the client's ``BASELINE_CONFIG``, which
+        is requested with a ``MOVE`` message and its averaged reading echoed back. Zero without one.
+    :rtype: Baseline
+    """
+    config = pipe.baseline_config
+    if config is None:
+        return Baseline(**(state or {}))
+    x, y, samples = int(config['x']), int(config['y']), max(int(config['samples']), 1)
+
+    def measure_reference():
+        pipe.request_move(x, y)
+        level = np.mean([read() for _ in range(samples)])
+        pipe.write_readings([level])
+        logger.info("Dark reference {:.4g} at ({}, {})".format(level, x, y))
+        return level
+    return Baseline(measure_reference, int(config['interval']), **(state or {}))
+
+
+def subtract_baseline(baseline, store, results=None, layer=None):
+    """
+    :param baseline: baseline of the scan
+    :type baseline: Baseline
+    :param store: store of the scan
+    :type store: ScanStore
+    :param results: readings to correct, defaults to the readings of the store
+    :type results: numpy.ndarray
+    :param layer: layer index of an automatic scan
+    :type layer: int
+    :return: readings minus the background at the time each point was measured
+    :rtype: numpy.ndarray
+    """
+    results = store.layer(layer) if results is None else results
+    return baseline.correct(results, store.layer(layer, fill_value=np.nan, field='sequence'))
+
+
+def open_layer_store(pipe, fields=()):
+    """
+    Create the store of an automatic scan or, when the client sent ``RESUME``, reopen the last
+    unfinished one of the same mode and size. Readings of the layer that was interrupted are
+    discarded and the client is told in a ``RESUMED`` message which layer to start from.
+
+    :param pipe: GUI channel returned by :py:func:`.open_pipe`
+    :type pipe: FramedPipe
+    :param fields: per-point fields of the store
+    :type fields: tuple
+    :return: store and the loop state saved with the last completed layer (empty for a new scan)
+    :rtype: (ScanStore, dict)
+    """
+    shape = (pipe.length,) * 3
+    store = ScanStore.latest(mode=pipe.mode, shape=list(shape), fields=list(fields)) if pipe.resume else None
+    if store is None:
+        store = ScanStore.create(shape, mode=pipe.mode, fields=fields)
+    checkpoint = store.header.get('checkpoint', {})
+    if pipe.resume:
+        z = checkpoint.get('z', 0)
+        for array in (store.data,) + tuple(store.fields.values()):
+            array[:, :, z:] = np.nan
+        logger.info("Resuming {} from layer {}".format(store.path, z))
+        pipe.write_resumed(z)
+    return store, checkpoint
+
+
+AVERAGE_WEIGHTS = 2.0 ** -np.array([7, 7, 6, 5, 4, 3, 2, 1])
+"""Weights of the last 8 readings from the newest back, the same as halving the running value
+towards each of the 7 previous readings in turn"""
+
+POSITION_WINDOW = 11
+"""Number of points the move-on rule looks back over"""
+
+
+def rolling_average(readings, i):
+    """
+    :param readings: recent readings of the layer
+    :type readings: RollingWindow
+    :param i: point counter
+    :type i: int
+    :return: weighted average of the last 8 readings once 9 points are in, the last reading before
+    :rtype: float
+    """
+    return readings.weighted(AVERAGE_WEIGHTS) if i > 9 else readings.newest
+
+
+def returned_to_start(positions):
+    """
+    Move-on rule of the automatic scans: the probe is back at the point it was at 10 points ago,
+    and that point is not on the upper x or y edge of the last 11 points
+
+    :param positions: x/y of the recent points of the layer
+    :type positions: RollingWindow
+    :rtype: bool
+    """
+    if not positions.full:
+        return False
+    first, last, top = positions.oldest, positions.newest, positions.max
+    return first[0] == last[0] and first[1] == last[1] and first[0] != top[0] and first[1] != top[1]
+
+
+def checkpoint_layer(store, z, i, Greatest_Average, Greatest_Average_Position, **state):
+    """
+    Save the loop state of an automatic scan once a layer is complete, so it can be resumed
+    from the next layer
+
+    :param store: store of the scan
+    :type store: ScanStore
+    :param z: index of the next layer
+    :type z: int
+    :param i: point counter
+    :type i: int
+    :param Greatest_Average: greatest rolling average of the layer
+    :type Greatest_Average: float
+    :param Greatest_Average_Position: point counter at the greatest rolling average
+    :type Greatest_Average_Position: int
+    :param state: state of the measurement source restored with the scan, e.g. its ``baseline``
+    :type state: dict
+    """
+    store.checkpoint(z=z, i=i, greatest_average=float(Greatest_Average),
+                     greatest_average_position=int(Greatest_Average_Position), **state)
+
+
+def save_multi_layer_scan(pipe, layers, store, **header):
+    """
+    Save the completed layers of an automatic scan as CSV in a new ``Multi-Layer-Scan`` folder,
+    numbered in the :py:class:`.ScanCatalog` when earlier scans took the name, and close the store
+
+    :param pipe: GUI channel returned by :py:func:`.open_pipe`
+    :type pipe: FramedPipe
+    :param layers: readings of every completed layer
+    :type layers: list of numpy.ndarray
+    :param store: store of the scan
+    :type store: ScanStore
+    :param header: additional entries of the store header
+    :type header: dict
+    :return: folder and file name the layers were saved under
+    :rtype: (str, str)
+    """
+    scan_id, suffix, base_path = allocate("Results/CSV_Data/Multi-Layer-Scan", kind='multi_layer')
+    os.makedirs(base_path, exist_ok=True)
+    pipe.write_folder_number(suffix)
+
+    file_name = pipe.read_file_name()
+
+    pipe.write_layers(len(layers))
+    store.close(file_name=file_name, layers=len(layers), **header)
+
+    for l, layer in enumerate(layers):
+        np.savetxt(base_path + "/" + file_name + "_Layer" + str(l) + ".csv", layer, delimiter=",")
+    catalog_scan(scan_id, name=file_name, shape=store.data.shape[:2], layers=len(layers), store=store.path,
+                 **scan_geometry(file_name))
+    return base_path, file_name
+
+
+class CounterSource:
+    """
+    Measurement source of the modes without hardware: the point counter of the layer stands in
+    for the reading
+    """
+    fields = ()
+    """Per-point fields stored with the readings"""
+
+    def __init__(self, pipe, keithley=None, power_meter=None):
+        """
+        Initialize instance
+
+        :param pipe: GUI channel returned by :py:func:`.open_pipe`
+        :type pipe: FramedPipe
+        :param keithley: unused, accepted so every source has the same signature
+        :type keithley: Keithley2400 or None
+        :param power_meter: unused, accepted so every source has the same signature
+        :type power_meter: Keysight81635A or None
+        """
+        self.timer = LatencyRecorder()
+        self.baseline = Baseline()
+
+    def start(self, pipe, checkpoint):
+        """
+        :param pipe: GUI channel returned by :py:func:`.open_pipe`
+        :type pipe: FramedPipe
+        :param checkpoint: loop state saved with the last completed layer, empty for a new scan
+        :type checkpoint: dict
+        """
+
+    def measure(self, i, n):
+        """
+        :param i: point counter of the layer
+        :type i: int
+        :param n: index of the point in the batch the GUI sent
+        :type n: int
+        :return: reading of the point and its per-point fields
+        :rtype: (float, dict)
+        """
+        return i, {}
+
+    def stop(self):
+        """
+        Release the instruments once the GUI ended the scan
+        """
+
+    def state(self):
+        """
+        :return: state saved in the store header and restored when the scan is resumed
+        :rtype: dict
+        """
+        return {}
+
+    def results(self, store, layer=None):
+        """
+        :param store: store of the scan
+        :type store: ScanStore
+        :param layer: layer index of an automatic scan
+        :type layer: int
+        :return: readings saved as results
+        :rtype: numpy.ndarray
+        """
+        return store.layer(layer)
+
+
+class SamplerSource(CounterSource):
+    """
+    Measurement source reading the Keithley, or the objective of the client's
+    ``OBJECTIVE_CONFIG``, through a :py:class:`.SequentialSampler`, timed and corrected by the
+    dark baseline of the client's ``BASELINE_CONFIG``. Simulated and replayed scans use it with
+    the :py:class:`.SimulatedKeithley`.
+    """
+    def __init__(self, pipe, keithley, power_meter=None):
+        """
+        Initialize instance
+
+        :param pipe: GUI channel returned by :py:func:`.open_pipe`
+        :type pipe: FramedPipe
+        :param keithley: connected and configured source meter
+        :type keithley: Keithley2400
+        :param power_meter: connected optical power meter read by the objective of the client's
+            ``OBJECTIVE_CONFIG``
+        :type power_meter: Keysight81635A or None
+        """
+        super().__init__(pipe)
+        self.timer = start_timing(pipe, keithley)
+        self.sampler = start_sampling(pipe, keithley, power_meter)
+        self.fields = SAMPLE_FIELDS + self.sampler.channels
+
+    def start(self, pipe, checkpoint):
+        self.baseline = start_baseline(pipe, lambda: self.sampler.measure().mean, checkpoint.get('baseline'))
+
+    def measure(self, i, n):
+        sample = self.sampler.measure()
+        return sample.mean, sample_fields(sample, self.baseline.points + n)
+
+    def stop(self):
+        self.sampler.detach()
+
+    def state(self):
+        return {'baseline': self.baseline.state()}
+
+    def results(self, store, layer=None):
+        return subtract_baseline(self.baseline, store, layer=layer)
+
+
+class SingleLayer:
+    """
+    Termination policy of a single scan: one layer, ended by the GUI
+    """
+    layer = None
+    """Store layer the readings are recorded in"""
+
+    def __init__(self, pipe):
+        """
+        Initialize instance
+
+        :param pipe: GUI channel returned by :py:func:`.open_pipe`
+        :type pipe: FramedPipe
+        """
+        self.i = 1
+
+    def open_store(self, pipe, fields):
+        """
+        :param pipe: GUI channel returned by :py:func:`.open_pipe`
+        :type pipe: FramedPipe
+        :param fields: per-point fields of the store
+        :type fields: tuple
+        :return: store of the scan and the loop state to resume from (empty for a new scan)
+        :rtype: (ScanStore, dict)
+        """
+        return ScanStore.create((pipe.length, pipe.length), mode=pipe.mode, fields=fields), {}
+
+    def reading(self, value):
+        """
+        :param value: reading of a point
+        :type value: float
+        :return: reading sent to the GUI
+        :rtype: float
+        """
+        return value
+
+    def move_on(self, x, y, level):
+        """
+        :param x: grid x index of the point just measured
+        :type x: int
+        :param y: grid y index of the point just measured
+        :type y: int
+        :param level: its reading above the dark baseline
+        :type level: float
+        :return: whether the GUI is to move on to the next layer
+        :rtype: bool
+        """
+        return False
+
+    def done(self, pipe, store, source):
+        """
+        Handle the ``DONE`` the GUI sends after a complete layer
+
+        :param pipe: GUI channel returned by :py:func:`.open_pipe`
+        :type pipe: FramedPipe
+        :param store: store of the scan
+        :type store: ScanStore
+        :param source: measurement source of the scan
+        :type source: CounterSource
+        :raise ProtocolError: a single scan has no next layer
+        """
+        raise ProtocolError("Single scans end with KILL, not DONE")
+
+    def next_layer(self, store, source):
+        """
+        Start the next layer and checkpoint the scan
+
+        :param store: store of the scan
+        :type store: ScanStore
+        :param source: measurement source of the scan
+        :type source: CounterSource
+        """
+
+    @property
+    def layers(self):
+        """
+        **READONLY**
+
+        :value: store layers saved as results
+        :type: list
+        """
+        return [None]
+
+
+class MultiLayer(SingleLayer):
+    """
+    Termination policy of the automatic scans: the GUI starts the next layer after a complete
+    raster (``DONE``) or when the script tells it to move on, once the rolling average of the
+    readings exceeds the threshold of the layer and the probe is back where it was 10 points ago
+    """
+    def __init__(self, pipe, threshold):
+        """
+        Initialize instance
+
+        :param pipe: GUI channel returned by :py:func:`.open_pipe`
+        :type pipe: FramedPipe
+        :param threshold: rolling average to exceed before moving on, as a function of the layer index
+        :type threshold: callable
+        """
+        super().__init__(pipe)
+        self.threshold = threshold
+        self.layer = 0
+        self.greatest_average = 0
+        self.greatest_average_position = 0
+        self.recent_readings = RollingWindow(len(AVERAGE_WEIGHTS))
+        self.positions = RollingWindow(POSITION_WINDOW, width=2)
+
+    def open_store(self, pipe, fields):
+        store, checkpoint = open_layer_store(pipe, fields)
+        self.layer = checkpoint.get('z', self.layer)
+        self.i = checkpoint.get('i', self.i)
+        self.greatest_average = checkpoint.get('greatest_average', self.greatest_average)
+        self.greatest_average_position = checkpoint.get('greatest_average_position', self.greatest_average_position)
+        return store, checkpoint
+
+    def reading(self, value):
+        return int(value)
+
+    def move_on(self, x, y, level):
+        self.recent_readings.append(int(level))
+        self.positions.append(x, y)
+        average = rolling_average(self.recent_readings, self.i)
+        if average > self.greatest_average:
+            self.greatest_average = average
+            self.greatest_average_position = self.i
+        return average > self.threshold(self.layer) and returned_to_start(self.positions)
+
+    def done(self, pipe, store, source):
+        pipe.write_position(self.greatest_average_position)
+        self.next_layer(store, source)
+
+    def next_layer(self, store, source):
+        self.i = 0
+        self.layer += 1
+        self.greatest_average = 0
+        self.greatest_average_position = 0
+        self.recent_readings.clear()
+        self.positions.clear()
+        checkpoint_layer(store, self.layer, self.i, self.greatest_average, self.greatest_average_position,
+                         **source.state())
+
+    @property
+    def layers(self):
+        """
+        **READONLY**
+
+        :value: completed layers, saved as results
+        :type: list
+        """
+        return list(range(self.layer))
+
+
+def counter_threshold(z):
+    """
+    :param z: layer index
+    :type z: int
+    :return: move-on threshold of the automatic scan without hardware
+    :rtype: float
+    """
+    return 5000
+
+
+def photocurrent_threshold(z):
+    """
+    :param z: layer index
+    :type z: int
+    :return: move-on threshold of the automatic scan with the Keithley, rising 10 % of 150 per layer
+    :rtype: float
+    """
+    return (0.5 + z / 10) * 150
+
+
+class ScanJob:
+    """
+    State of one scan run by a :py:class:`ScanEngine`, handed to its output sinks
+    """
+    def __init__(self, pipe, source, policy, started):
+        """
+        Initialize instance
+
+        :param pipe: GUI channel returned by :py:func:`.open_pipe`
+        :type pipe: FramedPipe
+        :param source: measurement source
+        :type source: CounterSource
+        :param policy: termination policy
+        :type policy: SingleLayer
+        :param started: ``time.perf_counter()`` at the start of the job
+        :type started: float
+        """
+        self.pipe = pipe
+        self.source = source
+        self.policy = policy
+        self.started = started
+        self.store = None
+        """:type: ScanStore"""
+        self.results = None
+        """Saved readings of a single scan, :type: numpy.ndarray"""
+        self.file_name = None
+        """File name the results were saved under, :type: str"""
+        self.timing_path = None
+        """Path of the latency summary next to the results, :type: str"""
+        self.prior = None
+        """Warm-start window sent to the client before its first batch, :type: Prior"""
+
+
+def save_scan(job, title='colorMap', suptitle=None):
+    """
+    Output sink saving a single scan as CSV with its images and closing the store
+
+    :param job: finished scan
+    :type job: ScanJob
+    :param title: colour map title
+    :type title: str
+    :param suptitle: colour map figure title
+    :type suptitle: str
+    """
+    job.results = job.source.results(job.store)
+    job.file_name = save_single_scan(job.pipe, job.results, title, suptitle, store=job.store)
+    job.store.close(file_name=job.file_name, **job.source.state(), **scan_geometry(job.file_name))
+    job.timing_path = "Results/CSV_Data/" + job.file_name + "_timing.csv"
+
+
+def save_layers(job):
+    """
+    Output sink saving the completed layers of an automatic scan as CSV and closing the store
+
+    :param job: finished scan
+    :type job: ScanJob
+    """
+    layers = [job.source.results(job.store, layer) for layer in job.policy.layers]
+    base_path, job.file_name = save_multi_layer_scan(job.pipe, layers, job.store, **job.source.state())
+    job.timing_path = base_path + "/" + job.file_name + "_timing.csv"
+
+
+def save_timing(job):
+    """
+    Output sink saving the latency summary of the scan next to its results
+
+    :param job: finished scan
+    :type job: ScanJob
+    """
+    finish_timing(job.source.timer, job.timing_path)
+
+
+def report_peak(job):
+    """
+    Output sink sending framed clients the sub-step ``PEAK_FIT`` of a single scan and recording
+    the run in the :py:class:`.AlignmentHistory`
+
+    :param job: finished scan
+    :type job: ScanJob
+    """
+    fit = report_peak_fit(job.pipe, job.results)
+    if fit is not None:
+        record_run(job.pipe, job.started, (fit.x, fit.y), fit.value, np.count_nonzero(~np.isnan(job.store.data)),
+                   store=job.store)
+
+
+ScanConfig = namedtuple('ScanConfig', ['source', 'policy', 'sinks'])
+ScanConfig.__doc__ = """Measurement source and termination policy of a raster scan, both called with the pipe to
+start a job, and the output sinks the finished job is passed to in turn"""
+
+
+class ScanEngine:
+    """
+    Raster scan loop shared by modes 0 to 3: the GUI sends batches of grid points, the engine
+    measures every point, records it in the store and sends the batch of readings back until
+    the GUI ends the scan with ``KILL``
+    """
+    def __init__(self, config):
+        """
+        Initialize instance
+
+        :param config: pieces of the scan
+        :type config: ScanConfig
+        """
+        self.config = config
+
+    def __call__(self, pipe, keithley, power_meter=None):
+        """
+        Run one scan job, with the signature of every function of :py:data:`SCAN_MODES`
+
+        :param pipe: GUI channel returned by :py:func:`.open_pipe`
+        :type pipe: FramedPipe
+        :param keithley: connected and configured source meter, None without hardware
+        :type keithley: Keithley2400 or None
+        :param power_meter: connected optical power meter read by the objective of the client's
+            ``OBJECTIVE_CONFIG``
+        :type power_meter: Keysight81635A or None
+        :return: finished scan
+        :rtype: ScanJob
+        """
+        started = time.perf_counter()
+        # sent before the GUI reads any reading, so it can raster only the window of the prior
+        prior = warm_start(pipe)
+        source = self.config.source(pipe, keithley, power_meter)
+        job = ScanJob(pipe, source, self.config.policy(pipe), started)
+        job.prior = prior
+        job.store, checkpoint = job.policy.open_store(pipe, source.fields)
+        source.start(pipe, checkpoint)
+        self.run(job)
+        source.stop()
+        for sink in self.config.sinks:
+            sink(job)
+        return job
+
+    @staticmethod
+    def run(job):
+        """
+        Measure the batches of the GUI until it ends the scan
+
+        :param job: started scan
+        :type job: ScanJob
+        """
+        pipe, source, policy, store = job.pipe, job.source, job.policy, job.store
+        timer = source.timer
+        # one buffer for the readings of every batch, grown only if the GUI sends more than a row
+        buffer = np.zeros(pipe.length)
+
+        while True:
+            t = timer.now()
+            msg_type, coords = pipe.read_message()
+            timer.record(PIPE_WAIT, t)
+
+            if msg_type == MessageType.KILL:
+                break
+            elif msg_type == MessageType.DONE:
+                policy.done(pipe, store, source)
+                continue
+
+            if len(coords) > len(buffer):
+                buffer = np.zeros(len(coords))
+            readings = buffer[:len(coords)]
+
+            for n, (x, y) in enumerate(coords):
+                policy.i += 1
+                t = timer.now()
+                value, fields = source.measure(policy.i, n)
+                timer.record(MEASURE, t)
+                store.record(x, y, value, policy.layer, **fields)
+                readings[n] = policy.reading(value)
+
+                # the move-on threshold applies to the light above the dark level
+                if policy.move_on(x, y, value - source.baseline.level):
+                    # the rest of the batch is dropped, the GUI starts the next layer
+                    source.baseline.count(n + 1)
+                    if n > 0:
+                        pipe.write_readings(readings[:n])
+                    pipe.write_move_on()
+                    policy.next_layer(store, source)
+                    break
+            else:
+                # the GUI waits for the readings, so the stage is free for a reference point
+                source.baseline.count(len(coords))
+                t = timer.now()
+                pipe.write_readings(readings)
+                timer.record(REPLY, t)
+                timer.tick(len(coords))
+
+
+
+def point_reader(pipe, sampler, store=None, timer=None, baseline=None, layer=None):
+    """
+    Measurement callable for scans where the script picks the points: every point is requested
+    from the GUI with a ``MOVE`` message, measured on arrival and the reading echoed back
+
+    :param pipe: GUI channel returned by :py:func:`.open_pipe`
+    :type pipe: FramedPipe
+    :param sampler: sampler attached to the source meter
+    :type sampler: SequentialSampler
+    :param store: store every reading and its sample count and standard error are recorded in as they arrive
+    :type store: ScanStore
+    :param timer: latency recorder timing every point
+    :type timer: LatencyRecorder
+    :param baseline: baseline counting the points, its reference readings are taken between them
+    :type baseline: Baseline
+    :param layer: layer of the store the readings are recorded in
+    :type layer: int
+    :return: callable returning readings for an (n, 2) array of grid points
+    :rtype: callable
+    """
+    timer = timer or LatencyRecorder()
+    baseline = baseline or Baseline()
+
+    def measure(points):
+        readings = np.zeros(len(points))
+        for n, (x, y) in enumerate(points):
+            t = timer.now()
+            pipe.request_move(x, y)
+            t = timer.record(PIPE_WAIT, t)
+            sample = sampler.measure()
+            readings[n] = sample.mean
+            t = timer.record(MEASURE, t)
+            pipe.write_readings(readings[n:n + 1])
+            timer.record(REPLY, t)
+            timer.tick()
+            if store is not None:
+                store.record(x, y, readings[n], layer, **sample_fields(sample, baseline.points))
+            baseline.count()
+        return readings
+    return measure
+
+
+def first_light(pipe, measure, start, bounds, baseline=None):
+    """
+    Look for light along the pattern of the client's ``FIRST_LIGHT_CONFIG`` and report where
+    it was found in a ``FIRST_LIGHT`` message. Thresholds of 0 are unset; with neither set, light
+    is a reading above 3 times the dark baseline. The dark baseline is the level of ``baseline``
+    once it has a reference reading, the median of the first readings otherwise.
+
+    :param pipe: GUI channel returned by :py:func:`.open_pipe`
+    :type pipe: FramedPipe
+    :param measure: callable returning readings for an (n, 2) array of grid points
+    :type measure: callable
+    :param start: expected position of the light
+    :type start: tuple
+    :param bounds: inclusive lower and upper grid corner
+    :type bounds: tuple
+    :param baseline: baseline of the scan
+    :type baseline: Baseline
+    :return: first light
+    :rtype: FirstLight
+    :raise ProtocolError: for an unknown pattern id
+    """
+    config = pipe.first_light_config
+    pattern_id = int(config['pattern'])
+    if pattern_id >= len(FIRST_LIGHT_PATTERN_IDS):
+        raise ProtocolError("Unknown first light pattern {}".format(pattern_id))
+    pattern = FIRST_LIGHT_PATTERN_IDS[pattern_id]
+    threshold = float(config['threshold']) or None
+    relative_threshold = float(config['relative_threshold']) or (None if threshold else 3.0)
+    options = {'pitch': float(config['pitch'])} if pattern == 'spiral' and config['pitch'] > 0 else {}
+    dark = baseline.level if baseline is not None and baseline.levels else None
+    light = find_first_light(measure, start, bounds, pattern, threshold, relative_threshold, dark, **options)
+    pipe.write_message(MessageType.FIRST_LIGHT, [(light.position[0], light.position[1], light.value,
+                                                  light.measurements, light.found)])
+    return light
+
+
+def dut_info(pipe):
+    """
+    :param pipe: GUI channel returned by :py:func:`.open_pipe`
+    :type pipe: FramedPipe
+    :return: DUT id and recipe of the client's ``DUT_CONFIG``, empty without one
+    :rtype: (str, str)
+    """
+    config = pipe.dut_config
+    if config is None:
+        return "", ""
+    return config['dut'].decode('ascii', 'replace'), config['recipe'].decode('ascii', 'replace')
+
+
+def warm_start(pipe):
+    """
+    :param pipe: GUI channel returned by :py:func:`.open_pipe`
+    :type pipe: FramedPipe
+    :return: prior of the recent peaks of the recipe when the client asked for a warm start in
+        ``DUT_CONFIG``, None otherwise or without enough runs. Framed clients are told in a
+        ``PRIOR`` message, with 0 runs and the whole window when there is no prior.
+    :rtype: Prior
+    """
+    config = pipe.dut_config
+    if config is None or not config['warm_start']:
+        return None
+    try:
+        prior = AlignmentHistory().prior(dut_info(pipe)[1], pipe.length)
+    except sqlite3.Error as error:
+        logger.warning("No warm start, the history cannot be read: {}".format(error))
+        prior = None
+    if prior is not None:
+        logger.info("Warm start at ({:.1f}, {:.1f}) +/- {} from {} runs".format(
+            prior.centre[0], prior.centre[1], prior.half_width, prior.runs))
+    if pipe.legacy:
+        # a station's recipe can ask for warm starts of legacy clients, which have no PRIOR message
+        return prior
+    if prior is None:
+        pipe.write_message(MessageType.PRIOR, [((pipe.length - 1) / 2, (pipe.length - 1) / 2, pipe.length // 2, 0)])
+    else:
+        pipe.write_message(MessageType.PRIOR, [(prior.centre[0], prior.centre[1], prior.half_width, prior.runs)])
+    return prior
+
+
+def record_run(pipe, started, peak, value, points, start=None, store=None):
+    """
+    Add a finished run to the :py:class:`.AlignmentHistory` and hand it to the worker in
+    ``pipe.run``. A history that cannot be written is logged and does not fail the scan.
+
+    :param pipe: GUI channel returned by :py:func:`.open_pipe`
+    :type pipe: FramedPipe
+    :param started: ``time.perf_counter()`` at the start of the run
+    :type started: float
+    :param peak: grid x, y of the peak found
+    :type peak: tuple
+    :param value: reading at the peak
+    :type value: float
+    :param points: number of points measured
+    :type points: int
+    :param start: grid x, y the search started from
+    :type start: tuple
+    :param store: store of the run
+    :type store: ScanStore
+    :return: the run
+    :rtype: Run
+    """
+    dut, recipe = dut_info(pipe)
+    run = Run(pipe.mode, (float(peak[0]), float(peak[1])), float(value), int(points),
+              time.perf_counter() - started, None if store is None else store.path)
+    pipe.run = run
+    try:
+        AlignmentHistory().record(run.peak, dut, recipe, run.mode, pipe.length, start, run.value, run.duration,
+                                  run.points, run.store)
+    except sqlite3.Error as error:
+        logger.warning("Run not recorded in the history: {}".format(error))
+    return run
+
+
+def search_strategy(pipe):
+    """
+    :param pipe: GUI channel returned by :py:func:`.open_pipe`
+    :type pipe: FramedPipe
+    :return: strategy and start point of the client's ``SEARCH_CONFIG``, a pattern search from
+        the centre of the window without one, and the search bounds. A :py:func:`warm_start`
+        prior replaces the start point and narrows the bounds to the window of the prior.
+    :rtype: (SearchStrategy, tuple, tuple)
+    :raise ProtocolError: for an unknown strategy id
+    """
+    config = pipe.search_config
+    if config is None:
+        strategy, start = SEARCH_STRATEGIES['pattern'](), (pipe.length // 2, pipe.length // 2)
+    else:
+        strategy_id = int(config['strategy'])
+        if strategy_id >= len(SEARCH_STRATEGY_IDS):
+            raise ProtocolError("Unknown search strategy {}".format(strategy_id))
+        strategy = SEARCH_STRATEGIES[SEARCH_STRATEGY_IDS[strategy_id]]()
+        start = (int(config['x']), int(config['y']))
+    bounds = ((0, 0), (pipe.length - 1, pipe.length - 1))
+    prior = warm_start(pipe)
+    if prior is not None:
+        start = tuple(int(round(coordinate)) for coordinate in prior.centre)
+        bounds = tuple(tuple(int(np.clip(coordinate + side * prior.half_width, 0, pipe.length - 1))
+                             for coordinate in start) for side in (-1, 1))
+    return strategy, start, bounds
+
+
+def peak_search(pipe, keithley, power_meter=None):
+    """
+    Find the coupling peak with a search strategy instead of a full raster. The script sends
+    ``MOVE`` requests, the GUI answers each with the usual ``COORDS`` message once the motors
+    have arrived and gets the reading back in a ``READINGS`` message. The result is reported
+    in a final ``PEAK`` message.
+
+    When the client sent ``FIRST_LIGHT_CONFIG`` the start may be dark: a :py:func:`first_light`
+    search runs first and the strategy starts from the light it found, reusing its readings.
+    With ``BASELINE_CONFIG`` the dark level is measured before the first point and the reported
+    peak value is above it.
+
+    :param pipe: GUI channel returned by :py:func:`.open_pipe`
+    :type pipe: FramedPipe
+    :param keithley: connected and configured source meter
+    :type keithley: Keithley2400
+    :param power_meter: connected optical power meter read by the objective of the client's
+        ``OBJECTIVE_CONFIG``
+    :type power_meter: Keysight81635A or None
+    :return: best grid point, its reading and the number of points measured
+    :rtype: SearchResult
+    """
+    started = time.perf_counter()
+    Length = pipe.length
+    strategy, start, bounds = search_strategy(pipe)
+    search_start = start
+
+    timer = start_timing(pipe, keithley)
+    sampler = start_sampling(pipe, keithley, power_meter)
+    store = ScanStore.create((Length, Length), mode=pipe.mode, fields=SAMPLE_FIELDS + sampler.channels,
+                             strategy=strategy.name)
+    baseline = start_baseline(pipe, lambda: sampler.measure().mean)
+    baseline.count(0)
+    measure = point_reader(pipe, sampler, store, timer, baseline)
+    light = None
+    if pipe.first_light_config is not None:
+        light = first_light(pipe, measure, start, bounds, baseline)
+        start = light.position
+    result = strategy.search(measure, start, bounds, known=None if light is None else light.readings)
+    sampler.detach()
+    value = result.value - baseline.at(store.fields['sequence'][tuple(result.position)])
+    pipe.write_message(MessageType.PEAK, [(result.position[0], result.position[1], value, result.measurements)])
+    if light is not None:
+        store.header.update(first_light=list(light.position), first_light_measurements=light.measurements)
+    store.close(peak=[int(result.position[0]), int(result.position[1])], measurements=result.measurements,
+                baseline=baseline.state())
+    finish_timing(timer, store.path + "_timing.csv")
+    record_run(pipe, started, result.position, value, result.measurements, search_start, store)
+    return result
+
+
+def adaptive_single_scan(pipe, keithley, power_meter=None):
+    """
+    Single scan that samples the window on a coarse lattice and refines only the cells where
+    the photocurrent has structure (see :py:func:`.adaptive_scan`). Points are requested with
+    ``MOVE`` messages as in :py:func:`peak_search`. Once done the best measured point is
+    reported in a ``PEAK`` message, the interpolated dense matrix is saved like a raster scan
+    and the sub-step peak fitted to the measured points follows in a ``PEAK_FIT`` message.
+
+    :param pipe: GUI channel returned by :py:func:`.open_pipe`
+    :type pipe: FramedPipe
+    :param keithley: connected and configured source meter
+    :type keithley: Keithley2400
+    :param power_meter: connected optical power meter read by the objective of the client's
+        ``OBJECTIVE_CONFIG``
+    :type power_meter: Keysight81635A or None
+    :return: dense readings, mask of measured points and their number
+    :rtype: AdaptiveScan
+    """
+    started = time.perf_counter()
+    config = pipe.adaptive_config
+    options = {} if config is None else {'initial_step': int(config['initial_step']),
+                                         'threshold': float(config['threshold'])}
+    timer = start_timing(pipe, keithley)
+    sampler = start_sampling(pipe, keithley, power_meter)
+    store = ScanStore.create((pipe.length, pipe.length), mode=pipe.mode, fields=SAMPLE_FIELDS + sampler.channels,
+                             **options)
+    baseline = start_baseline(pipe, lambda: sampler.measure().mean)
+    baseline.count(0)
+    scan = adaptive_scan(point_reader(pipe, sampler, store, timer, baseline), pipe.length, **options)
+    sampler.detach()
+
+    # interpolated points are corrected by the mean dark level
+    results = subtract_baseline(baseline, store, scan.results)
+    measured = np.where(scan.sampled, results, -np.inf)
+    x, y = np.unravel_index(np.argmax(measured), measured.shape)
+    pipe.write_message(MessageType.PEAK, [(x, y, results[x, y], scan.measurements)])
+    file_name = save_single_scan(pipe, results, store=store)
+    store.close(file_name=file_name, measurements=scan.measurements, baseline=baseline.state(),
+                **scan_geometry(file_name))
+    finish_timing(timer, "Results/CSV_Data/" + file_name + "_timing.csv")
+    fit = report_peak_fit(pipe, results, mask=scan.sampled)
+    if fit is not None:
+        record_run(pipe, started, (fit.x, fit.y), fit.value, scan.measurements, store=store)
+    return scan
+
+
+def fly_scan(pipe, keithley, power_meter=None):
+    """
+    Single scan with the stage moving continuously along every row instead of stopping at each
+    point. For every row (constant x) the GUI sends ``ROW_START``; the script starts a
+    time-stamped burst on the Keithley and echoes ``ROW_START`` as the go-ahead. The GUI sweeps
+    y across the row, sampling the motor position, and sends the trajectory in ``ROW_STOP``.
+    The script maps the burst onto the row (see :py:func:`.reconstruct_row`) and answers with one
+    ``READINGS`` block of ``length`` values. ``KILL`` ends the scan, which is then saved and
+    fitted like the single scan of mode 1.
+
+    The burst length and the trigger delay between readings come from the client's
+    ``FLY_CONFIG``, by default 4 readings per grid point taken back to back. The sweep should
+    take about as long as the burst. Dark references are the mean of a whole burst at the
+    reference point, taken between rows.
+
+    :param pipe: GUI channel returned by :py:func:`.open_pipe`
+    :type pipe: FramedPipe
+    :param keithley: connected and configured source meter
+    :type keithley: Keithley2400
+    :param power_meter: unused, a fly scan always records the photocurrent
+    :type power_meter: Keysight81635A or None
+    :raise ProtocolError: on the legacy pipe, which has no row messages
+    """
+    if pipe.legacy:
+        raise ProtocolError("Fly scans need the framed protocol")
+    started = time.perf_counter()
+    Length = pipe.length
+    config = pipe.fly_config
+    samples = 4 * Length if config is None else int(config['samples'])
+    interval = 0.0 if config is None else float(config['interval'])
+    if pipe.objective_config is not None:
+        logger.warning("Fly scans record the photocurrent, the objective is ignored")
+
+    block = keithley.channel[1].measure.current
+    block.arm(samples, delay=interval, timestamps=True)
+    store = ScanStore.create((Length, Length), mode=pipe.mode, fields=SAMPLE_FIELDS, samples=samples,
+                             interval=interval)
+    timer = start_timing(pipe, keithley)
+
+    def read_burst_mean():
+        block.trigger()
+        return SCALE * block.fetch()[:, 0].mean()
+    baseline = start_baseline(pipe, read_burst_mean)
+    columns = np.arange(Length)
+
+    while True:
+        t = timer.now()
+        msg_type, row = pipe.read_message()
+        timer.record(PIPE_WAIT, t)
+
+        if msg_type == MessageType.KILL:
+            break
+        elif msg_type != MessageType.ROW_START:
+            raise ProtocolError("Expected ROW_START but received {}".format(msg_type.name))
+
+        x = int(row[0]['x'])
+        block.trigger()
+        pipe.write_message(MessageType.ROW_START, row)
+        t = timer.now()
+        trajectory = pipe.expect(MessageType.ROW_STOP)
+        t = timer.record(PIPE_WAIT, t)
+        burst = block.fetch()
+        t = timer.record(MEASURE, t)
+
+        fly_row = reconstruct_row(SCALE * burst[:, 0], burst[:, 1] - burst[0, 1], trajectory['t'],
+                                  trajectory['y'], Length)
+        store.record_many(np.column_stack((np.full(Length, x), columns)), fly_row.values,
+                          count=fly_row.counts, stderr=fly_row.stderr, sequence=baseline.points + columns)
+        baseline.count(Length)
+        pipe.write_readings(fly_row.values)
+        timer.record(REPLY, t)
+        timer.tick(Length)
+
+    block.disarm()
+    results = subtract_baseline(baseline, store)
+    file_name = save_single_scan(pipe, results, store=store)
+    store.close(file_name=file_name, baseline=baseline.state(), **scan_geometry(file_name))
+    finish_timing(timer, "Results/CSV_Data/" + file_name + "_timing.csv")
+    fit = report_peak_fit(pipe, results)
+    if fit is not None:
+        record_run(pipe, started, (fit.x, fit.y), fit.value, np.count_nonzero(~np.isnan(store.data)), store=store)
+
+
+def focus_search(pipe, keithley, power_meter=None):
+    """
+    Find the focus with a golden-section search over z (see :py:func:`.find_focus`) between
+    the bounds of the client's ``FOCUS_CONFIG``. The script sends ``LAYER`` to move the stage to
+    a height, which the GUI echoes on arrival, then finds the peak of that layer with the
+    strategy of ``SEARCH_CONFIG`` through ``MOVE`` requests as in :py:func:`peak_search`,
+    starting from the peak of the measured layer nearest in z. The best layer is reported in
+    a final ``FOCUS`` message.
+
+    :param pipe: GUI channel returned by :py:func:`.open_pipe`
+    :type pipe: FramedPipe
+    :param keithley: connected and configured source meter
+    :type keithley: Keithley2400
+    :param power_meter: connected optical power meter read by the objective of the client's
+        ``OBJECTIVE_CONFIG``
+    :type power_meter: Keysight81635A or None
+    :return: best layer
+    :rtype: Focus
+    :raise ProtocolError: without ``FOCUS_CONFIG``, which the legacy pipe cannot send
+    """
+    started = time.perf_counter()
+    focus_config = pipe.focus_config
+    if focus_config is None:
+        raise ProtocolError("Focus search needs FOCUS_CONFIG")
+    lower, upper = float(focus_config['lower']), float(focus_config['upper'])
+    tolerance = float(focus_config['tolerance'])
+    Length = pipe.length
+    strategy, start, bounds = search_strategy(pipe)
+
+    timer = start_timing(pipe, keithley)
+    sampler = start_sampling(pipe, keithley, power_meter)
+    store = ScanStore.create((Length, Length, focus_layers(lower, upper, tolerance)), mode=pipe.mode,
+                             fields=SAMPLE_FIELDS + sampler.channels, strategy=strategy.name, z=[])
+    baseline = start_baseline(pipe, lambda: sampler.measure().mean)
+    baseline.count(0)
+    measurements = []
+
+    def search_layer(z, layer_start):
+        store.header['z'].append(pipe.request_layer(z))
+        measure = point_reader(pipe, sampler, store, timer, baseline, layer=len(store.header['z']) - 1)
+        result = strategy.search(measure, layer_start or start, bounds)
+        measurements.append(result.measurements)
+        # compared above the dark level, which may drift between the layers
+        return result._replace(value=result.value - baseline.level)
+
+    focus = find_focus(search_layer, lower, upper, tolerance, start)
+    sampler.detach()
+    pipe.write_message(MessageType.FOCUS, [(focus.position[0], focus.position[1], focus.z, focus.value,
+                                            len(focus.layers), sum(measurements))])
+    store.close(focus=[int(focus.position[0]), int(focus.position[1]), focus.z], bracket=list(focus.bracket),
+                measurements=sum(measurements), baseline=baseline.state())
+    finish_timing(timer, store.path + "_timing.csv")
+    record_run(pipe, started, focus.position, focus.value, sum(measurements), start, store)
+    return focus
+
+
+def dither_tracking(pipe, keithley, power_meter=None):
+    """
+    Hold the coupling peak with the piezo stages (see :py:class:`.DitherLockIn`), with the
+    dither centre, radius, gain, points per cycle and cycle rate of the client's
+    ``TRACK_CONFIG``. Every dither point is requested with a ``PIEZO`` message, which the GUI
+    echoes once the piezo has settled; the centre is moved after every cycle and reported in a
+    ``TRACK`` message. The GUI stops tracking by answering a ``PIEZO`` request with ``KILL``.
+    A rate of 0 runs the cycles back to back. The ``TRACK`` history is saved as CSV.
+
+    :param pipe: GUI channel returned by :py:func:`.open_pipe`
+    :type pipe: FramedPipe
+    :param keithley: connected and configured source meter
+    :type keithley: Keithley2400
+    :param power_meter: connected optical power meter read by the objective of the client's
+        ``OBJECTIVE_CONFIG``
+    :type power_meter: Keysight81635A or None
+    :return: last dither centre
+    :rtype: numpy.ndarray
+    :raise ProtocolError: without ``TRACK_CONFIG``, which the legacy pipe cannot send
+    """
+    config = pipe.track_config
+    if config is None:
+        raise ProtocolError("Tracking needs TRACK_CONFIG")
+    lock_in = DitherLockIn(float(config['amplitude']), float(config['gain']), int(config['points']))
+    period = 1 / float(config['rate']) if config['rate'] > 0 else 0.0
+    centre = np.array([float(config['x']), float(config['y'])])
+    timer = start_timing(pipe, keithley)
+    sampler = start_sampling(pipe, keithley, power_meter)
+    history = []
+    start = deadline = time.perf_counter()
+
+    while True:
+        readings = np.zeros(lock_in.points)
+        for n, (x, y) in enumerate(lock_in.positions(centre)):
+            t = timer.now()
+            pipe.write_message(MessageType.PIEZO, [(x, y)])
+            msg_type, _ = pipe.read_message()
+            t = timer.record(PIPE_WAIT, t)
+            if msg_type == MessageType.KILL:
+                break
+            elif msg_type != MessageType.PIEZO:
+                raise ProtocolError("Expected PIEZO but received {}".format(msg_type.name))
+            readings[n] = sampler.measure().mean
+            timer.record(MEASURE, t)
+            timer.tick()
+        else:
+            step = lock_in.update(centre, readings)
+            centre = step.centre
+            history.append((time.perf_counter() - start, centre[0], centre[1], step.value, step.error))
+            pipe.write_message(MessageType.TRACK, [history[-1]])
+            deadline += period
+            time.sleep(max(deadline - time.perf_counter(), 0))
+            continue
+        break
+
+    sampler.detach()
+    # stations tracking in the same second get numbered names
+    scan_id, _, file_path = allocate(time.strftime("Results/CSV_Data/Tracking_%Y%m%d_%H%M%S"), ".csv", 'tracking')
+    file_path = file_path[:-len(".csv")]
+    np.savetxt(file_path + ".csv", np.reshape(history, (-1, 5)), delimiter=",", header="t_s,x,y,value,error",
+               comments="")
+    errors = [error for *_, error in history]
+    if errors:
+        logger.info("Tracked {} cycles, error p50 {:.4g} max {:.4g}".format(len(errors), np.median(errors),
+                                                                         np.max(errors)))
+    finish_timing(timer, file_path + "_timing.csv")
+    catalog_scan(scan_id, name=os.path.basename(file_path), centre=centre)
+    return centre
+
+
+RASTER_SCANS = {
+    0: ScanConfig(CounterSource, SingleLayer,
+                  (functools.partial(save_scan, title='Current Readings', suptitle='Stepper Scan'),)),
+    1: ScanConfig(SamplerSource, SingleLayer, (save_scan, save_timing, report_peak)),
+    2: ScanConfig(CounterSource, functools.partial(MultiLayer, threshold=counter_threshold), (save_layers,)),
+    3: ScanConfig(SamplerSource, functools.partial(MultiLayer, threshold=photocurrent_threshold),
+                  (save_layers, save_timing)),
+}
+""":py:class:`ScanEngine` configuration of each raster mode byte"""
+
+SCAN_MODES = {
+    **{mode: ScanEngine(config) for mode, config in RASTER_SCANS.items()},
+    4: peak_search,
+    5: adaptive_single_scan,
+    6: fly_scan,
+    7: focus_search,
+    8: dither_tracking,
+}
+"""Scan function for each GUI mode byte"""
+
+HARDWARE_MODES = (1, 3, 4, 5, 6, 7, 8)
+"""Modes that need the source meter connected and configured"""
@@ -0,0 +1,268 @@
+"""
+Crash-safe, array-backed storage of scan readings.
+
+Every reading is written straight into a memory-mapped ``.npy`` file as it arrives, next to a
+small JSON header (``.json``) describing the scan. Points not measured yet hold NaN. The mapping
+is shared with the page cache, so a killed script leaves every reading taken so far on disk; the
+header's ``status`` stays ``'running'`` until :py:meth:`ScanStore.close`. The CSV files read by the
+GUI viewers are exported from the store on demand.
+
+Arrays are indexed like the scan loops' ``results``: ``[x, y]`` for single scans and
+``[x, y, layer]`` for automatic scans. Long scans record a :py:meth:`ScanStore.checkpoint` of their
+loop state and :py:meth:`ScanStore.latest` reopens the last unfinished store to resume one.
+
+Per-point metadata, such as the number of readings averaged at every point, is kept in named
+``fields``: arrays of the same shape stored next to the readings in ``<name>_<field>.npy``.
+
+::
+
+    >>> store = ScanStore.create((21, 21), mode=1)
+    >>> store.record(3, 4, 812.5)
+    >>> store.close(file_name="1_1_0.1")
+    >>> ScanStore.open(store.path).header['status']
+    'complete'
+"""
+import glob
+import json
+import os
+import time
+
+import numpy as np
+
+
+SCAN_STORE_DIR = "Results/Scan_Store"
+
+
+class ScanStore:
+    """
+    Memory-mapped scan readings plus a JSON header
+    """
+    def __init__(self, path, data, header, flush_interval=256, fields=None):
+        """
+        Initialize instance, use :py:meth:`create` or :py:meth:`open`
+
+        :param path: file path without extension
+        :type path: str
+        :param data: memory-mapped readings
+        :type data: numpy.memmap
+        :param header: scan description
+        :type header: dict
+        :param flush_interval: number of readings between flushes to disk
+        :type flush_interval: int
+        :param fields: memory-mapped per-point metadata by field name
+        :type fields: dict
+        """
+        self.path = path
+        self.data = data
+        self.header = header
+        self.flush_interval = flush_interval
+        self.fields = fields or {}
+        self._pending = 0
+
+    @classmethod
+    def create(cls, shape, directory=SCAN_STORE_DIR, name=None, flush_interval=256, fields=(), **header):
+        """
+        Create a new store filled with NaN
+
+        :param shape: array shape, (length, length) or (length, length, layers)
+        :type shape: tuple
+        :param directory: directory the store is created in
+        :type directory: str
+        :param name: file name without extension, defaults to the creation time
+        :type name: str
+        :param flush_interval: number of readings between flushes to disk
+        :type flush_interval: int
+        :param fields: names of the per-point metadata arrays, e.g. ('count', 'stderr')
+        :type fields: tuple
+        :param header: additional header fields, e.g. mode
+        :type header: dict
+        :return: new store
+        :rtype: ScanStore
+        """
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, name or time.strftime("%Y%m%d_%H%M%S"))
+        path, i = base, 0
+        while True:
+            # claimed by an exclusive create, so stations starting in the same second get their own store
+            try:
+                open(path + ".npy", "x").close()
+                break
+            except FileExistsError:
+                i += 1
+                path = "{}_{}".format(base, i)
+
+        arrays = {}
+        for field in (None,) + tuple(fields):
+            file_path = path + (".npy" if field is None else "_{}.npy".format(field))
+            arrays[field] = np.lib.format.open_memmap(file_path, mode='w+', dtype=np.float64, shape=tuple(shape))
+            arrays[field][...] = np.nan
+        data = arrays.pop(None)
+        header = dict(header, shape=list(shape), fields=list(fields), created=time.strftime("%Y-%m-%dT%H:%M:%S"),
+                      status='running')
+        store = cls(path, data, header, flush_interval, arrays)
+        store.flush()
+        return store
+
+    @classmethod
+    def open(cls, path, mode='r'):
+        """
+        Open an existing, possibly incomplete, store
+
+        :param path: file path with or without extension
+        :type path: str
+        :param mode: memory map mode, 'r' or 'r+'
+        :type mode: str
+        :return: store
+        :rtype: ScanStore
+        """
+        path = os.path.splitext(path)[0]
+        with open(path + ".json", "r") as f:
+            header = json.load(f)
+        fields = {field: np.load("{}_{}.npy".format(path, field), mmap_mode=mode)
+                  for field in header.get('fields', [])}
+        return cls(path, np.load(path + ".npy", mmap_mode=mode), header, fields=fields)
+
+    @classmethod
+    def latest(cls, directory=SCAN_STORE_DIR, **header):
+        """
+        Reopen the most recently updated unfinished store whose header matches
+
+        :param directory: directory searched for stores
+        :type directory: str
+        :param header: header fields that have to match, e.g. mode and shape
+        :type header: dict
+        :return: store opened for writing, None if there is no match
+        :rtype: ScanStore
+        """
+        paths = sorted(glob.glob(os.path.join(directory, "*.json")), key=os.path.getmtime, reverse=True)
+        for path in paths:
+            with open(path, "r") as f:
+                candidate = json.load(f)
+            if candidate.get('status') == 'running' and all(candidate.get(key) == value
+                                                            for key, value in header.items()):
+                return cls.open(path, mode='r+')
+        return None
+
+    @property
+    def measured(self):
+        """
+        **READONLY**
+
+        :value: mask of the points holding a reading
+        :type: numpy.ndarray
+        """
+        return ~np.isnan(self.data)
+
+    def record(self, x, y, value, layer=None, **fields):
+        """
+        Store one reading and its metadata
+
+        :param x: grid x index
+        :type x: int
+        :param y: grid y index
+        :type y: int
+        :param value: reading
+        :type value: float
+        :param layer: layer index of an automatic scan
+        :type layer: int
+        :param fields: value of every per-point field
+        :type fields: float
+        """
+        index = (x, y) if layer is None else (x, y, layer)
+        self.data[index] = value
+        for field, field_value in fields.items():
+            self.fields[field][index] = field_value
+        self._count(1)
+
+    def record_many(self, points, readings, layer=None, **fields):
+        """
+        Store the readings of a batch of points
+
+        :param points: grid points, shape (n, 2)
+        :type points: numpy.ndarray
+        :param readings: reading of every point
+        :type readings: numpy.ndarray
+        :param layer: layer index of an automatic scan
+        :type layer: int
+        :param fields: values of every per-point field
+        :type fields: numpy.ndarray
+        """
+        points = np.asarray(points, dtype=int).reshape(-1, 2)
+        index = (points[:, 0], points[:, 1]) if layer is None else (points[:, 0], points[:, 1], layer)
+        self.data[index] = readings
+        for field, values in fields.items():
+            self.fields[field][index] = values
+        self._count(len(points))
+
+    def _count(self, readings):
+        self._pending += readings
+        if self._pending >= self.flush_interval:
+            self._flush_arrays()
+            self._pending = 0
+
+    def _flush_arrays(self):
+        for array in (self.data,) + tuple(self.fields.values()):
+            if isinstance(array, np.memmap) and array.flags.writeable:
+                array.flush()
+
+    def flush(self):
+        """
+        Write pending readings and the header to disk. The header is replaced atomically so
+        a crash never leaves it half written.
+        """
+        self._flush_arrays()
+        self._pending = 0
+        with open(self.path + ".json.tmp", "w") as f:
+            json.dump(self.header, f, indent=2)
+        os.replace(self.path + ".json.tmp", self.path + ".json")
+
+    def checkpoint(self, **state):
+        """
+        Record the loop state needed to resume the scan and flush it together with the readings
+
+        :param state: JSON serialisable scan state
+        :type state: dict
+        """
+        self.header['checkpoint'] = state
+        self.flush()
+
+    def close(self, **header):
+        """
+        Mark the scan complete and flush it
+
+        :param header: header fields known once the scan is finished, e.g. file_name, layers
+        :type header: dict
+        """
+        self.header.update(header, status='complete')
+        self.flush()
+
+    def layer(self, layer=None, fill_value=0.0, field=None):
+        """
+        :param layer: layer index of an automatic scan
+        :type layer: int
+        :param fill_value: value of the points that were not measured
+        :type fill_value: float
+        :param field: per-point field returned instead of the readings
+        :type field: str
+        :return: in-memory copy of a 2D grid of readings
+        :rtype: numpy.ndarray
+        """
+        data = self.data if field is None else self.fields[field]
+        grid = np.array(data if layer is None else data[:, :, layer])
+        grid[np.isnan(grid)] = fill_value
+        return grid
+
+    def export_csv(self, file_path, layer=None, fill_value=0.0, field=None):
+        """
+        Write one grid in the CSV layout of the original scans
+
+        :param file_path: CSV file path
+        :type file_path: str
+        :param layer: layer index of an automatic scan
+        :type layer: int
+        :param fill_value: value of the points that were not measured
+        :type fill_value: float
+        :param field: per-point field written instead of the readings
+        :type field: str
+        """
+        np.savetxt(file_path, self.layer(layer, fill_value, field), delimiter=",")
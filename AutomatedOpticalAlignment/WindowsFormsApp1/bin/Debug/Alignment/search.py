@@ -0,0 +1,371 @@
+"""
+Peak search strategies for the photocurrent, used in place of a full raster of the scan window.
+
+Every strategy maximises a ``measure`` callable that takes an ``(n, 2)`` array of grid coordinates
+(the same x/y indices the GUI sends in ``COORDS`` messages) and returns the ``n`` readings.
+Readings are cached per grid point, so revisiting a point never costs another motor move, and
+:py:attr:`SearchResult.measurements` reports how many distinct points each strategy needed.
+
+::
+
+    >>> strategy = SEARCH_STRATEGIES['pattern']()
+    >>> result = strategy.search(measure, start=(20, 20), bounds=((0, 0), (40, 40)))
+    >>> result.position, result.value, result.measurements
+    ((23, 18), 4512.0, 31)
+"""
+import logging
+from collections import namedtuple
+
+import numpy as np
+
+
+SearchResult = namedtuple('SearchResult', ['strategy', 'position', 'value', 'measurements'])
+
+NEIGHBOURS = np.array([(1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)])
+INV_PHI = (np.sqrt(5) - 1) / 2
+
+
+class SearchObjective:
+    """
+    Cached, bounds-clipped view of a measurement callable on the integer scan grid
+    """
+    def __init__(self, measure, bounds, max_measurements=None):
+        """
+        Initialize instance
+
+        :param measure: callable returning readings for an (n, 2) array of grid points
+        :type measure: callable
+        :param bounds: inclusive lower and upper grid corner, ((x0, y0), (x1, y1))
+        :type bounds: tuple
+        :param max_measurements: stop measuring new points after this many
+        :type max_measurements: int
+        """
+        self._measure = measure
+        self.lower = np.asarray(bounds[0], dtype=int)
+        self.upper = np.asarray(bounds[1], dtype=int)
+        self.max_measurements = max_measurements
+        self.cache = {}
+        self.best_position = None
+        self.best_value = -np.inf
+
+    @property
+    def measurements(self):
+        """
+        **READONLY**
+
+        :value: number of distinct grid points measured so far
+        :type: int
+        """
+        return len(self.cache)
+
+    @property
+    def exhausted(self):
+        """
+        **READONLY**
+
+        :value: True once the measurement budget is used up
+        :type: bool
+        """
+        return self.max_measurements is not None and self.measurements >= self.max_measurements
+
+    def seed(self, readings):
+        """
+        Add readings taken before the search. They count as measured points but not against the
+        budget.
+
+        :param readings: readings by (x, y) grid point
+        :type readings: dict
+        """
+        new = [key for key in readings if key not in self.cache]
+        if self.max_measurements is not None:
+            self.max_measurements += len(new)
+        for key in new:
+            self.cache[key] = readings[key]
+            if readings[key] > self.best_value:
+                self.best_position, self.best_value = key, readings[key]
+
+    def clip(self, points):
+        """
+        :param points: grid coordinates, possibly fractional or out of bounds
+        :type points: numpy.ndarray
+        :return: nearest in-bounds grid points
+        :rtype: numpy.ndarray
+        """
+        return np.clip(np.rint(points), self.lower, self.upper).astype(int)
+
+    def __call__(self, points):
+        """
+        :param points: grid coordinates, shape (2,) or (n, 2)
+        :type points: numpy.ndarray
+        :return: readings, -inf for points skipped because the budget is exhausted
+        :rtype: numpy.ndarray
+        """
+        points = self.clip(np.atleast_2d(points))
+        keys = [tuple(int(value) for value in point) for point in points]
+        missing = list(dict.fromkeys(key for key in keys if key not in self.cache))
+        if self.max_measurements is not None:
+            missing = missing[:max(self.max_measurements - self.measurements, 0)]
+        if missing:
+            readings = np.asarray(self._measure(np.array(missing)), dtype=float)
+            for key, reading in zip(missing, readings):
+                self.cache[key] = reading
+                if reading > self.best_value:
+                    self.best_position, self.best_value = key, reading
+        return np.array([self.cache.get(key, -np.inf) for key in keys])
+
+
+class SearchStrategy:
+    """
+    Base class of all peak search strategies
+    """
+    name = None
+
+    def __init__(self, initial_step=4, min_step=1, max_measurements=1000):
+        """
+        Initialize instance
+
+        :param initial_step: first step size in grid units
+        :type initial_step: int
+        :param min_step: smallest step size before the search stops
+        :type min_step: int
+        :param max_measurements: measurement budget
+        :type max_measurements: int
+        """
+        self.initial_step = initial_step
+        self.min_step = min_step
+        self.max_measurements = max_measurements
+        self.logger = logging.getLogger(type(self).__name__)
+
+    def search(self, measure, start, bounds, known=None):
+        """
+        Find the grid point with the highest reading
+
+        :param measure: callable returning readings for an (n, 2) array of grid points
+        :type measure: callable
+        :param start: starting grid point
+        :type start: tuple
+        :param bounds: inclusive lower and upper grid corner, ((x0, y0), (x1, y1))
+        :type bounds: tuple
+        :param known: readings by grid point already taken, e.g. by :py:func:`.find_first_light`,
+            which are not measured again
+        :type known: dict
+        :return: best point, its reading and the number of points measured
+        :rtype: SearchResult
+        """
+        objective = SearchObjective(measure, bounds, self.max_measurements)
+        if known:
+            objective.seed(known)
+        self._search(objective, objective.clip(start))
+        result = SearchResult(self.name, objective.best_position, objective.best_value, objective.measurements)
+        self.logger.info("{} found {:.4g} at {} after {} measurements".format(
+            self.name, result.value, result.position, result.measurements))
+        return result
+
+    def _search(self, objective, start):
+        """
+        INTERNAL, VIRTUAL
+
+        :param objective: cached measurement function
+        :type objective: SearchObjective
+        :param start: in-bounds starting grid point
+        :type start: numpy.ndarray
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def _polish(objective, position):
+        """
+        INTERNAL
+
+        Climb over the 8 neighbours at unit step, for strategies whose own stopping rule
+        can leave them one grid point short of the peak
+
+        :param objective: cached measurement function
+        :type objective: SearchObjective
+        :param position: grid point to start from
+        :type position: numpy.ndarray
+        """
+        position = objective.clip(position)
+        value = objective(position)[0]
+        while not objective.exhausted:
+            neighbours = objective.clip(position + NEIGHBOURS)
+            values = objective(neighbours)
+            best = np.argmax(values)
+            if values[best] <= value:
+                break
+            position, value = neighbours[best], values[best]
+
+
+class HillClimb(SearchStrategy):
+    """
+    Steepest ascent over the 8 neighbours, halving the step whenever no neighbour improves
+    """
+    name = 'hill_climb'
+
+    def _search(self, objective, start):
+        position, value = start, objective(start)[0]
+        step = self.initial_step
+        while step >= self.min_step and not objective.exhausted:
+            neighbours = objective.clip(position + step * NEIGHBOURS)
+            values = objective(neighbours)
+            best = np.argmax(values)
+            if values[best] > value:
+                position, value = neighbours[best], values[best]
+            else:
+                step //= 2
+
+
+class PatternSearch(SearchStrategy):
+    """
+    Hooke-Jeeves pattern search: axis-wise exploratory moves followed by pattern moves
+    along the last successful direction
+    """
+    name = 'pattern'
+
+    @staticmethod
+    def _explore(objective, position, value, step):
+        for axis in range(2):
+            for direction in (1, -1):
+                trial = position.copy()
+                trial[axis] += direction * step
+                trial = objective.clip(trial)
+                trial_value = objective(trial)[0]
+                if trial_value > value:
+                    position, value = trial, trial_value
+                    break
+        return position, value
+
+    def _search(self, objective, start):
+        base, base_value = start, objective(start)[0]
+        step = self.initial_step
+        while step >= self.min_step and not objective.exhausted:
+            position, value = self._explore(objective, base, base_value, step)
+            if value <= base_value:
+                step //= 2
+                continue
+            while value > base_value and not objective.exhausted:
+                previous, base, base_value = base, position, value
+                pattern = objective.clip(2 * base - previous)
+                position, value = self._explore(objective, pattern, objective(pattern)[0], step)
+
+
+class NelderMead(SearchStrategy):
+    """
+    Nelder-Mead simplex on the continuous plane, each vertex measured at its nearest grid point
+    """
+    name = 'nelder_mead'
+
+    def _search(self, objective, start):
+        simplex = np.array([start, start + (self.initial_step, 0), start + (0, self.initial_step)], dtype=float)
+        values = objective(simplex)
+        while not objective.exhausted:
+            order = np.argsort(values)[::-1]
+            simplex, values = simplex[order], values[order]
+            if np.max(np.abs(simplex - simplex[0])) < self.min_step:
+                break
+
+            centroid = simplex[:2].mean(axis=0)
+            reflected = centroid + (centroid - simplex[2])
+            reflected_value = objective(reflected)[0]
+            if reflected_value > values[0]:
+                expanded = centroid + 2 * (centroid - simplex[2])
+                expanded_value = objective(expanded)[0]
+                if expanded_value > reflected_value:
+                    simplex[2], values[2] = expanded, expanded_value
+                else:
+                    simplex[2], values[2] = reflected, reflected_value
+            elif reflected_value > values[1]:
+                simplex[2], values[2] = reflected, reflected_value
+            else:
+                contracted = centroid + 0.5 * (simplex[2] - centroid)
+                contracted_value = objective(contracted)[0]
+                if contracted_value > values[2]:
+                    simplex[2], values[2] = contracted, contracted_value
+                else:
+                    simplex[1:] = simplex[0] + 0.5 * (simplex[1:] - simplex[0])
+                    values[1:] = objective(simplex[1:])
+        self._polish(objective, objective.best_position)
+
+
+class GoldenSection(SearchStrategy):
+    """
+    Alternating golden-section line searches along x and y, O(log N) readings per line
+    """
+    name = 'golden_section'
+
+    def __init__(self, max_cycles=4, **kwargs):
+        """
+        Initialize instance
+
+        :param max_cycles: maximum number of x/y line search pairs
+        :type max_cycles: int
+        :param kwargs: arbitrary keyword arguments passed to :py:class:`SearchStrategy`
+        :type kwargs: dict
+        """
+        super().__init__(**kwargs)
+        self.max_cycles = max_cycles
+
+    @staticmethod
+    def _line_search(objective, position, axis):
+        def point(coordinate):
+            trial = position.copy()
+            trial[axis] = coordinate
+            return trial
+
+        low, high = objective.lower[axis], objective.upper[axis]
+        if high - low > 2:
+            inner = high - int(round(INV_PHI * (high - low)))
+            inner_value = objective(point(inner))[0]
+        while high - low > 2 and not objective.exhausted:
+            # the interior point that survived the last step is kept, so each step measures one
+            # new point, at its mirror image in the interval
+            trial = low + high - inner
+            if trial == inner:
+                trial += 1
+            trial_value = objective(point(trial))[0]
+            (inner_low, low_value), (inner_high, high_value) = sorted(((inner, inner_value), (trial, trial_value)))
+            if low_value >= high_value:
+                high, inner, inner_value = inner_high, inner_low, low_value
+            else:
+                low, inner, inner_value = inner_low, inner_high, high_value
+        candidates = np.array([point(coordinate) for coordinate in range(low, high + 1)])
+        return candidates[np.argmax(objective(candidates))]
+
+    def _search(self, objective, start):
+        position = start
+        objective(position)
+        for _ in range(self.max_cycles):
+            previous = position
+            for axis in range(2):
+                position = self._line_search(objective, position, axis)
+            if np.array_equal(previous, position) or objective.exhausted:
+                break
+        self._polish(objective, position)
+
+
+SEARCH_STRATEGIES = {strategy.name: strategy for strategy in (HillClimb, PatternSearch, NelderMead, GoldenSection)}
+"""Search strategy classes by name"""
+
+SEARCH_STRATEGY_IDS = list(SEARCH_STRATEGIES)
+"""Strategy names in the order of the ``strategy`` field of the ``SEARCH_CONFIG`` message"""
+
+
+def compare_strategies(measure, start, bounds, strategies=None, **kwargs):
+    """
+    Run several strategies against the same measurement function and report each result
+
+    :param measure: callable returning readings for an (n, 2) array of grid points
+    :type measure: callable
+    :param start: starting grid point
+    :type start: tuple
+    :param bounds: inclusive lower and upper grid corner
+    :type bounds: tuple
+    :param strategies: strategy names, defaults to all of them
+    :type strategies: list of str
+    :param kwargs: keyword arguments passed to every strategy
+    :type kwargs: dict
+    :return: result of every strategy by name
+    :rtype: dict
+    """
+    strategies = strategies or SEARCH_STRATEGY_IDS
+    return {name: SEARCH_STRATEGIES[name](**kwargs).search(measure, start, bounds) for name in strategies}
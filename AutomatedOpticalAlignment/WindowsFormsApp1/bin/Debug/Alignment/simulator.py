@@ -0,0 +1,813 @@
+"""
+Simulated optical bench for running and benchmarking scans without the stages or the Keithley.
+
+- :py:class:`CouplingProfile` models the photocurrent at a stage position: Gaussian mode overlap
+  with the fibre, an angular (tilt) misalignment that both lowers the coupling and walks the
+  peak with z, defocus along z, drift of the peak and of the dark background over time and
+  read noise.
+- :py:class:`SimulatedBench` holds the stage and piezo position and a simulated clock that
+  advances by a configurable latency for every move, every GPIB transfer and every reading of a
+  burst.
+- :py:class:`SimulatedKeithley` stands in for :py:class:`.Keithley2400` in the
+  :py:class:`.AlignmentWorker`.
+- :py:class:`SimulatedPowerMeter` stands in for the :py:class:`.Keysight81635A` read by an
+  :py:class:`.Objective`, with a coupling profile of its own.
+- :py:class:`SimulatedGui` plays the motor side of the ``\\\\.\\pipe\\NPtest`` exchange over the
+  framed protocol.
+
+:py:func:`run_simulated_job` connects the two ends with a socket pair and runs the real worker
+and scan code on it, so it works on any OS. All randomness comes from one seeded generator,
+so runs are reproducible. Results are written under ``Results/`` of the working directory, as
+for a real scan.
+
+::
+
+    >>> result = run_simulated_job(4, half_length=20, seed=1, options={'strategy': 'pattern'})
+    >>> result.moves, result.reads, round(result.simulated_time, 2)
+    (22, 22, 0.66)
+
+    $ python -m Alignment.simulator --mode 4 --strategy nelder_mead --seed 1
+"""
+import argparse
+import logging
+import os
+import select
+import socket
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from types import SimpleNamespace
+
+import numpy as np
+
+from COMMON.Utilities.custom_structures import CustomList
+from Alignment.first_light import FIRST_LIGHT_PATTERN_IDS
+from Alignment.objective import TRANSFORMS
+from Alignment.pipe_protocol import MessageType, FramedPipe, ProtocolError
+from Alignment.render import render_pool
+from Alignment.search import SEARCH_STRATEGY_IDS
+from Alignment.worker import AlignmentWorker
+
+
+logger = logging.getLogger(__name__)
+
+
+SimulationResult = namedtuple('SimulationResult', ['mode', 'moves', 'reads', 'simulated_time', 'wall_time',
+                                                   'peak', 'messages', 'run'])
+
+
+class CouplingProfile:
+    """
+    Photocurrent as a function of stage position, in grid steps
+    """
+    def __init__(self, peak=(22.3, 18.6), z_peak=1.0, width=3.0, rayleigh_range=4.0, amplitude=5e-8,
+                 background=1e-10, tilt=0.0, tilt_direction=0.0, wavelength=1.55, mode_field=10.0,
+                 drift=(0.0, 0.0), relative_noise=0.01, noise=2e-11, background_drift=0.0):
+        """
+        Initialize instance
+
+        :param peak: x, y of the coupling peak at z_peak
+        :type peak: tuple
+        :param z_peak: z of the focus
+        :type z_peak: float
+        :param width: 1/e^2 half width of the coupling peak in x and y
+        :type width: float
+        :param rayleigh_range: z distance over which the peak coupling halves
+        :type rayleigh_range: float
+        :param amplitude: photocurrent in A at perfect alignment
+        :type amplitude: float
+        :param background: photocurrent in A far from the peak
+        :type background: float
+        :param tilt: angular misalignment in rad
+        :type tilt: float
+        :param tilt_direction: direction of the tilt in the xy plane in rad
+        :type tilt_direction: float
+        :param wavelength: wavelength in um
+        :type wavelength: float
+        :param mode_field: mode field radius in um, sets the coupling penalty of the tilt
+        :type mode_field: float
+        :param drift: drift of the peak in grid steps per second along x and y
+        :type drift: tuple
+        :param relative_noise: standard deviation of the multiplicative read noise
+        :type relative_noise: float
+        :param noise: standard deviation of the additive read noise in A
+        :type noise: float
+        :param background_drift: drift of the background in A per second
+        :type background_drift: float
+        """
+        self.peak = np.asarray(peak, dtype=float)
+        self.z_peak = z_peak
+        self.width = width
+        self.rayleigh_range = rayleigh_range
+        self.amplitude = amplitude
+        self.background = background
+        self.tilt = tilt
+        self.tilt_direction = tilt_direction
+        self.wavelength = wavelength
+        self.mode_field = mode_field
+        self.drift = np.asarray(drift, dtype=float)
+        self.relative_noise = relative_noise
+        self.noise = noise
+        self.background_drift = background_drift
+
+    @classmethod
+    def for_window(cls, half_length, **kwargs):
+        """
+        :param half_length: half edge length of the scan window
+        :type half_length: int
+        :param kwargs: other keyword arguments of :py:class:`CouplingProfile`
+        :type kwargs: dict
+        :return: the default profile, whose peak and width suit a window of half length 20, scaled
+            to the window so the peak stays inside it at the same relative position
+        :rtype: CouplingProfile
+        """
+        scale = half_length / 20
+        return cls(peak=(22.3 * scale, 18.6 * scale), width=max(3.0 * scale, 1.0), **kwargs)
+
+    def peak_position(self, z=0.0, t=0.0):
+        """
+        :param z: stage z
+        :type z: float
+        :param t: simulated time in s
+        :type t: float
+        :return: x, y of the coupling peak at height ``z`` and time ``t``
+        :rtype: numpy.ndarray
+        """
+        walk = (z - self.z_peak) * np.tan(self.tilt) * np.array([np.cos(self.tilt_direction),
+                                                                np.sin(self.tilt_direction)])
+        return self.peak + walk + self.drift * t
+
+    def current(self, position, t=0.0):
+        """
+        :param position: stage x, y, z in grid steps
+        :type position: tuple
+        :param t: simulated time in s
+        :type t: float
+        :return: noise free photocurrent in A
+        :rtype: float
+        """
+        x, y, z = position
+        offset = np.array([x, y]) - self.peak_position(z, t)
+        overlap = np.exp(-2 * (offset ** 2).sum() / self.width ** 2)
+        tilt_loss = np.exp(-(np.pi * self.mode_field * self.tilt / self.wavelength) ** 2)
+        defocus = 1 / (1 + ((z - self.z_peak) / self.rayleigh_range) ** 2)
+        return self.background + self.background_drift * t + self.amplitude * overlap * tilt_loss * defocus
+
+
+class SimulatedBench:
+    """
+    Stage position and simulated clock shared by the simulated GUI and source meter
+    """
+    def __init__(self, profile=None, seed=0, move_latency=0.02, gpib_latency=0.01, sample_time=0.002,
+                 realtime=False, piezo_latency=0.002):
+        """
+        Initialize instance
+
+        :param profile: coupling profile, defaults to :py:class:`CouplingProfile` defaults
+        :type profile: CouplingProfile
+        :param seed: seed of the noise generator
+        :type seed: int
+        :param move_latency: time in s per stage move
+        :type move_latency: float
+        :param gpib_latency: time in s per current reading or burst transfer
+        :type gpib_latency: float
+        :param sample_time: integration time in s of every reading of a buffered burst
+        :type sample_time: float
+        :param realtime: sleep for the latencies instead of only advancing the simulated clock
+        :type realtime: bool
+        :param piezo_latency: time in s per piezo move
+        :type piezo_latency: float
+        """
+        self.profile = profile or CouplingProfile()
+        self.rng = np.random.default_rng(seed)
+        self.move_latency = move_latency
+        self.gpib_latency = gpib_latency
+        self.sample_time = sample_time
+        self.realtime = realtime
+        self.piezo_latency = piezo_latency
+        self.position = np.zeros(3)
+        self.piezo = np.zeros(3)
+        """x, y offset of the piezo stages in grid steps, added to the stage position"""
+        self._sweep = None
+        self.clock = 0.0
+        self.moves = 0
+        self.reads = 0
+
+    def _wait(self, latency):
+        self.clock += latency
+        if self.realtime:
+            time.sleep(latency)
+
+    def move(self, x=None, y=None, z=None):
+        """
+        Move the stage, leaving axes that are not given where they are
+
+        :param x: target x in grid steps
+        :type x: float
+        :param y: target y in grid steps
+        :type y: float
+        :param z: target z in grid steps
+        :type z: float
+        """
+        for axis, value in enumerate((x, y, z)):
+            if value is not None:
+                self.position[axis] = value
+        self._sweep = None
+        self.moves += 1
+        self._wait(self.move_latency)
+
+    def move_piezo(self, x, y):
+        """
+        Set the piezo offset
+
+        :param x: x offset in grid steps
+        :type x: float
+        :param y: y offset in grid steps
+        :type y: float
+        """
+        self.piezo[:2] = x, y
+        self._wait(self.piezo_latency)
+
+    def sweep(self, y, duration):
+        """
+        Move y to ``y`` at constant speed, without stopping to settle
+
+        :param y: target y in grid steps
+        :type y: float
+        :param duration: time in s the sweep takes
+        :type duration: float
+        """
+        self._sweep = (self.clock, duration, self.position[1], y)
+        self.moves += 1
+        self._wait(duration)
+        self.position[1] = y
+
+    def position_at(self, t):
+        """
+        :param t: simulated time in s, at most the current time
+        :type t: float
+        :return: stage x, y, z at time ``t`` of the last sweep, the current position otherwise
+        :rtype: numpy.ndarray
+        """
+        position = self.position + self.piezo
+        if self._sweep is not None:
+            start, duration, y0, y1 = self._sweep
+            position[1] = y0 + (y1 - y0) * np.clip((t - start) / duration, 0, 1)
+        return position
+
+    def read_current(self):
+        """
+        :return: noisy photocurrent in A at the current position
+        :rtype: float
+        """
+        self.reads += 1
+        self._wait(self.gpib_latency)
+        return self._noisy(np.array([self.profile.current(self.position + self.piezo, self.clock)]))[0]
+
+    def burst(self, start, count, period):
+        """
+        Buffered burst of readings, returned once it is complete
+
+        :param start: simulated time in s of the first reading
+        :type start: float
+        :param count: number of readings
+        :type count: int
+        :param period: time in s between readings
+        :type period: float
+        :return: noisy photocurrents in A and the time of every reading
+        :rtype: (numpy.ndarray, numpy.ndarray)
+        """
+        times = start + period * np.arange(count)
+        self.reads += count
+        self._wait(max(times[-1] + period - self.clock, 0) + self.gpib_latency)
+        currents = np.array([self.profile.current(self.position_at(t), t) for t in times])
+        return self._noisy(currents), times
+
+    def read_burst(self, count):
+        """
+        :param count: number of readings
+        :type count: int
+        :return: noisy photocurrents in A of a buffered burst at the current position
+        :rtype: numpy.ndarray
+        """
+        return self.burst(self.clock, count, self.sample_time)[0]
+
+    def _noisy(self, currents):
+        profile = self.profile
+        return currents * (1 + profile.relative_noise * self.rng.standard_normal(len(currents))) + \
+            profile.noise * self.rng.standard_normal(len(currents))
+
+
+class _SimulatedCurrent:
+
+    def __init__(self, bench):
+        self._bench = bench
+        self._burst_count = 0
+        self._delay = 0
+        self._timestamps = False
+        self._start = 0.0
+
+    @property
+    def value(self):
+        return self._bench.read_current()
+
+    def arm(self, count, trigger_source='IMMEDIATE', trigger_line=1, delay=0, timestamps=False):
+        self._burst_count = count
+        self._delay = delay
+        self._timestamps = timestamps
+
+    def trigger(self):
+        self._start = self._bench.clock
+
+    def fetch(self, timeout=60):
+        readings, times = self._bench.burst(self._start, self._burst_count, self._bench.sample_time + self._delay)
+        return np.column_stack((readings, times)) if self._timestamps else readings
+
+    def read_burst(self, timeout=60):
+        self.trigger()
+        return self.fetch(timeout)
+
+    def disarm(self):
+        self._burst_count = 0
+
+
+class SimulatedKeithley:
+    """
+    Stand-in for :py:class:`.Keithley2400` exposing the attributes used by the scan modes
+    """
+    def __init__(self, bench):
+        """
+        Initialize instance
+
+        :param bench: bench the photocurrent is read from
+        :type bench: SimulatedBench
+        """
+        self.bench = bench
+        self.connected = False
+        channel = SimpleNamespace(terminal_select=None, remote_sensing=None, output=None,
+                                  source=SimpleNamespace(current=SimpleNamespace(compliance_current=None),
+                                                         voltage=SimpleNamespace(setpoint=None)),
+                                  measure=SimpleNamespace(current=_SimulatedCurrent(bench)))
+        self.channel = {1: channel}
+
+    def connect(self):
+        """
+        Open the simulated session
+        """
+        self.connected = True
+
+    def disconnect(self):
+        """
+        Close the simulated session
+        """
+        self.connected = False
+
+
+class _SimulatedPowerChannel:
+
+    def __init__(self, meter):
+        self._meter = meter
+        self.power_unit = 'dBm'
+
+    @property
+    def value(self):
+        return self._meter.read_power()
+
+
+class SimulatedPowerMeter:
+    """
+    Stand-in for :py:class:`.Keysight81635A` reading the optical power at the bench position.
+    Its readings are taken in parallel with the source meter's, so its latency only shows in the
+    wall time of ``realtime`` runs and does not advance the simulated clock.
+    """
+    def __init__(self, bench, profile=None, responsivity=0.8, latency=0.01, seed=1):
+        """
+        Initialize instance
+
+        :param bench: bench whose stage and piezo position is read
+        :type bench: SimulatedBench
+        :param profile: coupling profile of the power meter path, defaults to the bench's
+        :type profile: CouplingProfile
+        :param responsivity: responsivity in A/W converting the profile's photocurrent to power
+        :type responsivity: float
+        :param latency: time in s per reading
+        :type latency: float
+        :param seed: seed of the noise generator of the power meter
+        :type seed: int
+        """
+        self.bench = bench
+        self.profile = profile or bench.profile
+        self.responsivity = responsivity
+        self.latency = latency
+        self.rng = np.random.default_rng(seed)
+        self.reads = 0
+        self.connected = False
+        self.channel = CustomList()
+        for _ in range(2):
+            self.channel.append(_SimulatedPowerChannel(self))
+
+    def read_power(self):
+        """
+        :return: noisy optical power in W at the current position
+        :rtype: float
+        """
+        self.reads += 1
+        if self.bench.realtime:
+            time.sleep(self.latency)
+        bench, profile = self.bench, self.profile
+        current = profile.current(bench.position + bench.piezo, bench.clock)
+        current = current * (1 + profile.relative_noise * self.rng.standard_normal()) + \
+            profile.noise * self.rng.standard_normal()
+        return current / self.responsivity
+
+    def connect(self):
+        """
+        Open the simulated session
+        """
+        self.connected = True
+
+    def disconnect(self):
+        """
+        Close the simulated session
+        """
+        self.connected = False
+
+
+class SimulatedGui:
+    """
+    Motor side of the pipe exchange: moves the simulated stages and drives a scan job
+    """
+    def __init__(self, pipe, bench, file_name="1_1_0.1"):
+        """
+        Initialize instance
+
+        :param pipe: GUI end of the framed channel
+        :type pipe: FramedPipe
+        :param bench: bench whose stages are moved
+        :type bench: SimulatedBench
+        :param file_name: file name sent once the scan is finished, ``<x>_<y>_<step>``
+        :type file_name: str
+        """
+        self.pipe = pipe
+        self.bench = bench
+        self.file_name = file_name
+        self.messages = {}
+        """:type: dict of MessageType to numpy.ndarray"""
+        self.fit_timeout = 30.0
+        """Time in s to wait for the ``PEAK_FIT`` of a single scan"""
+
+    def _receive(self, *expected):
+        msg_type, payload = self.pipe.read_message()
+        while msg_type == MessageType.MOVE and MessageType.MOVE not in expected:
+            # reference point requested while the script holds the readings of the last points
+            self._measure_at(int(payload[0]['x']), int(payload[0]['y']))
+            self._receive(MessageType.READINGS)
+            msg_type, payload = self.pipe.read_message()
+        if msg_type not in expected:
+            raise ProtocolError("Simulated GUI expected {} but received {}".format(
+                "/".join(m.name for m in expected), msg_type.name))
+        self.messages[msg_type] = payload
+        return msg_type, payload
+
+    def receive_peak_fit(self):
+        """
+        Wait up to :py:attr:`fit_timeout` for the ``PEAK_FIT`` of a single scan. A script that
+        sends none would otherwise keep the GUI waiting while it waits for the next job.
+
+        :return: fitted peak, or the brightest point when the fit failed (``r_squared`` 0); None
+            if no ``PEAK_FIT`` came
+        :rtype: numpy.ndarray
+        """
+        readable, _, _ = select.select([self.pipe], [], [], self.fit_timeout)
+        if not readable:
+            logger.warning("No PEAK_FIT within {} s".format(self.fit_timeout))
+            return None
+        _, payload = self._receive(MessageType.PEAK_FIT)
+        if payload[0]['r_squared'] == 0:
+            logger.warning("Peak fit failed, the script reported its brightest point")
+        return payload
+
+    def send_file_name(self):
+        """
+        Send the file name the results are saved under
+        """
+        self.pipe.write_message(MessageType.FILE_NAME, np.frombuffer(self.file_name.encode("ascii"), dtype='u1'))
+
+    def _points(self, length, window=None):
+        (x0, y0), (x1, y1) = window or ((0, 0), (length - 1, length - 1))
+        for x in range(x0, x1 + 1):
+            columns = range(y0, y1 + 1) if (x - x0) % 2 == 0 else range(y1, y0 - 1, -1)
+            for y in columns:
+                yield x, y
+
+    def _measure_at(self, x, y):
+        self.bench.move(x, y)
+        self.pipe.write_message(MessageType.COORDS, [(x, y)])
+
+    def receive_prior(self, length):
+        """
+        :param length: edge length of the scan window
+        :type length: int
+        :return: inclusive lower and upper grid corner of the script's ``PRIOR`` window
+        :rtype: tuple
+        """
+        _, payload = self._receive(MessageType.PRIOR)
+        centre = (int(round(payload[0]['x'])), int(round(payload[0]['y'])))
+        half_width = int(payload[0]['half_width'])
+        return tuple(tuple(int(np.clip(coordinate + side * half_width, 0, length - 1)) for coordinate in centre)
+                     for side in (-1, 1))
+
+    def raster(self, length, window=None):
+        """
+        Single raster scan: every point of the window, by default the whole scan window, is
+        visited in a serpentine and sent in its own ``COORDS`` message, then the file name is
+        exchanged for the folder number
+        """
+        for x, y in self._points(length, window):
+            self._measure_at(x, y)
+            self._receive(MessageType.READINGS)
+        self.pipe.write_message(MessageType.KILL)
+        self.send_file_name()
+        self._receive(MessageType.FOLDER_NUMBER)
+
+    def automatic(self, length, layers=3, z_step=1.0, window=None):
+        """
+        Automatic scan: the layer moves down in z after a full raster (``DONE``) of the window or
+        when the script asks to move on
+        """
+        for z in range(layers):
+            self.bench.move(z=z * z_step)
+            for x, y in self._points(length, window):
+                self._measure_at(x, y)
+                msg_type, _ = self._receive(MessageType.READINGS, MessageType.MOVE_ON)
+                if msg_type == MessageType.MOVE_ON:
+                    break
+            else:
+                self.pipe.write_message(MessageType.DONE)
+                self._receive(MessageType.POSITION)
+        self.pipe.write_message(MessageType.KILL)
+        self._receive(MessageType.FOLDER_NUMBER)
+        self.send_file_name()
+        self._receive(MessageType.LAYERS)
+
+    def fly(self, length, row_time):
+        """
+        Fly scan: every row is swept in one go between ``ROW_START`` and ``ROW_STOP``, reporting
+        the motor position 21 times per sweep
+        """
+        for x in range(length):
+            first, last = (0, length - 1) if x % 2 == 0 else (length - 1, 0)
+            self.bench.move(x, first)
+            self.pipe.write_message(MessageType.ROW_START, [(x,)])
+            self._receive(MessageType.ROW_START)
+            self.bench.sweep(last, row_time)
+            t = np.linspace(0, row_time, 21)
+            self.pipe.write_message(MessageType.ROW_STOP, list(zip(t, first + (last - first) * t / row_time)))
+            self._receive(MessageType.READINGS)
+        self.pipe.write_message(MessageType.KILL)
+        self.send_file_name()
+        self._receive(MessageType.FOLDER_NUMBER)
+        self.receive_peak_fit()
+
+    def serve_moves(self, final=MessageType.PEAK):
+        """
+        Script driven scan: answer every ``MOVE`` and ``LAYER`` request until the final report
+
+        :param final: message type of the report, ``PEAK`` or ``FOCUS``
+        :type final: MessageType
+        :return: report record
+        :rtype: numpy.void
+        """
+        while True:
+            msg_type, payload = self._receive(MessageType.MOVE, MessageType.LAYER, MessageType.READINGS,
+                                              MessageType.FIRST_LIGHT, MessageType.PRIOR, final)
+            if msg_type == MessageType.MOVE:
+                x, y = int(payload[0]['x']), int(payload[0]['y'])
+                self._measure_at(x, y)
+            elif msg_type == MessageType.LAYER:
+                self.bench.move(z=float(payload[0]['z']))
+                self.pipe.write_message(MessageType.LAYER, payload)
+            elif msg_type == final:
+                return payload[0]
+
+    def track(self, cycles):
+        """
+        Dither tracking: apply every ``PIEZO`` request until ``cycles`` dither cycles have been
+        reported, then answer the next one with ``KILL``
+        """
+        reported = 0
+        while True:
+            msg_type, payload = self._receive(MessageType.PIEZO, MessageType.TRACK)
+            if msg_type == MessageType.TRACK:
+                reported += 1
+                self.messages.setdefault('track', []).append(payload[0])
+            elif reported >= cycles:
+                self.pipe.write_message(MessageType.KILL)
+                return
+            else:
+                self.bench.move_piezo(payload[0]['x'], payload[0]['y'])
+                self.pipe.write_message(MessageType.PIEZO, payload)
+
+    def run(self, mode, length, layers=3, row_time=None, cycles=100, warm_start=False):
+        """
+        Drive one job of the given mode after its ``CONFIG`` has been sent. Fly scan rows are
+        swept in ``row_time`` s, by default the time of the script's default burst. Tracking
+        stops after ``cycles`` dither cycles. With ``warm_start`` the raster modes only visit
+        the window of the script's ``PRIOR``.
+        """
+        window = self.receive_prior(length) if warm_start and mode in (0, 1, 2, 3) else None
+        if mode in (0, 1):
+            self.raster(length, window)
+            if mode == 1:
+                self.receive_peak_fit()
+        elif mode in (2, 3):
+            self.automatic(length, layers, window=window)
+        elif mode == 4:
+            self.serve_moves()
+        elif mode == 5:
+            self.serve_moves()
+            self.send_file_name()
+            self._receive(MessageType.FOLDER_NUMBER)
+            self.receive_peak_fit()
+        elif mode == 6:
+            self.fly(length, row_time or 4 * length * self.bench.sample_time)
+        elif mode == 7:
+            self.serve_moves(MessageType.FOCUS)
+        elif mode == 8:
+            self.track(cycles)
+        else:
+            raise ProtocolError("The simulated GUI does not drive mode {}".format(mode))
+
+
+def run_simulated_job(mode, half_length=20, profile=None, seed=0, options=None, layers=3, **bench_options):
+    """
+    Run one scan job end to end against the simulated bench
+
+    :param mode: scan mode
+    :type mode: int
+    :param half_length: half edge length of the scan window, the window is 2*half_length+1 points
+    :type half_length: int
+    :param profile: coupling profile, or a :py:class:`.ReplayProfile` to replay a recorded scan, defaults to
+        :py:meth:`CouplingProfile.for_window`
+    :type profile: CouplingProfile
+    :param seed: seed of the noise generator
+    :type seed: int
+    :param options: job options: 'strategy' and 'start' for mode 4, 'initial_step' and
+        'threshold' for mode 5, 'relative_tolerance', 'absolute_tolerance', 'max_samples' and
+        'burst' to average the readings of the hardware modes, 'samples' per row and 'interval'
+        for mode 6, 'first_light' pattern, 'threshold' and 'relative_threshold' to look for
+        light before the search of mode 4, 'baseline' reference point, 'baseline_samples' and
+        'baseline_interval' to subtract the dark level of the hardware modes, 'focus' z bracket
+        and tolerance for mode 7, 'track' piezo start x/y, 'amplitude', 'gain', 'points', 'rate'
+        and 'cycles' for mode 8, 'recipe', 'dut' and 'warm_start' to record the run in the history
+        and start modes 4 and 7 from the prior of the recipe or raster only its window in modes 0 to 3, 'objective' signals as (signal,
+        transform name, weight, reference) tuples scored instead of the photocurrent, with the
+        :py:class:`SimulatedPowerMeter` reading the 'power_profile'
+    :type options: dict
+    :param layers: number of layers of an automatic scan
+    :type layers: int
+    :param bench_options: move_latency, gpib_latency, sample_time and realtime of the
+        :py:class:`SimulatedBench`
+    :type bench_options: dict
+    :return: motor moves, current reads, simulated and wall time, the peak reported by the script and
+        the run the worker recorded
+    :rtype: SimulationResult
+    """
+    options = options or {}
+    length = 2 * half_length + 1
+    bench = SimulatedBench(profile or CouplingProfile.for_window(half_length), seed, **bench_options)
+    power_meter = SimulatedPowerMeter(bench, options.get('power_profile')) if 'objective' in options else None
+    worker = AlignmentWorker('SIMULATED', keithley=SimulatedKeithley(bench), name='SimulatedWorker',
+                             power_meter=power_meter)
+
+    script_end, gui_end = socket.socketpair()
+    script_file = script_end.makefile('rwb', buffering=0)
+    gui_file = gui_end.makefile('rwb', buffering=0)
+    errors = []
+
+    def serve():
+        try:
+            worker.run_session(script_file)
+        except Exception as error:
+            errors.append(error)
+        finally:
+            script_file.close()
+            script_end.close()
+
+    thread = threading.Thread(target=serve, name='SimulatedScript')
+    start = time.perf_counter()
+    thread.start()
+    gui = SimulatedGui(FramedPipe(gui_file), bench)
+    try:
+        if 'strategy' in options or 'start' in options:
+            x, y = options.get('start', (half_length, half_length))
+            gui.pipe.write_message(MessageType.SEARCH_CONFIG, [(
+                SEARCH_STRATEGY_IDS.index(options.get('strategy', 'pattern')), x, y)])
+        if 'initial_step' in options or 'threshold' in options:
+            gui.pipe.write_message(MessageType.ADAPTIVE_CONFIG, [(options.get('initial_step', 8),
+                                                                   options.get('threshold', 0.05))])
+        if 'first_light' in options:
+            gui.pipe.write_message(MessageType.FIRST_LIGHT_CONFIG, [(
+                FIRST_LIGHT_PATTERN_IDS.index(options['first_light']), options.get('threshold', 0),
+                options.get('relative_threshold', 0), options.get('pitch', 0))])
+        if 'max_samples' in options:
+            gui.pipe.write_message(MessageType.SAMPLING_CONFIG, [(
+                options.get('relative_tolerance', 0.01), options.get('absolute_tolerance', 5.0),
+                options['max_samples'], options.get('burst', 4))])
+        if 'baseline' in options:
+            x, y = options['baseline']
+            gui.pipe.write_message(MessageType.BASELINE_CONFIG, [(
+                x, y, options.get('baseline_samples', 4), options.get('baseline_interval', 0))])
+        if 'focus' in options:
+            gui.pipe.write_message(MessageType.FOCUS_CONFIG, [tuple(options['focus'])])
+        if 'recipe' in options:
+            gui.pipe.write_message(MessageType.DUT_CONFIG, [(
+                options.get('dut', ''), options['recipe'], options.get('warm_start', False))])
+        if 'objective' in options:
+            gui.pipe.write_message(MessageType.OBJECTIVE_CONFIG, [
+                (signal, TRANSFORMS.index(transform), weight, reference)
+                for signal, transform, weight, reference in options['objective']])
+        if 'track' in options:
+            x, y = options['track']
+            gui.pipe.write_message(MessageType.TRACK_CONFIG, [(
+                x, y, options.get('amplitude', 0.25), options.get('gain', 1.0), options.get('rate', 0.0),
+                options.get('points', 8))])
+        row_time = None
+        if 'samples' in options or 'interval' in options:
+            samples, interval = options.get('samples', 4 * length), options.get('interval', 0.0)
+            gui.pipe.write_message(MessageType.FLY_CONFIG, [(samples, interval)])
+            row_time = samples * (bench.sample_time + interval)
+        gui.pipe.write_message(MessageType.CONFIG, [(mode, half_length)])
+        gui.run(mode, length, layers, row_time, options.get('cycles', 100),
+                'recipe' in options and options.get('warm_start', False))
+    finally:
+        gui_file.close()
+        gui_end.close()
+        thread.join()
+        worker.close()
+        if errors:
+            raise errors[0]     # the script failure, rather than the GUI side seeing the pipe close
+
+    peak = gui.messages.get(MessageType.PEAK_FIT, gui.messages.get(MessageType.PEAK))
+    peak = gui.messages.get(MessageType.FOCUS, peak)
+    return SimulationResult(mode, bench.moves, bench.reads, bench.clock, time.perf_counter() - start,
+                            None if peak is None else peak[0], gui.messages, worker.last_run)
+
+
+def main(argv=None):
+    """
+    Command line entry point: run one simulated job in a temporary results directory and
+    print its statistics
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--mode', type=int, default=1)
+    parser.add_argument('--half-length', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--strategy', choices=SEARCH_STRATEGY_IDS)
+    parser.add_argument('--first-light', choices=FIRST_LIGHT_PATTERN_IDS, help="look for light first in mode 4")
+    parser.add_argument('--layers', type=int, default=3)
+    parser.add_argument('--focus', type=float, nargs=3, metavar=('LOWER', 'UPPER', 'TOLERANCE'),
+                        help="z bracket and tolerance of the mode 7 focus search")
+    parser.add_argument('--max-samples', type=int, help="average up to this many readings per point")
+    parser.add_argument('--burst', type=int, default=4)
+    parser.add_argument('--track', type=float, nargs=2, metavar=('X', 'Y'), help="piezo start of mode 8")
+    parser.add_argument('--recipe', help="record the run in the history under this recipe")
+    parser.add_argument('--warm-start', action='store_true', help="start modes 4 and 7 from the recipe's prior")
+    parser.add_argument('--baseline', type=int, nargs=2, metavar=('X', 'Y'), help="dark reference point")
+    parser.add_argument('--baseline-interval', type=int, default=0, help="points between dark references")
+    parser.add_argument('--move-latency', type=float, default=0.02)
+    parser.add_argument('--gpib-latency', type=float, default=0.01)
+    parser.add_argument('--realtime', action='store_true')
+    args = parser.parse_args(argv)
+
+    options = {} if args.strategy is None else {'strategy': args.strategy}
+    if args.first_light is not None:
+        options['first_light'] = args.first_light
+    if args.max_samples is not None:
+        options.update(max_samples=args.max_samples, burst=args.burst)
+    if args.track is not None:
+        options['track'] = args.track
+    if args.recipe is not None:
+        options.update(recipe=args.recipe, warm_start=args.warm_start)
+    if args.focus is not None:
+        options['focus'] = args.focus
+    if args.baseline is not None:
+        options.update(baseline=tuple(args.baseline), baseline_interval=args.baseline_interval)
+    os.chdir(tempfile.mkdtemp(prefix='alignment_simulation_'))
+    for directory in ("Results/CSV_Data", "Results/JPG_Data"):
+        os.makedirs(directory)
+    try:
+        result = run_simulated_job(args.mode, args.half_length, seed=args.seed, options=options,
+                                   layers=args.layers, move_latency=args.move_latency,
+                                   gpib_latency=args.gpib_latency, realtime=args.realtime)
+    finally:
+        # the worker only shuts the pool down once it ran: never exit with render processes alive
+        render_pool.shutdown()
+    print("mode {}: {} moves, {} reads, {:.2f} s simulated, {:.2f} s wall, peak {}".format(
+        result.mode, result.moves, result.reads, result.simulated_time, result.wall_time, result.peak))
+    print("results in {}".format(os.getcwd()))
+
+
+if __name__ == '__main__':
+    main()
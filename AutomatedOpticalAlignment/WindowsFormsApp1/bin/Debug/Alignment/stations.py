@@ -0,0 +1,344 @@
+"""
+Several alignment stations served concurrently, one worker per source meter.
+
+A fixture with several parts has one Keithley and one GUI pipe per part. The stations are
+listed in a JSON file, each with the VISA address of its source meter (or the IP address of the
+GPIB gateway and the primary address of the meter behind it), the name of its pipe and the
+recipe its runs are recorded under in the :py:class:`.AlignmentHistory`. A station with a
+``power_meter`` (mainframe address and slot of an 81635A) can score its scans by an
+:py:class:`.Objective` of the power meter channels:
+
+::
+
+    [
+        {"name": "A", "address": "10.160.72.182", "gpib": 9, "pipe": "NPtest_A", "recipe": "SOA-1550"},
+        {"name": "B", "address": "10.160.72.182", "gpib": 10, "pipe": "NPtest_B", "recipe": "SOA-1550",
+         "power_meter": {"address": "GPIB0::20::INSTR", "slot": 1}}
+    ]
+
+A :py:class:`StationLine` serves every station in its own thread with its own
+:py:class:`.AlignmentWorker`, so each station measures while the others wait for their motors.
+The scan loops spend their time waiting for GPIB answers and stage moves, which release the
+GIL, so throughput scales with the number of stations. Meters behind one GPIB controller share
+its bus: their sessions use :py:class:`SharedBusVISA`, which serialises every bus transaction
+of the controller, so a query of one station is never interleaved with a write of another.
+The bus is released while a meter works on a synchronised command (a burst, say), so the other
+stations keep talking to their meters until its status byte reports completion.
+
+::
+
+    >>> line = StationLine(read_stations("Stations.json"))
+    >>> line.serve()    # python Python_Alignment_Script.py --stations Stations.json
+"""
+import json
+import logging
+import threading
+import time
+from collections import namedtuple
+
+from COMMON.Equipment.SourceMeter.Keithley24XX.keithley_2400 import Keithley2400
+from COMMON.Interfaces.VISA.cli_visa import CLIVISA
+from Alignment.render import render_pool
+from Alignment.worker import PIPE_PATH, AlignmentWorker, open_power_meter
+
+
+STATIONS_PATH = "Stations.json"
+
+Station = namedtuple('Station', ['name', 'address', 'pipe', 'recipe', 'warm_start', 'power_meter'],
+                     defaults=("", False, None))
+Station.__doc__ = """Station name, VISA address of its source meter, pipe path, recipe of its runs, whether
+its jobs start from the prior of the recipe and the mainframe address and slot of its power meter"""
+
+_bus_locks = {}
+_bus_locks_lock = threading.Lock()
+
+
+def gpib_resource(gateway, primary=9):
+    """
+    :param gateway: IP address of the GPIB gateway
+    :type gateway: str
+    :param primary: GPIB primary address of the instrument
+    :type primary: int
+    :return: VISA resource string of the instrument behind the gateway
+    :rtype: str
+    """
+    return "TCPIP0::{}::gpib0,{}::INSTR".format(gateway.strip(), int(primary))
+
+
+def pipe_path(name):
+    """
+    :param name: pipe name, or a full path
+    :type name: str
+    :return: path of the named pipe
+    :rtype: str
+    """
+    if '\\' in name or '/' in name:
+        return name
+    return PIPE_PATH.rsplit('\\', 1)[0] + '\\' + name
+
+
+def controller(address):
+    """
+    :param address: VISA resource string
+    :type address: str
+    :return: the GPIB controller the instrument is on, e.g. ``TCPIP0::10.160.72.182::gpib0`` or
+        ``GPIB0``, or the address itself for instruments with a bus of their own
+    :rtype: str
+    """
+    parts = address.split('::')
+    if parts[0].upper().startswith('GPIB'):
+        return parts[0].upper()
+    if len(parts) > 2 and parts[2].lower().startswith('gpib'):
+        return '::'.join(parts[:2] + [parts[2].split(',')[0]]).upper()
+    return address
+
+
+def bus_lock(address):
+    """
+    :param address: VISA resource string
+    :type address: str
+    :return: lock shared by every instrument on the same GPIB controller
+    :rtype: threading.RLock
+    """
+    with _bus_locks_lock:
+        return _bus_locks.setdefault(controller(address), threading.RLock())
+
+
+def read_stations(path=STATIONS_PATH):
+    """
+    :param path: JSON file with a list of stations, each with ``name``, ``address``, ``pipe``
+        and optionally ``gpib`` (primary address behind a gateway IP address), ``recipe``,
+        ``warm_start`` and ``power_meter`` (``address`` and ``slot``)
+    :type path: str
+    :return: stations
+    :rtype: list of Station
+    :raise ValueError: for an empty list or duplicate names, addresses or pipes
+    """
+    with open(path, "r") as f:
+        entries = json.load(f)
+    stations = []
+    for entry in entries:
+        address = entry['address']
+        if '::' not in address:
+            address = gpib_resource(address, entry.get('gpib', 9))
+        power_meter = entry.get('power_meter')
+        if power_meter is not None:
+            power_meter = (power_meter['address'], int(power_meter.get('slot', 1)))
+        stations.append(Station(str(entry['name']), address, pipe_path(entry['pipe']), entry.get('recipe', ""),
+                                bool(entry.get('warm_start', False)), power_meter))
+    if not stations:
+        raise ValueError("{} lists no stations".format(path))
+    for field in ('name', 'address', 'pipe'):
+        values = [getattr(station, field) for station in stations]
+        if len(set(values)) < len(values):
+            raise ValueError("Stations in {} share a {}".format(path, field))
+    return stations
+
+
+class SharedBusVISA(CLIVISA):
+    """
+    VISA session holding the lock of its GPIB controller for every bus transaction
+    """
+    def __init__(self, lock, address=None, **kwargs):
+        """
+        Initialize instance
+
+        :param lock: lock of the GPIB controller, see :py:func:`bus_lock`
+        :type lock: threading.RLock
+        :param address: communication interface address
+        :type address: str
+        :param kwargs: arbitrary keyword arguments
+        :type kwargs: dict
+        """
+        super().__init__(address=address, **kwargs)
+        self.lock = lock
+
+    def open(self, address=None):
+        with self.lock:
+            super().open(address)
+
+    def close(self):
+        with self.lock:
+            super().close()
+
+    def error_checking(self):
+        with self.lock:
+            super().error_checking()
+
+    def query(self, message):
+        with self.lock:
+            return super().query(message)
+
+    def query_binary(self, message, **kwargs):
+        with self.lock:
+            return super().query_binary(message, **kwargs)
+
+    def query_with_srq_sync(self, message, timeout):
+        with self.lock:
+            return super().query_with_srq_sync(message, timeout)
+
+    # the STB polling commands hold the bus for their transactions and for every poll, but not
+    # while the instrument works, so the other meters on the controller carry on meanwhile
+
+    def _read_stb(self):
+        with self.lock:
+            return super()._read_stb()
+
+    def query_with_stb_poll(self, message, timeout):
+        with self.lock:
+            self.visa_handle.write(message)
+        self._stb_polling('Querying with OPCsync - Timeout occured. Message: "{}", timeout {}s'.format(
+            message, timeout), timeout)
+        with self.lock:
+            return self.visa_handle.read()
+
+    def query_with_stb_poll_sync(self, message, timeout):
+        with self.lock:
+            self.visa_handle.query('*ESR?')
+            self.visa_handle.write(message + ';*OPC')
+        self._stb_polling('Querying with OPCsync - Timeout occured. Message: "{}", timeout {}s'.format(
+            message, timeout), timeout)
+        with self.lock:
+            response = self.visa_handle.read()
+            self.visa_handle.query('*ESR?')
+        return response
+
+    def read(self):
+        with self.lock:
+            return super().read()
+
+    def write(self, message):
+        with self.lock:
+            super().write(message)
+
+    def write_with_srq_sync(self, message, timeout):
+        with self.lock:
+            super().write_with_srq_sync(message, timeout)
+
+    def write_with_stb_poll(self, message, timeout):
+        with self.lock:
+            self.visa_handle.write(message)
+        self._stb_polling('Writing with OPCsync - Timeout occured. Command: "{}", timeout {}s'.format(
+            message, timeout), timeout)
+
+    def write_with_stb_poll_sync(self, message, timeout):
+        with self.lock:
+            self.visa_handle.query('*ESR?')
+            self.visa_handle.write(message + ';*OPC')
+        self._stb_polling('Writing with OPCsync - Timeout occured. Command: "{}", timeout {}s'.format(
+            message, timeout), timeout)
+        with self.lock:
+            self.visa_handle.query('*ESR?')
+
+
+def station_worker(station, retry_interval=0.2):
+    """
+    :param station: station
+    :type station: Station
+    :param retry_interval: time in s between attempts to open the pipe while waiting for the GUI
+    :type retry_interval: float
+    :return: worker serving the station's pipe with its source meter and power meter on the shared bus
+    :rtype: AlignmentWorker
+    """
+    keithley = Keithley2400(station.address, interface=SharedBusVISA(bus_lock(station.address)),
+                            name="Keithley2400_" + station.name)
+    power_meter = None
+    if station.power_meter is not None:
+        address, slot = station.power_meter
+        power_meter = open_power_meter(address, slot, interface=SharedBusVISA(bus_lock(address)))
+    return AlignmentWorker(station.address, station.pipe, retry_interval, "AlignmentWorker_" + station.name,
+                           keithley, station.recipe, station.warm_start, render_owner=False, power_meter=power_meter)
+
+
+class StationLine:
+    """
+    Serves the jobs of several stations concurrently, one worker thread per station
+    """
+    def __init__(self, stations, retry_interval=0.2, name=None):
+        """
+        Initialize instance
+
+        :param stations: stations to serve
+        :type stations: list of Station
+        :param retry_interval: time in s between attempts to open a pipe while waiting for the GUI
+        :type retry_interval: float
+        :param name: line name that defaults to class name
+        :type name: str
+        """
+        self.stations = list(stations)
+        self.workers = {station.name: station_worker(station, retry_interval) for station in self.stations}
+        """:type: dict of str to AlignmentWorker"""
+        self._threads = []
+        self._started = None
+        self.logger = logging.getLogger(name or type(self).__name__)
+
+    def start(self):
+        """
+        Start serving every station in a thread of its own
+        """
+        self._started = time.perf_counter()
+        self._threads = [threading.Thread(target=worker.serve, name="Station_" + name, daemon=True)
+                         for name, worker in self.workers.items()]
+        for thread in self._threads:
+            thread.start()
+        self.logger.info("Serving {} stations".format(len(self._threads)))
+
+    def stop(self):
+        """
+        Ask every worker to return once its current session ends
+        """
+        for worker in self.workers.values():
+            worker.stop()
+
+    def join(self, timeout=None):
+        """
+        Wait for the worker threads, then finish the queued result images
+
+        :param timeout: time in s to wait for each thread
+        :type timeout: float
+        :return: True if every worker has returned
+        :rtype: bool
+        """
+        for thread in self._threads:
+            thread.join(timeout)
+        finished = not any(thread.is_alive() for thread in self._threads)
+        if finished:
+            render_pool.shutdown()
+        return finished
+
+    def serve(self):
+        """
+        Serve every station until interrupted, then log the :py:meth:`summary`
+        """
+        self.start()
+        try:
+            while not self.join(timeout=1.0):
+                pass
+        except KeyboardInterrupt:
+            self.logger.info("Stopping after the current jobs")
+            self.stop()
+            self.join()
+        finally:
+            for row in self.summary():
+                self.logger.info("{name}: {jobs} jobs, {failures} failed, {busy:.1f} s busy "
+                                 "({utilisation:.0%})".format(**row))
+                if row['peak'] is not None:
+                    self.logger.info("{name}: {peaks} peaks, last at ({peak[0]:.2f}, {peak[1]:.2f}) reading "
+                                     "{value:.4g}, saved in {store}".format(**row))
+
+    def summary(self):
+        """
+        :return: per station the jobs run and failed, the time spent running jobs and its
+            fraction of the time the line has been serving, the number of jobs that found a peak
+            and the mode, peak position, reading and store of the last one (None before any)
+        :rtype: list of dict
+        """
+        elapsed = time.perf_counter() - self._started if self._started is not None else 0.0
+        rows = []
+        for name, worker in self.workers.items():
+            run = worker.last_run
+            rows.append({'name': name, 'jobs': worker.jobs, 'failures': worker.failures, 'busy': worker.busy,
+                         'utilisation': worker.busy / elapsed if elapsed > 0 else 0.0, 'peaks': worker.peaks,
+                         'mode': None if run is None else run.mode, 'peak': None if run is None else run.peak,
+                         'value': None if run is None else run.value, 'store': None if run is None else run.store})
+        return rows
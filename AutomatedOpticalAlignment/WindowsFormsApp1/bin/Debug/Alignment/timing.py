@@ -0,0 +1,176 @@
+"""
+Hot-path latency instrumentation of the scan loops.
+
+A :py:class:`LatencyRecorder` keeps one preallocated ring buffer of ``perf_counter_ns`` durations
+per phase of a point:
+
+- ``pipe_wait``: blocked on the pipe until the GUI has moved the motors and sent the coordinates
+- ``measure``: the ``measure.current.value`` round trip to the Keithley
+- ``error_check``: the ``error_checking`` queries the driver runs after every read, timed by
+  wrapping the interface method (a part of ``measure``)
+- ``reply``: writing the readings back to the GUI
+
+Recording a sample is two clock reads and an array store, so the timers stay on in production.
+At the end of a scan the p50/p95/p99 summary of every phase is written next to the results
+CSV, and framed clients can ask for a live ``TIMING`` summary every N points.
+
+::
+
+    >>> timer = LatencyRecorder()
+    >>> t = timer.now()
+    >>> coords = pipe.read_message()
+    >>> t = timer.record(PIPE_WAIT, t)
+    >>> reading = keithley.channel[1].measure.current.value
+    >>> timer.record(MEASURE, t)
+    >>> timer.summary()['measure']['p95']
+    8412.7
+"""
+import time
+
+import numpy as np
+
+
+PIPE_WAIT = 0
+MEASURE = 1
+ERROR_CHECK = 2
+REPLY = 3
+
+PHASES = ('pipe_wait', 'measure', 'error_check', 'reply')
+"""Phase names by phase index"""
+
+PERCENTILES = (50, 95, 99)
+
+
+class LatencyRecorder:
+    """
+    Per-phase ring buffers of durations in ns
+    """
+    def __init__(self, capacity=65536, report_interval=0, report=None):
+        """
+        Initialize instance
+
+        :param capacity: samples kept per phase, older samples are overwritten
+        :type capacity: int
+        :param report_interval: number of points between live reports, 0 for none
+        :type report_interval: int
+        :param report: called with the recorder every ``report_interval`` points
+        :type report: callable
+        """
+        self.capacity = capacity
+        self.samples = np.zeros((len(PHASES), capacity), dtype=np.int64)
+        self.counts = [0] * len(PHASES)
+        self.points = 0
+        self.report_interval = report_interval
+        self.report = report
+        self._interface = None
+
+    now = staticmethod(time.perf_counter_ns)
+
+    def record(self, phase, start):
+        """
+        Record the time elapsed since ``start``
+
+        :param phase: phase index, e.g. :py:data:`MEASURE`
+        :type phase: int
+        :param start: ``perf_counter_ns`` value at the start of the phase
+        :type start: int
+        :return: current ``perf_counter_ns`` value, the start of the next phase
+        :rtype: int
+        """
+        end = time.perf_counter_ns()
+        count = self.counts[phase]
+        self.samples[phase, count % self.capacity] = end - start
+        self.counts[phase] = count + 1
+        return end
+
+    def tick(self, points=1):
+        """
+        Count finished points and send a live report when one is due
+
+        :param points: number of points finished
+        :type points: int
+        """
+        previous = self.points
+        self.points += points
+        if self.report_interval and self.points // self.report_interval > previous // self.report_interval:
+            self.report(self)
+
+    def attach(self, keithley):
+        """
+        Time the driver's ``error_checking`` calls until :py:meth:`detach`
+
+        :param keithley: source meter driver, drivers without a VISA interface are ignored
+        :type keithley: Keithley2400
+        """
+        interface = getattr(keithley, '_interface', None)
+        if interface is None or not hasattr(interface, 'error_checking'):
+            return
+        error_checking = interface.error_checking
+
+        def timed_error_checking():
+            start = time.perf_counter_ns()
+            try:
+                return error_checking()
+            finally:
+                self.record(ERROR_CHECK, start)
+
+        interface.error_checking = timed_error_checking
+        self._interface = interface
+
+    def detach(self):
+        """
+        Restore the driver's ``error_checking``
+        """
+        if self._interface is not None:
+            del self._interface.error_checking
+            self._interface = None
+
+    def durations(self, phase):
+        """
+        :param phase: phase index
+        :type phase: int
+        :return: recorded durations in ns, oldest first
+        :rtype: numpy.ndarray
+        """
+        count = self.counts[phase]
+        if count <= self.capacity:
+            return self.samples[phase, :count].copy()
+        start = count % self.capacity
+        return np.roll(self.samples[phase], -start)
+
+    def summary(self):
+        """
+        :return: count, mean, p50, p95, p99 and max in us for every phase that has samples
+        :rtype: dict
+        """
+        summary = {}
+        for phase, name in enumerate(PHASES):
+            durations = self.durations(phase) / 1e3
+            if not len(durations):
+                continue
+            p50, p95, p99 = np.percentile(durations, PERCENTILES)
+            summary[name] = {'count': self.counts[phase], 'mean': durations.mean(), 'p50': p50, 'p95': p95,
+                             'p99': p99, 'max': durations.max()}
+        return summary
+
+    def format_summary(self):
+        """
+        :return: one line per phase, for the log
+        :rtype: str
+        """
+        return "\n".join("{:<12} n={:<6} p50={:9.1f} us  p95={:9.1f} us  p99={:9.1f} us  max={:9.1f} us".format(
+            name, stats['count'], stats['p50'], stats['p95'], stats['p99'], stats['max'])
+            for name, stats in self.summary().items())
+
+    def write_summary(self, file_path):
+        """
+        Write the per-phase summary as CSV
+
+        :param file_path: CSV file path
+        :type file_path: str
+        """
+        columns = ('count', 'mean', 'p50', 'p95', 'p99', 'max')
+        with open(file_path, "w") as f:
+            f.write("phase," + ",".join(column + ("" if column == 'count' else "_us") for column in columns) + "\n")
+            for name, stats in self.summary().items():
+                f.write(name + "," + ",".join("{:.6g}".format(stats[column]) for column in columns) + "\n")
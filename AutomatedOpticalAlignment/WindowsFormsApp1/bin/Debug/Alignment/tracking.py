@@ -0,0 +1,96 @@
+"""
+Dither lock-in tracking of the coupling peak with the piezo stages.
+
+To hold the alignment during a long measurement the piezo is dithered on a small circle around
+the current centre, x with sin and y with cos of the same phase. Synchronous demodulation of
+the readings of one dither cycle with the two references gives the x and y gradient of the
+photocurrent, and the centre is moved up the gradient normalised by the mean reading:
+
+::
+
+    >>> lock_in = DitherLockIn(amplitude=0.2, gain=2.0, points=8)
+    >>> readings = measure(lock_in.positions(centre))
+    >>> step = lock_in.update(centre, readings)
+    >>> step.centre, step.error
+    (array([10.31, 7.58]), 0.021)
+
+The normalised gradient is zero on the peak and ``4 d / w**2`` at a distance ``d`` from the peak
+of a Gaussian of 1/e^2 half width ``w``, so a gain of ``w**2 / 4`` re-centres in one cycle.
+Its magnitude is reported as the tracking error.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+
+TrackingStep = namedtuple('TrackingStep', ['centre', 'gradient', 'value', 'error'])
+TrackingStep.__doc__ = """New dither centre, gradient of the reading, mean reading of the cycle and tracking error
+(magnitude of the normalised gradient)"""
+
+
+class DitherLockIn:
+    """
+    Gradient estimate and re-centring from one circular dither cycle
+    """
+    def __init__(self, amplitude, gain=1.0, points=8, max_step=None):
+        """
+        Initialize instance
+
+        :param amplitude: dither radius in piezo units
+        :type amplitude: float
+        :param gain: step per unit of normalised gradient, in piezo units squared
+        :type gain: float
+        :param points: readings per dither cycle, at least 3
+        :type points: int
+        :param max_step: largest move of the centre per cycle, defaults to the amplitude
+        :type max_step: float
+        :raise ValueError: for fewer than 3 points or a dither amplitude that is not positive
+        """
+        if points < 3:
+            raise ValueError("A dither cycle needs at least 3 points")
+        if amplitude <= 0:
+            raise ValueError("The dither amplitude must be positive")
+        self.amplitude = amplitude
+        self.gain = gain
+        self.points = points
+        self.max_step = amplitude if max_step is None else max_step
+        phases = 2 * np.pi * np.arange(points) / points
+        self.reference = np.column_stack((np.sin(phases), np.cos(phases)))
+
+    def positions(self, centre):
+        """
+        :param centre: dither centre
+        :type centre: numpy.ndarray
+        :return: piezo x, y of every point of one dither cycle, shape (points, 2)
+        :rtype: numpy.ndarray
+        """
+        return np.asarray(centre, dtype=float) + self.amplitude * self.reference
+
+    def demodulate(self, readings):
+        """
+        :param readings: reading at every point of :py:meth:`positions`
+        :type readings: numpy.ndarray
+        :return: x, y gradient of the reading and its mean over the cycle
+        :rtype: (numpy.ndarray, float)
+        """
+        readings = np.asarray(readings, dtype=float)
+        mean = readings.mean()
+        gradient = 2 * self.reference.T @ (readings - mean) / (self.points * self.amplitude)
+        return gradient, mean
+
+    def update(self, centre, readings):
+        """
+        :param centre: dither centre the readings were taken around
+        :type centre: numpy.ndarray
+        :param readings: reading at every point of :py:meth:`positions`
+        :type readings: numpy.ndarray
+        :return: centre moved up the gradient by at most ``max_step``, and the estimates it is based on
+        :rtype: TrackingStep
+        """
+        gradient, value = self.demodulate(readings)
+        normalised = gradient / value if value > 0 else np.zeros(2)
+        step = self.gain * normalised
+        length = np.hypot(*step)
+        if length > self.max_step:
+            step *= self.max_step / length
+        return TrackingStep(np.asarray(centre, dtype=float) + step, gradient, value, float(np.hypot(*normalised)))
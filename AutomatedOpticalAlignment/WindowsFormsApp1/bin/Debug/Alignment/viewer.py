@@ -0,0 +1,281 @@
+"""
+Interactive views of a saved single scan, opened by the GUI through ``ShowArial.py`` (colour map
+with a cursor readout) and ``ShowIsometric.py`` (surface).
+
+The GUI sends the file name of the scan over the ``\\\\.\\pipe\\NPtest`` pipe, a length byte
+followed by the ASCII name, and the scan is loaded from ``Results/CSV_Data/<name>.csv``:
+
+- from the ``<name>.npy`` binary cache next to the CSV, memory-mapped, when it is at least as
+  new as the CSV. The scan modes write it with the CSV (:py:func:`write_cache`).
+- otherwise by parsing the CSV with :py:func:`numpy.loadtxt`, whose C parser is much faster
+  than :py:func:`numpy.genfromtxt`, and writing the cache for the next view.
+
+Grids larger than :py:data:`MAX_DISPLAY_POINTS` (:py:data:`.MAX_SURFACE_POINTS` for the
+surface) rows or columns are decimated for display by block maxima, so the peak stays visible.
+The cursor readout still reads the full grid. It only redraws when the cursor moves to another
+grid point and blits the text instead of redrawing the figure where the backend supports it.
+
+::
+
+    >>> results = load_results("Results/CSV_Data/1_1_0.1.csv")
+    >>> show_map("1_1_0.1")     # python ShowArial.py, after the GUI sent the name
+"""
+import os
+
+import numpy as np
+
+from Alignment.render import MAX_SURFACE_POINTS
+
+
+PIPE_PATH = r'\\.\pipe\NPtest'
+CSV_DIR = "Results/CSV_Data"
+
+MAX_DISPLAY_POINTS = 500
+"""Maximum number of rows and columns drawn in a colour map"""
+
+
+def read_view_request(pipe_path=PIPE_PATH):
+    """
+    :param pipe_path: path of the named pipe served by the GUI
+    :type pipe_path: str
+    :return: file name of the scan to show
+    :rtype: str
+    """
+    with open(pipe_path, 'r+b', 0) as f:
+        length = int.from_bytes(f.read(1), 'big')
+        return f.read(length).decode("ascii")
+
+
+def cache_path(csv_path):
+    """
+    :param csv_path: path of the CSV results
+    :type csv_path: str
+    :return: path of their binary cache
+    :rtype: str
+    """
+    return os.path.splitext(csv_path)[0] + ".npy"
+
+
+def write_cache(results, csv_path):
+    """
+    Save the binary cache of CSV results, written to a temporary file and renamed into place so
+    a viewer never maps a half written file
+
+    :param results: readings saved in the CSV
+    :type results: numpy.ndarray
+    :param csv_path: path of the CSV results
+    :type csv_path: str
+    """
+    path = cache_path(csv_path)
+    temporary = path + ".tmp.npy"
+    np.save(temporary, np.asarray(results, dtype=float))
+    os.replace(temporary, path)
+
+
+def load_results(csv_path):
+    """
+    :param csv_path: path of the CSV results
+    :type csv_path: str
+    :return: readings, memory-mapped from the cache when it is up to date
+    :rtype: numpy.ndarray
+    """
+    path = cache_path(csv_path)
+    if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(csv_path):
+        return np.load(path, mmap_mode='r')
+    results = np.loadtxt(csv_path, delimiter=',', ndmin=2)
+    try:
+        write_cache(results, csv_path)
+    except OSError:
+        pass    # read-only results folder: parse again next time
+    return results
+
+
+def scan_extent(file_name, shape):
+    """
+    :param file_name: file name sent by the GUI, starting with ``<x>_<y>_<step>``
+    :type file_name: str
+    :param shape: shape of the readings
+    :type shape: tuple
+    :return: XStart, XEnd, YStart, YEnd of the scan window
+    :rtype: tuple
+    """
+    x, y, step = (float(value) for value in file_name.split('_')[:3])
+    return (x - (shape[0] - 1) / 2 * step, x + (shape[0] - 1) / 2 * step,
+            y - (shape[1] - 1) / 2 * step, y + (shape[1] - 1) / 2 * step)
+
+
+def decimate(results, max_points):
+    """
+    :param results: readings
+    :type results: numpy.ndarray
+    :param max_points: maximum number of rows and columns
+    :type max_points: int
+    :return: maximum of every block of k x k readings, with the smallest k that fits, ignoring NaN
+    :rtype: numpy.ndarray
+    """
+    k = int(np.ceil(max(results.shape) / max_points))
+    if k <= 1:
+        return np.asarray(results)
+    rows, cols = -(-results.shape[0] // k), -(-results.shape[1] // k)
+    padded = np.full((rows * k, cols * k), np.nan)
+    padded[:results.shape[0], :results.shape[1]] = results
+    return np.fmax.reduce(np.fmax.reduce(padded.reshape(rows, k, cols, k), axis=3), axis=1)
+
+
+class CursorReadout:
+    """
+    Position and reading under the mouse, drawn in a text axes above the colour map
+    """
+    def __init__(self, text, image_axes, results, extent, default_text):
+        """
+        Initialize instance
+
+        :param text: text artist of the readout
+        :type text: matplotlib.text.Text
+        :param image_axes: axes of the colour map
+        :type image_axes: matplotlib.axes.Axes
+        :param results: full resolution readings indexed as ``results[row, col]``
+        :type results: numpy.ndarray
+        :param extent: XStart, XEnd, YStart, YEnd of the scan window
+        :type extent: tuple
+        :param default_text: text shown while the cursor is off the map
+        :type default_text: str
+        """
+        self.text = text
+        self.image_axes = image_axes
+        self.results = results
+        self.default_text = default_text
+        XStart, XEnd, YStart, YEnd = extent
+        self._origin = (XStart, YStart)
+        # grid points per mm, computed once rather than on every motion event
+        self._scale = (results.shape[1] / (XEnd - XStart) if XEnd != XStart else 0.0,
+                       results.shape[0] / (YEnd - YStart) if YEnd != YStart else 0.0)
+        self._cell = None
+        self._background = None
+        canvas = text.figure.canvas
+        # a blitted text is left out of full redraws, which then only save the background
+        text.set_animated(getattr(canvas, 'supports_blit', False))
+        canvas.mpl_connect('draw_event', self._save_background)
+        canvas.mpl_connect('motion_notify_event', self.update)
+
+    def _save_background(self, event):
+        if self.text.get_animated():
+            self._background = self.text.figure.canvas.copy_from_bbox(self.text.axes.bbox)
+            self._redraw()
+
+    def cell(self, x, y):
+        """
+        :param x: x in mm
+        :type x: float
+        :param y: y in mm
+        :type y: float
+        :return: row and column of the grid point under x, y, None off the grid
+        :rtype: tuple
+        """
+        col = int(np.floor((x - self._origin[0]) * self._scale[0]))
+        row = int(np.floor((y - self._origin[1]) * self._scale[1]))
+        if 0 <= row < self.results.shape[0] and 0 <= col < self.results.shape[1]:
+            return row, col
+        return None
+
+    def update(self, event):
+        """
+        Show the position and reading under the mouse, redrawing only when the grid point changes
+
+        :param event: mouse motion event
+        :type event: matplotlib.backend_bases.MouseEvent
+        """
+        cell = None
+        if event.inaxes is self.image_axes and event.xdata is not None and event.ydata is not None:
+            cell = self.cell(event.xdata, event.ydata)
+        if cell == self._cell:
+            return
+        self._cell = cell
+        if cell is None:
+            self.text.set_text(self.default_text)
+        else:
+            z = self.results[cell]
+            self.text.set_text(f"X={event.xdata:.4f} mm     Y={event.ydata:.4f} mm     I={z:.4f}e-11 A")
+        self._redraw()
+
+    def _redraw(self):
+        canvas = self.text.figure.canvas
+        if self._background is None:
+            canvas.draw_idle()
+            return
+        canvas.restore_region(self._background)
+        self.text.axes.draw_artist(self.text)
+        canvas.blit(self.text.axes.bbox)
+
+
+def _scan(file_name, base_path=None):
+    results = load_results(os.path.join(base_path or os.getcwd(), CSV_DIR, file_name + ".csv"))
+    return results, scan_extent(file_name, results.shape)
+
+
+def show_map(file_name, base_path=None, show=True):
+    """
+    Colour map of a scan with the cursor position and reading above it
+
+    :param file_name: file name of the scan
+    :type file_name: str
+    :param base_path: directory holding ``Results``, defaults to the working directory
+    :type base_path: str
+    :param show: open the window and block until it is closed
+    :type show: bool
+    :return: figure and its cursor readout
+    :rtype: (matplotlib.figure.Figure, CursorReadout)
+    """
+    import matplotlib.pyplot as plt
+
+    results, (XStart, XEnd, YStart, YEnd) = _scan(file_name, base_path)
+    plt.rcParams['font.size'] = 15
+
+    # top axes for the cursor readout, bottom axes for the map
+    fig, ax = plt.subplots(nrows=2, ncols=1, figsize=(6.4, 5.6),
+                           gridspec_kw={'height_ratios': [0.8 / 5.6, 4.8 / 5.6]})
+    ax[0].axis('off')
+    default_text = "Cursor location will be shown here"
+    text = ax[0].text(0.5, 0.5, default_text, va='center', ha='center', color='black')
+    ax[1].imshow(decimate(results, MAX_DISPLAY_POINTS), cmap='plasma', extent=[XStart, XEnd, YEnd, YStart])
+    readout = CursorReadout(text, ax[1], results, (XStart, XEnd, YStart, YEnd), default_text)
+    if show:
+        plt.show()
+    return fig, readout
+
+
+def show_surface(file_name, base_path=None, show=True):
+    """
+    Surface plot of a scan
+
+    :param file_name: file name of the scan
+    :type file_name: str
+    :param base_path: directory holding ``Results``, defaults to the working directory
+    :type base_path: str
+    :param show: open the window and block until it is closed
+    :type show: bool
+    :return: figure
+    :rtype: matplotlib.figure.Figure
+    """
+    import matplotlib.pyplot as plt
+    from mpl_toolkits.mplot3d import Axes3D
+
+    results, (XStart, XEnd, YStart, YEnd) = _scan(file_name, base_path)
+    shown = decimate(results, MAX_SURFACE_POINTS)
+
+    hf = plt.figure()
+    ha = hf.add_subplot(111, projection='3d')
+    # grid coordinates of the decimated blocks, in the steps of the full grid
+    X, Y = np.meshgrid(np.linspace(0, results.shape[0], shown.shape[0], endpoint=False),
+                       np.linspace(0, results.shape[1], shown.shape[1], endpoint=False))
+    X = ((XEnd - XStart) / results.shape[0]) * X + XStart
+    Y = ((YEnd - YStart) / results.shape[1]) * Y + YStart
+    ha.plot_surface(X.T, Y.T, shown, rstride=1, cstride=1, cmap='plasma', edgecolor='none')
+    ha.set_title('Current Readings')
+    hf.suptitle('Stepper Scan', fontsize=20)
+    ha.set_xlabel('X-Axis', fontsize=8)
+    ha.set_ylabel('Y-Axis', fontsize=8)
+    ha.set_zlabel('current readings (e-11)', fontsize=8)
+    if show:
+        plt.show()
+    return hf
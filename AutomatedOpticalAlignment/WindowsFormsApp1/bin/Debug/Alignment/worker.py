@@ -0,0 +1,314 @@
+"""
+Alignment worker that owns the source meter session and serves scan jobs from the GUI pipe.
+
+Launched once per scan (the GUI default) the worker runs a single job and exits. Started with
+``--worker`` it stays resident: numpy/matplotlib stay imported, the GPIB address is read once and
+the Keithley is only reconfigured when a job asks for different source settings, so the next
+scan starts measuring as soon as the GUI opens the pipe.
+
+::
+
+    >>> worker = AlignmentWorker(read_gpib_address("GPIBAddress.txt"))
+    >>> worker.serve()   # python Python_Alignment_Script.py --worker
+"""
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from COMMON.Equipment.SourceMeter.Keithley24XX.keithley_2400 import Keithley2400
+from COMMON.Utilities.logging_ext import create_stream_handler
+from Alignment.pipe_protocol import DUT_CONFIG_DTYPE, ProtocolError, open_pipe
+from Alignment.render import render_pool
+from Alignment.scan_modes import HARDWARE_MODES, SCAN_MODES
+
+
+PIPE_PATH = r'\\.\pipe\NPtest'
+
+SmuSettings = namedtuple('SmuSettings', ['terminal', 'remote_sensing', 'compliance_current', 'voltage_setpoint'])
+DEFAULT_SMU_SETTINGS = SmuSettings(terminal="FRONT", remote_sensing="DISABLE",
+                                   compliance_current=100e-6, voltage_setpoint=3)
+
+
+def read_gpib_address(path="GPIBAddress.txt"):
+    """
+    :param path: file holding the IP address of the GPIB gateway
+    :type path: str
+    :return: VISA resource string of the Keithley behind the gateway
+    :rtype: str
+    """
+    with open(path, "r") as f:
+        address = f.read()
+    return "TCPIP0::" + address + "::gpib0,9::INSTR"
+
+
+def read_power_meter(path="PowerMeterAddress.txt"):
+    """
+    :param path: file holding the VISA address of the 8163 mainframe on its first line and the
+        slot of the 81635A power meter on the second
+    :type path: str
+    :return: power meter driver, None if the bench has no such file
+    :rtype: Keysight81635A
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        address, slot = f.read().split()[:2]
+    return open_power_meter(address, int(slot))
+
+
+def open_power_meter(address, slot, interface=None):
+    """
+    :param address: VISA address of the 8163 mainframe
+    :type address: str
+    :param slot: slot of the 81635A power meter
+    :type slot: int
+    :param interface: interface to the mainframe, defaults to the driver's own
+    :type interface: BaseEquipmentInterface
+    :return: power meter driver, not connected yet
+    :rtype: Keysight81635A
+    """
+    # imported on first use: only benches with a power meter need the mainframe driver
+    from COMMON.Equipment.OpticalPowerMeter.Keysight81635A.keysight_81635a import Keysight81635A
+    return Keysight81635A(address, slot, interface=interface)
+
+
+class AlignmentWorker:
+    """
+    Runs scan jobs received over the GUI pipe, keeping the instrument session between jobs
+    """
+    def __init__(self, address, pipe_path=PIPE_PATH, retry_interval=0.2, name=None, keithley=None, recipe="",
+                 warm_start=False, render_owner=True, power_meter=None):
+        """
+        Initialize instance
+
+        :param address: VISA address of the Keithley
+        :type address: str
+        :param pipe_path: path of the named pipe served by the GUI
+        :type pipe_path: str
+        :param retry_interval: time in s between attempts to open the pipe while waiting for the GUI
+        :type retry_interval: float
+        :param name: worker name that defaults to class name
+        :type name: str
+        :param keithley: source meter to use instead of connecting to ``address``, e.g. a
+            :py:class:`.SimulatedKeithley`
+        :type keithley: Keithley2400
+        :param recipe: recipe recorded in the history for jobs whose client sends no ``DUT_CONFIG``
+        :type recipe: str
+        :param warm_start: start those jobs from the prior of the recipe
+        :type warm_start: bool
+        :param render_owner: shut the shared render pool down on :py:meth:`close`; the workers
+            of a :py:class:`.StationLine` leave that to the line
+        :type render_owner: bool
+        :param power_meter: optical power meter for jobs with an ``OBJECTIVE_CONFIG``, connected on
+            first use, e.g. from :py:func:`read_power_meter`
+        :type power_meter: Keysight81635A
+        """
+        self._address = address
+        self._pipe_path = pipe_path
+        self._retry_interval = retry_interval
+        self._keithley = keithley
+        self._smu_settings = None
+        self._power_meter = power_meter
+        self._power_meter_configured = False
+        self._render_owner = render_owner
+        self._stop = threading.Event()
+        self.settings = DEFAULT_SMU_SETTINGS
+        """:type: SmuSettings"""
+        self.recipe = recipe
+        self.warm_start = warm_start
+        self.jobs = 0
+        self.failures = 0
+        self.busy = 0.0
+        """time in s spent running jobs"""
+        self.peaks = 0
+        """number of jobs that found a peak"""
+        self.last_run = None
+        """Run of the last job that found a peak, :type: Run"""
+        self.logger = logging.getLogger(name or type(self).__name__)
+        create_stream_handler()
+
+    @property
+    def keithley(self):
+        """
+        **READONLY**
+
+        :value: source meter driver, created on first use
+        :type: Keithley2400
+        """
+        if self._keithley is None:
+            self._keithley = Keithley2400(self._address)
+        return self._keithley
+
+    def configure_smu(self, settings):
+        """
+        Connect and configure the source meter, skipping every GPIB write when the
+        requested settings are already applied
+
+        :param settings: source settings for the next job
+        :type settings: SmuSettings
+        :return: configured source meter
+        :rtype: Keithley2400
+        """
+        keithley = self.keithley
+        if settings == self._smu_settings:
+            return keithley
+
+        keithley.connect()
+        channel = keithley.channel[1]
+        channel.terminal_select = settings.terminal
+        channel.remote_sensing = settings.remote_sensing
+        channel.output = 'disable'
+        if hasattr(channel.measure.current, 'disarm'):
+            channel.measure.current.disarm()    # a failed job may have left a burst armed
+        channel.source.current.compliance_current = settings.compliance_current
+        channel.source.voltage.setpoint = settings.voltage_setpoint
+        channel.output = 'enable'
+        self._smu_settings = settings
+        self.logger.info("Source meter configured: {}".format(settings))
+        return keithley
+
+    def configure_power_meter(self):
+        """
+        Connect the power meter and set every channel to read in W, once per worker
+
+        :return: configured power meter, None if the worker has none
+        :rtype: Keysight81635A
+        """
+        power_meter = self._power_meter
+        if power_meter is None or self._power_meter_configured:
+            return power_meter
+        power_meter.connect()
+        for channel in power_meter.channel:
+            channel.power_unit = 'Watt'
+        self._power_meter_configured = True
+        self.logger.info("Power meter configured")
+        return power_meter
+
+    def run_job(self, pipe):
+        """
+        Run one scan job whose configuration has already been read from the pipe
+
+        :param pipe: GUI channel
+        :type pipe: FramedPipe
+        :raise ProtocolError: for unknown scan modes
+        """
+        if pipe.mode not in SCAN_MODES:
+            raise ProtocolError("Unknown scan mode {}".format(pipe.mode))
+
+        if pipe.smu_settings is not None:
+            self.settings = self.settings._replace(
+                compliance_current=float(pipe.smu_settings['compliance_current']),
+                voltage_setpoint=float(pipe.smu_settings['voltage_setpoint']))
+        if pipe.dut_config is None and self.recipe:
+            pipe.dut_config = np.array(("", self.recipe, self.warm_start), dtype=DUT_CONFIG_DTYPE)[()]
+
+        keithley = self.configure_smu(self.settings) if pipe.mode in HARDWARE_MODES else None
+        power_meter = None
+        if pipe.mode in HARDWARE_MODES and pipe.objective_config is not None:
+            power_meter = self.configure_power_meter()
+        start = time.perf_counter()
+        pipe.run = None
+        SCAN_MODES[pipe.mode](pipe, keithley, power_meter)
+        duration = time.perf_counter() - start
+        self.jobs += 1
+        self.busy += duration
+        if pipe.run is not None:
+            self.peaks += 1
+            self.last_run = pipe.run
+        self.logger.info("Job {} (mode {}) finished in {:.1f} s".format(self.jobs, pipe.mode, duration))
+
+    def run_session(self, file):
+        """
+        Serve every job sent over one pipe connection. The legacy GUI sends a single job
+        per connection, framed clients may send further ``CONFIG`` messages on the same one.
+
+        :param file: raw pipe handle
+        :type file: io.RawIOBase
+        """
+        pipe = open_pipe(file)
+        self.run_job(pipe)
+        if pipe.legacy:
+            return
+        while True:
+            try:
+                pipe.read_config()
+            except EOFError:
+                return
+            self.run_job(pipe)
+
+    def open_pipe_file(self, wait=True):
+        """
+        Open the named pipe, polling until the GUI has created it
+
+        :param wait: keep retrying while the pipe does not exist or is busy
+        :type wait: bool
+        :return: raw pipe handle, None if :py:meth:`stop` was called while waiting
+        :rtype: io.RawIOBase
+        """
+        while not self._stop.is_set():
+            try:
+                return open(self._pipe_path, 'r+b', 0)
+            except OSError:
+                if not wait:
+                    raise
+                self._stop.wait(self._retry_interval)
+        return None
+
+    def run_once(self):
+        """
+        Run the jobs of a single pipe connection, then release the source meter
+        """
+        try:
+            with self.open_pipe_file(wait=False) as file:
+                self.run_session(file)
+        finally:
+            self.close()
+
+    def serve(self):
+        """
+        Serve pipe connections until interrupted or stopped. A failed job is logged and the
+        source meter is reconfigured from scratch for the next one.
+        """
+        self.logger.info("Waiting for scan jobs on {}".format(self._pipe_path))
+        try:
+            while not self._stop.is_set():
+                file = self.open_pipe_file()
+                if file is None:
+                    break
+                with file:
+                    try:
+                        self.run_session(file)
+                    except (EOFError, BrokenPipeError):
+                        self.logger.warning("GUI closed the pipe during a job")
+                        self.failures += 1
+                    except Exception:
+                        self.logger.exception("Scan job failed")
+                        self.failures += 1
+                        self._smu_settings = None
+                        self._power_meter_configured = False
+        finally:
+            self.close()
+
+    def stop(self):
+        """
+        Make :py:meth:`serve` return once the current session ends, or at once if it is waiting
+        for the GUI
+        """
+        self._stop.set()
+
+    def close(self):
+        """
+        Finish the queued result images and disconnect the instruments that were used
+        """
+        if self._render_owner:
+            render_pool.shutdown()
+        if self._keithley is not None:
+            self._keithley.disconnect()
+        if self._power_meter_configured:
+            self._power_meter.disconnect()
+            self._power_meter_configured = False
+        self._smu_settings = None
@@ -153,9 +153,8 @@ class Keysight81635AChannel(BaseOpticalPowerMeterChannel):
         if not self.dummy_mode:
             self._write("INITiate%s:CHANnel%s:IMMediate"
                         % (self._slot_number, self._channel_number))
-        else:
-            return float(self._read("FETCh%s:CHANnel%s:POW?"
-                                    % (self._slot_number, self._channel_number)))
+        return float(self._read("FETCh%s:CHANnel%s:POW?"
+                                % (self._slot_number, self._channel_number)))
 
     @property
     def power_unit(self):
@@ -25,6 +25,16 @@ For Channel block level API:
     >>> smu.channel[1].measure.current.range = 100e-3
     >>> smu.channel[1].measure.current.value
     0.095
+
+Buffered bursts, one binary transfer per burst:
+
+::
+
+    >>> smu.channel[1].measure.current.arm(21, trigger_source='TLINK')
+    >>> smu.channel[1].measure.current.trigger()
+    >>> smu.channel[1].measure.current.fetch()
+    array([0.095, 0.094, ...])
+    >>> smu.channel[1].measure.current.disarm()
 """
 from COMMON.Utilities.custom_structures import CustomList
 from COMMON.Interfaces.VISA.cli_visa import CLIVISA
@@ -474,3 +474,11 @@ class Keithley2450MeasureBlock(Keithley24XXMeasureBlock):
             return float(self._read(":MEAS:CURR?"))
         elif self._type == 'current':
             return float(self._read(":MEAS:RES?"))
+
+    def arm(self, count, trigger_source='IMMEDIATE', trigger_line=1, delay=0, timestamps=False):
+        """
+        The 2450 uses named reading buffers rather than the 24XX trace subsystem
+
+        :raise NotSupportedError: always
+        """
+        raise NotSupportedError("Buffered bursts are not implemented for %s" % self.name)
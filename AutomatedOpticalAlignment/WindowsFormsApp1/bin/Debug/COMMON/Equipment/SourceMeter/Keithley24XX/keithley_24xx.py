@@ -4,6 +4,7 @@
 | $Date:: 2018-10-31 21:11:39 +0000 (Wed, 31 Oct 2018) $:  Date of last commit
 | --------------------------------------------------------------------------------
 """
+import numpy as np
 from ..base_source_meter import BaseSourceMeter
 from ..base_source_meter import BaseSourceMeterChannel
 from ..base_source_meter import BaseSourceMeterSourceParentBlock
@@ -576,6 +577,9 @@ class Keithley24XXMeasureBlock(BaseSourceMeterMeasureBlock):
                   'current': {'measure': {'min': None, 'max': None}},
                   'resistance': {'measure': {'min': None, 'max': None}}
                   }
+    BUFFER_SIZE = 2500
+    _ELEMENTS = {'voltage': 'VOLT', 'current': 'CURR', 'resistance': 'RES'}
+    _TRIGGER_SOURCES = {'IMMEDIATE': 'IMM', 'TLINK': 'TLIN'}
 
     def __init__(self, channel_number, type_, interface, dummy_mode, **kwargs):
         """
@@ -595,6 +599,8 @@ class Keithley24XXMeasureBlock(BaseSourceMeterMeasureBlock):
         super().__init__(interface=interface, dummy_mode=dummy_mode, **kwargs)
         self._channel_number = channel_number
         self._type = type_
+        self._burst_count = 0
+        self._burst_width = 1
 
     @property
     def _sense_mode(self):
@@ -674,3 +680,111 @@ class Keithley24XXMeasureBlock(BaseSourceMeterMeasureBlock):
             return float(self._read(":MEAS:CURR?", dummy_data='1,2,3').split(",")[1])  # Dummy_mode error
         elif self._type == 'resistance':
             return float(self._read(":MEAS:RES?", dummy_data='1,2,3').split(",")[2])  # Dummy_mode error
+
+    def arm(self, count, trigger_source='IMMEDIATE', trigger_line=1, delay=0, timestamps=False):
+        """
+        **Configure a buffered burst of readings**
+
+        Readings are stored in the trace buffer and returned in binary (REAL,64) by
+        :py:meth:`fetch`, so a whole burst costs a single GPIB transfer instead of one query
+        per point. While armed the ASCII :py:attr:`value` read is unavailable, call
+        :py:meth:`disarm` to restore it.
+
+        **example:** *smu.channel[1].measure.current.arm(21, trigger_source='TLINK')*
+
+        :param count: number of readings per burst
+        :type count: int
+        :param trigger_source: - 'IMMEDIATE', readings are taken back to back once triggered
+                               - 'TLINK', one reading per trigger link pulse (e.g. stage motion)
+        :type trigger_source: str
+        :param trigger_line: trigger link input line used with 'TLINK'
+        :type trigger_line: int
+        :param delay: delay in s between trigger and measurement
+        :type delay: float
+        :param timestamps: also store the timestamp of every reading
+        :type timestamps: bool
+        :raise ValueError: exception if count or trigger source are invalid
+        """
+        if not 1 <= count <= self.BUFFER_SIZE:
+            raise ValueError("Burst count must be between 1 and {}".format(self.BUFFER_SIZE))
+        trigger_source = trigger_source.upper()
+        if trigger_source not in self._TRIGGER_SOURCES.keys():
+            raise ValueError("Please specify either 'IMMEDIATE' or 'TLINK'")
+
+        elements = self._ELEMENTS[self._type] + (',TIME' if timestamps else '')
+        self._write(":FORM:ELEM {}".format(elements))
+        self._write(":FORM:DATA REAL,64")
+        self._write(":FORM:BORD NORM")
+        self._write(":TRAC:CLE")
+        self._write(":TRAC:POIN {}".format(count))
+        self._write(":TRAC:FEED SENS")
+        self._write(":ARM:SOUR IMM")
+        self._write(":ARM:COUN 1")
+        self._write(":TRIG:SOUR {}".format(self._TRIGGER_SOURCES[trigger_source]))
+        if trigger_source == 'TLINK':
+            self._write(":TRIG:ILIN {}".format(trigger_line))
+        self._write(":TRIG:DEL {}".format(delay))
+        self._write(":TRIG:COUN {}".format(count))
+        self._burst_count = count
+        self._burst_width = 2 if timestamps else 1
+
+    def trigger(self):
+        """
+        **Start the armed burst**
+
+        Returns immediately so the stage can move while the burst is acquired.
+        """
+        self._write(":TRAC:CLE;:TRAC:FEED:CONT NEXT;:INIT")
+
+    def fetch(self, timeout=60):
+        """
+        **Wait for the armed burst to complete and return its readings**
+
+        **example:** *smu.channel[1].measure.current.fetch()*
+
+        :param timeout: time in s to wait for the burst to complete
+        :type timeout: int
+        :return: readings in V/A/Ohm, with a second column of timestamps in s if armed with timestamps
+        :rtype: numpy.ndarray
+        """
+        count = self._burst_count
+        width = self._burst_width
+        if not count:
+            raise NotSupportedError("Call arm() before fetching a buffered burst")
+
+        # the interface appends *OPC to the command: *WAI holds it until the burst has completed
+        self._write("*WAI", type_='stb_poll_sync', timeout=timeout)
+        if self.dummy_mode:
+            data = np.zeros(count * width)
+        else:
+            data = self._interface.query_binary(":TRAC:DATA?", datatype='d', is_big_endian=True,
+                                                container=np.array)
+            self._interface.error_checking()
+
+        if width > 1:
+            return data.reshape(-1, width)
+        return data
+
+    def read_burst(self, timeout=60):
+        """
+        **Trigger the armed burst and return its readings**
+
+        :param timeout: time in s to wait for the burst to complete
+        :type timeout: int
+        :return: readings, see :py:meth:`fetch`
+        :rtype: numpy.ndarray
+        """
+        self.trigger()
+        return self.fetch(timeout=timeout)
+
+    def disarm(self):
+        """
+        **Leave buffered mode and restore the ASCII format used by** :py:attr:`value`
+        """
+        self._write(":TRAC:FEED:CONT NEV")
+        self._write(":TRAC:CLE")
+        self._write(":TRIG:SOUR IMM")
+        self._write(":TRIG:COUN 1")
+        self._write(":FORM:DATA ASC")
+        self._write(":FORM:ELEM VOLT,CURR,RES")
+        self._burst_count = 0
@@ -46,7 +46,7 @@ class CLIVISA(BaseEquipmentInterface):
         start = time.time()
         # STB polling loop
         while True:
-            stb = self.visa_handle.read_stb()
+            stb = self._read_stb()
             if (stb & self.stb_event_mask) > 0:
                 break
 
@@ -67,6 +67,15 @@ class CLIVISA(BaseEquipmentInterface):
                     else:
                         time.sleep(0.001)
 
+    def _read_stb(self):
+        """
+        Serial poll of the status byte, one poll of :py:meth:`_stb_polling`
+
+        :return: status byte
+        :rtype: int
+        """
+        return self.visa_handle.read_stb()
+
     def close(self):
         """
         Close visa connection
@@ -133,6 +142,26 @@ class CLIVISA(BaseEquipmentInterface):
         """
         return self.visa_handle.query(message)
 
+    def query_binary(self, message, **kwargs):
+        """
+        Send a message through visa, and return the binary block of the response
+
+        The read termination is disabled for the read, as the block can contain its character.
+
+        :param message: data to write
+        :type message: str
+        :param kwargs: arguments of :py:meth:`pyvisa.resources.MessageBasedResource.query_binary_values`
+        :type kwargs: dict
+        :return: values of the block
+        :rtype: list or numpy.ndarray
+        """
+        termination = self.visa_handle.read_termination
+        self.visa_handle.read_termination = None
+        try:
+            return self.visa_handle.query_binary_values(message, **kwargs)
+        finally:
+            self.visa_handle.read_termination = termination
+
     def query_with_srq_sync(self, message, timeout):
         """
         This function sends a command with and waits for the service request event
@@ -0,0 +1,49 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from COMMON.Equipment.SourceMeter.Keithley24XX.keithley_2400 import Keithley2400
+from COMMON.Utilities.custom_exceptions import NotSupportedError
+
+
+class TestKeithley24XXBurst(TestCase):
+
+    def setUp(self):
+        self.current = Keithley2400("GPIB0::9::INSTR", dummy_mode=True).channel[1].measure.current
+
+    def _messages(self, call):
+        with patch.object(self.current, '_write', wraps=self.current._write) as mock_write:
+            call()
+        return [args[0] for args, _ in mock_write.call_args_list]
+
+    def test_arm_validates_its_arguments(self):
+        for count in (0, self.current.BUFFER_SIZE + 1):
+            with self.assertRaises(ValueError):
+                self.current.arm(count)
+        with self.assertRaises(ValueError):
+            self.current.arm(10, trigger_source='BUS')
+        messages = self._messages(lambda: self.current.arm(10, trigger_source='tlink', trigger_line=2))
+        self.assertIn(":TRIG:SOUR TLIN", messages)
+        self.assertIn(":TRIG:ILIN 2", messages)
+        self.assertIn(":FORM:DATA REAL,64", messages)
+
+    def test_fetch_before_arm(self):
+        with self.assertRaises(NotSupportedError):
+            self.current.fetch()
+
+    def test_fetch_reshapes_timestamps(self):
+        self.current.arm(5)
+        self.assertEqual((5,), self.current.fetch().shape)
+        self.current.arm(5, timestamps=True)
+        self.assertEqual((5, 2), self.current.read_burst().shape)
+
+    def test_fetch_waits_without_repeating_opc(self):
+        self.current.arm(5)
+        self.assertNotIn("*OPC", self._messages(self.current.fetch))
+
+    def test_disarm_restores_ascii_format(self):
+        self.current.arm(5, timestamps=True)
+        messages = self._messages(self.current.disarm)
+        self.assertIn(":FORM:DATA ASC", messages)
+        self.assertIn(":FORM:ELEM VOLT,CURR,RES", messages)
+        with self.assertRaises(NotSupportedError):
+            self.current.fetch()